@@ -0,0 +1,120 @@
+import argparse
+import random
+import time
+from typing import List
+
+import numpy as np
+
+from game import Piece, Position
+from game.batch import attack_counts, evaluate_batch, in_check_batch, material_batch, positions_to_array
+from game.evaluation import evaluate_squares
+from game.move import is_square_attacked
+from game.replay import iter_archive_games
+from game.san import san_to_move
+
+def _random_positions(rng: random.Random, count: int, plies: int) -> List[Position]:
+    # Every position along each game is kept, the way an archive job would see them
+    positions = []
+    while len(positions) < count:
+        position = Position()
+        for _ in range(plies):
+            moves = position.get_legal_moves()
+            if not moves or len(positions) >= count:
+                break
+            position.make_move(rng.choice(moves))
+            positions.append(Position.from_bytes(position.to_bytes()))
+
+    return positions
+
+def _archive_positions(path: str, count: int) -> List[Position]:
+    positions = []
+    for fen, sans in iter_archive_games(path):
+        position = Position.from_fen(fen)
+        for san in sans:
+            position.make_move(san_to_move(position, san))
+            positions.append(Position.from_bytes(position.to_bytes()))
+            if len(positions) >= count:
+                return positions
+
+    return positions
+
+def _evaluate_one_by_one(positions: List[Position]) -> tuple:
+    scores, checks = [], []
+    for position in positions:
+        squares = [position.get_square(i) for i in range(64)]
+        colour = position.get_colour_to_move()
+        scores.append(evaluate_squares(squares))
+        checks.append(is_square_attacked(position, position.get_king_square(colour), Piece.opposite_colour(colour)))
+
+    return scores, checks
+
+def _attack_maps_one_by_one(positions: List[Position]) -> List[List[bool]]:
+    return [
+        [is_square_attacked(position, square, colour) for colour in (Piece.WHITE, Piece.BLACK) for square in range(64)]
+        for position in positions
+    ]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-position evaluation against NumPy batch evaluation")
+    parser.add_argument("--archive", default=None, help="take positions from a PGN archive instead of random games")
+    parser.add_argument("--positions", type=int, default=5000)
+    parser.add_argument("--map-positions", type=int, default=300, help="positions to build attack maps for one by one")
+    parser.add_argument("--repeat", type=int, default=20, help="times to tile the positions for the batch run")
+    parser.add_argument("--plies", type=int, default=80, help="length of each random game")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.archive:
+        positions = _archive_positions(args.archive, args.positions)
+    else:
+        positions = _random_positions(random.Random(args.seed), args.positions, args.plies)
+    if not positions:
+        return
+
+    start = time.perf_counter()
+    scores, checks = _evaluate_one_by_one(positions)
+    single = (time.perf_counter() - start) / len(positions)
+
+    map_positions = positions[:args.map_positions]
+    start = time.perf_counter()
+    attacked = _attack_maps_one_by_one(map_positions)
+    single_maps = (time.perf_counter() - start) / len(map_positions)
+
+    start = time.perf_counter()
+    squares, colours = positions_to_array(positions)
+    convert = (time.perf_counter() - start) / len(positions)
+
+    # The batch results must agree with the per-position rules exactly before their speed means anything
+    assert evaluate_batch(squares).tolist() == scores
+    assert in_check_batch(squares, colours).tolist() == checks
+    batch_maps = np.concatenate((attack_counts(squares, Piece.WHITE), attack_counts(squares, Piece.BLACK)), axis=1) > 0
+    assert batch_maps[:len(map_positions)].tolist() == attacked
+
+    # Archive-scale batches are far larger than the positions generated here, so tile them
+    squares = np.tile(squares, (args.repeat, 1))
+    colours = np.tile(colours, args.repeat)
+    count = len(squares)
+
+    timings = {}
+    for name, run in (
+        ("material", lambda: material_batch(squares)),
+        ("evaluation", lambda: evaluate_batch(squares)),
+        ("attack maps", lambda: (attack_counts(squares, Piece.WHITE), attack_counts(squares, Piece.BLACK))),
+        ("check status", lambda: in_check_batch(squares, colours)),
+    ):
+        start = time.perf_counter()
+        run()
+        timings[name] = (time.perf_counter() - start) / count
+
+    print(f"Positions: {len(positions)}, batch rows: {count}")
+    print(f"One by one, evaluation + check: {single * 1e6:8.2f} us/position")
+    print(f"One by one, both attack maps:   {single_maps * 1e6:8.2f} us/position")
+    print(f"Position to array conversion:   {convert * 1e6:8.2f} us/position")
+    for name, elapsed in timings.items():
+        print(f"Batch {name + ':':<25}{elapsed * 1e6:8.3f} us/position")
+    total = timings["evaluation"] + timings["check status"]
+    print(f"Batch evaluation + check:       {total * 1e6:8.3f} us/position ({single / total:.0f}x)")
+    print(f"Batch attack maps speedup:      {single_maps / timings['attack maps']:8.0f}x")
+
+if __name__ == "__main__":
+    main()
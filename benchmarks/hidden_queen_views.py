@@ -0,0 +1,66 @@
+import argparse
+import random
+import time
+
+from game import Piece, Position
+from game.hidden_queen import HiddenQueenGame, get_changed_squares
+
+def _full_views(position: Position) -> dict:
+    # What building both views from scratch after every move would cost
+    return {
+        colour: [Piece.visible_to(position.get_square(i), colour) for i in range(64)]
+        for colour in (Piece.WHITE, Piece.BLACK)
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cost of building per-player hidden queen views per move")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--plies", type=int, default=120)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    plies = 0
+    changed = 0
+    delta_time = 0.0
+    move_time = 0.0
+    full_time = 0.0
+
+    for _ in range(args.games):
+        game = HiddenQueenGame(Position())
+        for colour in (Piece.WHITE, Piece.BLACK):
+            game.designate(colour, rng.choice([sq for sq in range(64) if game.get_position().get_square(sq) == Piece.PAWN | colour]))
+
+        position = game.get_position()
+        for _ in range(args.plies):
+            moves = position.get_legal_moves()
+            if not moves or position.is_game_over():
+                break
+            move = rng.choice(moves)
+
+            # Separate the rules work from the view work so the latter can be judged on its own
+            start = time.perf_counter()
+            position.apply_move(move)
+            move_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            deltas = game.build_deltas(get_changed_squares(move))
+            delta_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            _full_views(position)
+            full_time += time.perf_counter() - start
+
+            plies += 1
+            changed += sum(len(delta.changes) for delta in deltas.values())
+
+    if not plies:
+        return
+
+    print(f"Plies: {plies}, changed squares per ply (both views): {changed / plies:.2f}")
+    print(f"Position.apply_move:    {move_time / plies * 1e6:8.2f} us/ply")
+    print(f"incremental view delta: {delta_time / plies * 1e6:8.2f} us/ply")
+    print(f"full 2x64 view rebuild: {full_time / plies * 1e6:8.2f} us/ply")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+from typing import List
+
+from game import Move, Position
+from game.move import generate_legal_moves
+from game.move_cache import get_move_cache, set_move_cache
+
+def _random_positions(rng: random.Random, count: int, plies: int) -> List[Position]:
+    positions = []
+    while len(positions) < count:
+        position = Position()
+        for _ in range(plies):
+            moves = position.get_legal_moves()
+            if not moves or len(positions) >= count:
+                break
+            position.make_move(rng.choice(moves))
+            positions.append(Position.from_bytes(position.to_bytes()))
+
+    return positions
+
+def _measure_generation(positions: List[Position]) -> tuple:
+    # Everything still allocated afterwards is what the kept move lists cost, the peak includes the legality checks
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    start = time.perf_counter()
+    kept = [generate_legal_moves(position, position.get_colour_to_move()) for position in positions]
+    elapsed = time.perf_counter() - start
+    after = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, "filename")
+    blocks = sum(stat.count_diff for stat in stats)
+    size = sum(stat.size_diff for stat in stats)
+    return kept, blocks, size, peak, elapsed
+
+def _time_per_move(run, moves: List, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        run(moves)
+    return (time.perf_counter() - start) / (repeat * len(moves))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Memory and time spent on Move objects per generated position")
+    parser.add_argument("--positions", type=int, default=1000)
+    parser.add_argument("--plies", type=int, default=60, help="length of each random game")
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the moves when timing serialisation")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    positions = _random_positions(random.Random(args.seed), args.positions, args.plies)
+
+    # The legal move cache would hand back decoded copies, measure plain generation
+    previous = get_move_cache()
+    set_move_cache(None)
+    try:
+        kept, blocks, size, peak, elapsed = _measure_generation(positions)
+    finally:
+        set_move_cache(previous)
+
+    moves = [move for position_moves in kept for move in position_moves]
+    instance_size = sys.getsizeof(moves[0]) + (sys.getsizeof(moves[0].__dict__) if hasattr(moves[0], "__dict__") else 0)
+
+    print(f"Positions: {len(positions)}, legal moves: {len(moves)} ({len(moves) / len(positions):.1f} per position)")
+    print(f"Move instance:     {instance_size} bytes")
+    print(f"Kept allocations:  {blocks / len(positions):8.1f} blocks, {size / len(positions):8.0f} bytes per position")
+    print(f"Peak traced:       {peak / len(positions):8.0f} bytes per position")
+    print(f"Generation:        {elapsed / len(positions) * 1e6:8.1f} us per position (traced)")
+
+    messages = [Move.to_json(move) for move in moves]
+    print(f"to_json:           {_time_per_move(lambda ms: [Move.to_json(m) for m in ms], moves, args.repeat) * 1e6:8.2f} us per move")
+    print(f"from_dict:         {_time_per_move(lambda ms: [Move.from_dict(json.loads(m)) for m in ms], messages, args.repeat) * 1e6:8.2f} us per move")
+    if hasattr(Move, "pack"):
+        codes = [move.pack() for move in moves]
+        assert [Move.unpack(code) for code in codes] == moves
+        print(f"pack:              {_time_per_move(lambda ms: [m.pack() for m in ms], moves, args.repeat) * 1e6:8.2f} us per move")
+        print(f"unpack:            {_time_per_move(lambda cs: [Move.unpack(c) for c in cs], codes, args.repeat) * 1e6:8.2f} us per move")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import random
+import time
+from typing import List
+
+from game import Move, Position
+from game.move_cache import MoveCache, get_move_cache, set_move_cache
+from game.replay import iter_archive_games
+from game.san import san_to_move
+
+def _random_lines(rng: random.Random, lines: int, plies: int) -> List[List[Move]]:
+    # Server games mostly share a handful of openings, so games are drawn from a small pool of lines
+    result = []
+    for _ in range(lines):
+        position = Position()
+        line = []
+        for _ in range(plies):
+            moves = position.get_legal_moves()
+            if not moves:
+                break
+            line.append(rng.choice(moves))
+            position.apply_move(line[-1])
+        result.append(line)
+
+    return result
+
+def _load_archive(path: str, limit: int) -> List[List[Move]]:
+    games = []
+    for fen, sans in iter_archive_games(path):
+        position = Position.from_fen(fen)
+        moves = []
+        for san in sans:
+            moves.append(san_to_move(position, san))
+            position.make_move(moves[-1])
+        games.append(moves)
+        if len(games) >= limit:
+            break
+
+    return games
+
+def _play(games: List[List[Move]]) -> float:
+    elapsed = 0.0
+    for moves in games:
+        position = Position()
+        start = time.perf_counter()
+        for move in moves:
+            position.apply_move(move)
+        elapsed += time.perf_counter() - start
+
+    return elapsed
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cost of Position.apply_move with and without the shared legal move cache")
+    parser.add_argument("--archive", default=None, help="replay games from a PGN archive instead of generated ones")
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--lines", type=int, default=10, help="distinct openings when generating games")
+    parser.add_argument("--plies", type=int, default=24, help="plies per generated game")
+    parser.add_argument("--max-kb", type=int, default=32 * 1024)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.archive:
+        games = _load_archive(args.archive, args.games)
+    else:
+        lines = _random_lines(rng, args.lines, args.plies)
+        games = [rng.choice(lines) for _ in range(args.games)]
+
+    plies = sum(len(moves) for moves in games)
+    if not plies:
+        return
+
+    previous = get_move_cache()
+    try:
+        set_move_cache(None)
+        uncached = _play(games)
+
+        cache = MoveCache(args.max_kb * 1024)
+        set_move_cache(cache)
+        cached = _play(games)
+    finally:
+        set_move_cache(previous)
+
+    print(f"Games: {len(games)}, plies: {plies}")
+    print(f"apply_move without cache: {uncached / plies * 1e6:8.2f} us/ply")
+    print(f"apply_move with cache:    {cached / plies * 1e6:8.2f} us/ply ({uncached / cached:.1f}x)")
+    print(f"Cache: {cache.summary()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import argparse
+from multiprocessing import Pool
+import os
+import time
+from typing import Tuple
+
+from engine import ParallelSearcher, Searcher, SearchLimits, TranspositionTable
+from game import Position
+from game.move import generate_legal_moves
+
+BENCH_POSITIONS = {
+    "start": "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "kiwipete": "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "endgame": "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "middlegame": "r1bq1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N1PN2/PP3PPP/R2QKB1R w KQ - 0 8",
+}
+
+def perft(position: Position, depth: int) -> int:
+    if depth == 0:
+        return 1
+
+    nodes = 0
+    for move in generate_legal_moves(position, position.get_colour_to_move()):
+        position.make_move(move)
+        nodes += perft(position, depth - 1)
+        position.unmake_move()
+
+    return nodes
+
+def _perft_task(task: Tuple[bytes, int, int]) -> int:
+    data, move_index, depth = task
+    position = Position.from_bytes(data)
+    position.make_move(position.get_legal_moves()[move_index])
+    return perft(position, depth - 1)
+
+def parallel_perft(pool: Pool, position: Position, depth: int) -> int:
+    data = position.to_bytes()
+    return sum(pool.imap_unordered(_perft_task, [(data, i, depth) for i in range(len(position.get_legal_moves()))]))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Speedup of root-split parallel perft and search against worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=None, help="worker counts to try, 1 2 4 ... up to the core count by default")
+    parser.add_argument("--perft-depth", type=int, default=3)
+    parser.add_argument("--search-depth", type=int, default=4)
+    parser.add_argument("--hash", type=float, default=16, help="transposition table size in MB")
+    parser.add_argument("--shared-table", action="store_true", help="share one transposition table between workers")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    worker_counts = args.workers or [n for n in (1, 2, 4, 8, 16, 32, 64) if n <= cores]
+    print(f"{cores} cores, perft depth {args.perft_depth}, search depth {args.search_depth}")
+
+    for name, fen in BENCH_POSITIONS.items():
+        position = Position.from_fen(fen)
+
+        start = time.perf_counter()
+        nodes = perft(position, args.perft_depth)
+        perft_base = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = Searcher(position, TranspositionTable(args.hash)).search(SearchLimits(depth=args.search_depth))
+        search_base = time.perf_counter() - start
+
+        print(f"\n{name}: perft {nodes} nodes in {perft_base:.2f}s, search {result.nodes} nodes in {search_base:.2f}s (1 process)")
+
+        for workers in worker_counts:
+            with Pool(processes=workers) as pool:
+                start = time.perf_counter()
+                parallel_nodes = parallel_perft(pool, position, args.perft_depth)
+                perft_time = time.perf_counter() - start
+            assert parallel_nodes == nodes
+
+            with ParallelSearcher(workers, args.hash, args.shared_table) as searcher:
+                start = time.perf_counter()
+                parallel_result = searcher.search(position, SearchLimits(depth=args.search_depth))
+                search_time = time.perf_counter() - start
+
+            print(
+                f"  {workers:3d} workers: perft {perft_time:6.2f}s ({perft_base / perft_time:5.2f}x), "
+                f"search {search_time:6.2f}s ({search_base / search_time:5.2f}x, {parallel_result.nodes} nodes)"
+            )
+
+if __name__ == "__main__":
+    main()
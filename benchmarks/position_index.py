@@ -0,0 +1,88 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List, Tuple
+
+from engine.transposition import encode_move
+from game import Move, Position
+from networking.position_index import PositionIndex, PositionIndexWriter
+
+_RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+
+def _play_game(rng: random.Random, plies: int) -> Tuple[List[Move], str]:
+    # The first few moves come from a short list, so games share openings the way real ones do
+    position = Position()
+    moves = []
+    for ply in range(plies):
+        legal_moves = position.get_legal_moves()
+        if not legal_moves or position.is_game_over():
+            break
+        legal_moves.sort(key=lambda move: (move.start, move.end))
+        move = rng.choice(legal_moves[:3] if ply < 6 else legal_moves)
+        position.apply_move(move)
+        moves.append(move)
+    return moves, rng.choice(_RESULTS)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build, merge and query cost of the position index")
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--plies", type=int, default=40)
+    parser.add_argument("--buffer", type=int, default=20_000, help="moves buffered before a run is written")
+    parser.add_argument("--lookups", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    games = [_play_game(rng, args.plies) for _ in range(args.games)]
+
+    # Counted the obvious way, to check the index against
+    expected: Dict[Tuple[int, int], int] = {}
+    for moves, _ in games:
+        position = Position()
+        for move in moves:
+            key = (position.get_public_hash(), encode_move(move))
+            expected[key] = expected.get(key, 0) + 1
+            position.make_move(move)
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        writer = PositionIndexWriter(directory, args.plies, buffer_entries=args.buffer)
+        for moves, result in games:
+            writer.add_game(Position().get_fen(), moves, result)
+        add_time = time.perf_counter() - start
+        writer.close()
+        build_time = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+        keys = rng.choices(list(expected), k=args.lookups)
+        with PositionIndex(directory) as index:
+            timings = []
+            for key, move in keys:
+                lookup_start = time.perf_counter()
+                entries = index.get_entries(key)
+                timings.append(time.perf_counter() - lookup_start)
+                assert next(entry.games for entry in entries if entry.move == move) == expected[(key, move)]
+
+            # A separate pass, tracing allocations would slow the timed one
+            tracemalloc.start()
+            for key, _ in keys[:100]:
+                index.get_entries(key)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            timings.sort()
+            print(f"Position index, {args.games} games of up to {args.plies} plies, {len(index)} records in {index.get_run_count()} runs")
+            print(f"  add games:      {add_time:8.2f} s, {len(expected) / add_time:,.0f} positions and moves per second")
+            print(f"  add + merges:   {build_time:8.2f} s")
+            print(f"  size on disk:   {size / 1024:8.1f} KiB")
+            print(
+                f"  lookup ms:      p50={timings[len(timings) // 2] * 1000:.3f} "
+                f"p99={timings[int(len(timings) * 0.99)] * 1000:.3f} max={timings[-1] * 1000:.3f}"
+            )
+            print(f"  lookup heap:    {peak / 1024:8.1f} KiB at most, the runs themselves stay mapped")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import gc
+import random
+import tracemalloc
+from typing import Callable, List
+
+from game import Move, Piece, Position
+from game.hidden_queen import HiddenQueenGame
+from networking.game_room import GameRoom
+
+def _start_hidden_queens(room: GameRoom) -> None:
+    room.hidden_queen = HiddenQueenGame(room.board)
+    room.hidden_queen.designate(Piece.WHITE, 8)
+    room.hidden_queen.designate(Piece.BLACK, 48)
+
+def _play_games(rng: random.Random, count: int, plies: int, hidden_queen: bool) -> List[List[Move]]:
+    games = []
+    for room_id in range(count):
+        room = GameRoom(room_id)
+        if hidden_queen:
+            _start_hidden_queens(room)
+        for _ in range(plies):
+            moves = room.board.get_legal_moves()
+            if not moves or room.board.is_game_over():
+                break
+            _play(room, rng.choice(moves))
+        games.append(room.board.get_moves_played())
+    return games
+
+def _play(room: GameRoom, move: Move) -> None:
+    if room.hidden_queen is not None:
+        room.hidden_queen.apply_move(move)
+    else:
+        room.board.apply_move(move)
+
+def _full_room(room_id: int) -> GameRoom:
+    # What every room held before: a position that keeps its whole undo history
+    return GameRoom(room_id, board=Position())
+
+def _measure(new_room: Callable[[int], GameRoom], games: List[List[Move]], hidden_queen: bool) -> int:
+    # Only what is still allocated once the rooms are built counts, the same moves are played through the server's path
+    gc.collect()
+    tracemalloc.start()
+    rooms = []
+    for room_id, moves in enumerate(games):
+        room = new_room(room_id)
+        if hidden_queen:
+            _start_hidden_queens(room)
+        for move in moves:
+            _play(room, move)
+        rooms.append(room)
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size // len(rooms)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bytes held per active server room after a number of plies")
+    parser.add_argument("--rooms", type=int, default=100)
+    parser.add_argument("--plies", type=int, nargs="+", default=[0, 20, 40, 80])
+    parser.add_argument("--hidden-queen", action="store_true", help="play hidden queen rooms instead of standard ones")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    kind = "hidden queen" if args.hidden_queen else "standard"
+    print(f"Bytes per {kind} room, {args.rooms} rooms")
+    print(f"  {'plies':>6} {'full history':>14} {'compact':>10} {'ratio':>7} {'rooms per GB':>14}")
+
+    for plies in args.plies:
+        games = _play_games(rng, args.rooms, plies, args.hidden_queen)
+        played = sum(len(moves) for moves in games) / len(games)
+
+        full = _measure(_full_room, games, args.hidden_queen)
+        compact = _measure(GameRoom, games, args.hidden_queen)
+        print(f"  {played:6.1f} {full:14,} {compact:10,} {full / compact:6.1f}x {2 ** 30 // compact:14,}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import argparse
+from array import array
+import json
+import os
+import random
+import secrets
+import tempfile
+import time
+from typing import Dict, List
+
+from game import Move, Piece, Position
+from game.hidden_queen import HiddenQueenGame
+from networking.snapshot import RoomSnapshot, encode_snapshot, read_snapshot, replay_snapshot, write_snapshot
+
+def _play_room(rng: random.Random, max_plies: int) -> RoomSnapshot:
+    position = Position()
+    game = HiddenQueenGame(position)
+    for colour in (Piece.WHITE, Piece.BLACK):
+        game.designate(colour, rng.choice([sq for sq in range(64) if position.get_square(sq) == Piece.PAWN | colour]))
+
+    for _ in range(rng.randint(0, max_plies)):
+        moves = position.get_legal_moves()
+        if not moves or position.is_game_over():
+            break
+        game.apply_move(rng.choice(moves))
+
+    return RoomSnapshot(
+        0, position.get_initial_fen(), position.to_bytes(), position.get_packed_moves(),
+        hidden_queens={colour: game.get_hidden_queen(colour) for colour in (Piece.WHITE, Piece.BLACK)}
+    )
+
+def _collect(room_id: int, position: Position, game: HiddenQueenGame, packed_moves: array, sessions: Dict[int, str]) -> RoomSnapshot:
+    # The same work the server does per room while it holds its lock
+    return RoomSnapshot(
+        room_id,
+        position.get_initial_fen(),
+        position.to_bytes(),
+        packed_moves[:],
+        dict(sessions),
+        {colour: game.get_hidden_queen(colour) for colour in (Piece.WHITE, Piece.BLACK)},
+        None,
+        (150.0, 150.0)
+    )
+
+def _to_json(rooms: List[RoomSnapshot]) -> bytes:
+    # What the obvious alternative would write, for comparison
+    return json.dumps([{
+        "room": room.room_id,
+        "fen": room.start_fen,
+        "position": room.position.hex(),
+        "moves": [Move.unpack(code).to_dict() for code in room.moves],
+        "sessions": room.sessions,
+        "hidden_queens": room.hidden_queens,
+        "clock": room.clock,
+    } for room in rooms]).encode()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cost of snapshotting and restoring live rooms")
+    parser.add_argument("--rooms", type=int, default=10_000)
+    parser.add_argument("--games", type=int, default=500, help="distinct games the rooms are drawn from")
+    parser.add_argument("--max-plies", type=int, default=80)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    games = []
+    for _ in range(args.games):
+        room = _play_room(rng, args.max_plies)
+        position = Position()
+        games.append((position, replay_snapshot(room, position), room.moves))
+    sessions = [{Piece.WHITE: secrets.token_hex(8), Piece.BLACK: secrets.token_hex(8)} for _ in range(args.rooms)]
+
+    start = time.perf_counter()
+    rooms = []
+    for room_id in range(1, args.rooms + 1):
+        position, game, packed_moves = games[room_id % len(games)]
+        rooms.append(_collect(room_id, position, game, packed_moves, sessions[room_id - 1]))
+    collect_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    data = encode_snapshot(rooms)
+    encode_time = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "rooms.snap")
+        start = time.perf_counter()
+        size = write_snapshot(path, rooms)
+        write_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, restored = read_snapshot(path)
+        read_time = time.perf_counter() - start
+
+    assert len(data) == size and len(restored) == len(rooms)
+    assert all(a.moves == b.moves and a.position == b.position and a.sessions == b.sessions for a, b in zip(rooms, restored))
+
+    sample = restored[:len(games)]
+    start = time.perf_counter()
+    for room in sample:
+        replay_snapshot(room, Position())
+    replay_time = (time.perf_counter() - start) / len(sample)
+
+    json_size = len(_to_json(rooms))
+    plies = sum(len(room.moves) for room in rooms) / len(rooms)
+
+    print(f"Room snapshot, {args.rooms} hidden queen rooms with clocks, {plies:.1f} plies on average")
+    print(f"  collect under lock: {collect_time * 1000:8.1f} ms")
+    print(f"  encode:             {encode_time * 1000:8.1f} ms")
+    print(f"  encode + write:     {write_time * 1000:8.1f} ms (fsync and rename included)")
+    print(f"  size:               {size / 1024:8.1f} KiB, {size / len(rooms):.0f} bytes per room ({json_size / 1024:.1f} KiB as JSON)")
+    print(f"  read + decode:      {read_time * 1000:8.1f} ms")
+    print(f"  replay one room:    {replay_time * 1000:8.2f} ms, done when its first player resumes")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Entry points that run without a display, none of them may load pygame or the ui package
+HEADLESS_MODULES = (
+    "networking.server",
+    "networking.client",
+    "networking.load_test",
+    "networking.replay",
+    "networking.position_index",
+    "engine.book",
+)
+
+def _import_times(module: str) -> Tuple[int, Dict[str, int]]:
+    # -X importtime reports every import on stderr as "import time: self | cumulative | name", nested ones indented
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (ROOT, os.environ.get("PYTHONPATH")))))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    total = 0
+    self_times: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue
+        self_times[name.strip()] = int(self_us)
+        if name.strip() == module:
+            total = int(cumulative_us)
+    return total, self_times
+
+def _best_of(module: str, runs: int) -> Tuple[int, Dict[str, int]]:
+    # The fastest run is the one least disturbed by the rest of the machine
+    return min((_import_times(module) for _ in range(runs)), key=lambda timing: timing[0])
+
+def _gui_modules(modules: List[str]) -> List[str]:
+    return [name for name in modules if name.split(".")[0] in ("pygame", "ui") or name == "game.board"]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cold import cost of the headless entry points")
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--budget-ms", type=float, default=200.0, help="fails if importing the server takes longer")
+    parser.add_argument("--top", type=int, default=10, help="slowest modules listed for the server")
+    args = parser.parse_args()
+
+    # Compiles anything stale first, so no timed run pays for writing bytecode
+    for module in HEADLESS_MODULES:
+        _import_times(module)
+
+    failures = []
+    server_times: Dict[str, int] = {}
+    print(f"Cold import, best of {args.runs} runs")
+    for module in HEADLESS_MODULES:
+        total, self_times = _best_of(module, args.runs)
+        print(f"  {module:28} {total / 1000:8.1f} ms  {len(self_times):4} modules")
+        if gui := _gui_modules(list(self_times)):
+            failures.append(f"{module} loads {', '.join(gui)}")
+        if module == "networking.server":
+            server_times = self_times
+            if total / 1000 > args.budget_ms:
+                failures.append(f"networking.server took {total / 1000:.1f} ms, over the {args.budget_ms:.0f} ms budget")
+
+    print("Slowest modules under networking.server, by their own time")
+    for name, self_us in sorted(server_times.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {name:28} {self_us / 1000:8.1f} ms")
+
+    for failure in failures:
+        print(f"[STARTUP] {failure}")
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import random
+import threading
+import time
+from typing import List
+
+from networking.timer_wheel import TimerWheel
+
+def _percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(round(p / 100 * (len(ordered) - 1))), len(ordered) - 1)]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cost of driving many room clocks from one timer wheel")
+    parser.add_argument("--clocks", type=int, default=10_000)
+    parser.add_argument("--moves", type=int, default=100_000, help="flag timers to cancel and reschedule, one per move")
+    parser.add_argument("--idle", type=float, default=5.0, help="seconds to measure the driver thread with every clock pending")
+    parser.add_argument("--fire", type=int, default=2000, help="timers due within two seconds, to measure lateness")
+    parser.add_argument("--thread-timers", type=int, default=1000, help="threading.Timer objects to compare against")
+    parser.add_argument("--tick", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    wheel = TimerWheel(args.tick)
+
+    # Flag timers for games with 1 to 10 minutes left
+    start = time.perf_counter()
+    timers = [wheel.schedule(rng.uniform(60, 600), lambda: None) for _ in range(args.clocks)]
+    schedule_time = (time.perf_counter() - start) / args.clocks
+
+    start = time.perf_counter()
+    for _ in range(args.moves):
+        i = rng.randrange(args.clocks)
+        timers[i].cancel()
+        timers[i] = wheel.schedule(rng.uniform(60, 600), lambda: None)
+    move_time = (time.perf_counter() - start) / args.moves
+
+    cpu = time.process_time()
+    time.sleep(args.idle)
+    idle_cpu = (time.process_time() - cpu) / args.idle
+
+    lateness = []
+    lock = threading.Lock()
+
+    def on_fire(due: float) -> None:
+        with lock:
+            lateness.append(time.monotonic() - due)
+
+    for _ in range(args.fire):
+        delay = rng.uniform(0, 2)
+        due = time.monotonic() + delay
+        wheel.schedule(delay, lambda due=due: on_fire(due))
+    time.sleep(2 + 4 * args.tick)
+    wheel.stop()
+
+    print(f"Timer wheel, {args.clocks} clocks pending, {args.tick * 1000:.0f} ms tick")
+    print(f"  schedule:            {schedule_time * 1e6:8.2f} us per timer")
+    print(f"  cancel + reschedule: {move_time * 1e6:8.2f} us per move")
+    print(f"  idle driver:         {idle_cpu:8.2%} of one core")
+    print(
+        f"  fired {len(lateness)}/{args.fire}, lateness ms: "
+        f"p50={_percentile(lateness, 50) * 1000:.1f}, p99={_percentile(lateness, 99) * 1000:.1f}, "
+        f"max={max(lateness, default=0) * 1000:.1f}"
+    )
+
+    # What a timer thread per room costs instead
+    threads_before = threading.active_count()
+    start = time.perf_counter()
+    thread_timers = [threading.Timer(rng.uniform(60, 600), lambda: None) for _ in range(args.thread_timers)]
+    for timer in thread_timers:
+        timer.start()
+    thread_time = (time.perf_counter() - start) / args.thread_timers
+    threads = threading.active_count() - threads_before
+
+    start = time.perf_counter()
+    for timer in thread_timers:
+        timer.cancel()
+        timer.join()
+    cancel_time = (time.perf_counter() - start) / args.thread_timers
+
+    print(f"threading.Timer, {args.thread_timers} clocks")
+    print(f"  start:               {thread_time * 1e6:8.2f} us per timer, {threads} extra threads")
+    print(f"  cancel + join:       {cancel_time * 1e6:8.2f} us per timer")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+from .search import Searcher, SearchLimits, SearchResult
+from .transposition import TranspositionTable
+
+from lazy_imports import lazy_getattr
+
+# ParallelSearcher brings in multiprocessing's process machinery, which the server never uses
+_LAZY_IMPORTS = {"ParallelSearcher": ".parallel"}
+
+__getattr__ = lazy_getattr(__name__, _LAZY_IMPORTS)
@@ -0,0 +1,55 @@
+import argparse
+
+from game import Position
+from game.san import move_to_san
+
+from .book import OpeningBook
+from .parallel import ParallelSearcher
+from .search import MAX_PLY, SearchLimits, SearchResult, Searcher, format_pv
+from .tablebase import Tablebase
+from .transposition import DEFAULT_SIZE_MB, TranspositionTable
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Search a position and print each completed iteration")
+    parser.add_argument("fen", nargs="?", default=None, help="position to search, the starting position by default")
+    parser.add_argument("--depth", type=int, default=MAX_PLY)
+    parser.add_argument("--time", type=float, default=5.0, help="seconds to search for")
+    parser.add_argument("--nodes", type=int, default=None)
+    parser.add_argument("--hash", type=float, default=DEFAULT_SIZE_MB, help="transposition table size in MB")
+    parser.add_argument("--workers", type=int, default=1, help="search root moves in this many processes")
+    parser.add_argument("--book", default=None, help="opening book to look the position up in first")
+    parser.add_argument("--tablebase", default=None, help="directory of endgame tables to probe during the search")
+    parser.add_argument("--shared-table", action="store_true", help="share one transposition table between workers")
+    args = parser.parse_args()
+
+    position = Position.from_fen(args.fen) if args.fen else Position()
+
+    def report(result: SearchResult) -> None:
+        print(
+            f"[ENGINE] depth {result.depth} score {result.score} nodes {result.nodes} "
+            f"nps {result.get_nps():.0f} time {result.elapsed:.2f}s pv {format_pv(position, result.pv)}"
+        )
+
+    if args.book:
+        with OpeningBook(args.book) as book:
+            if moves := book.get_moves(position):
+                print("[ENGINE] book " + ", ".join(f"{move_to_san(position, move)} ({weight})" for move, weight in moves))
+                return
+
+    limits = SearchLimits(args.depth, args.time, args.nodes)
+    if args.workers > 1:
+        with ParallelSearcher(args.workers, args.hash, args.shared_table, args.tablebase) as searcher:
+            result = searcher.search(position, limits, on_iteration=report)
+    else:
+        tablebase = Tablebase(args.tablebase) if args.tablebase else None
+        searcher = Searcher(position, TranspositionTable(args.hash), tablebase)
+        result = searcher.search(limits, on_iteration=report)
+        print(f"[ENGINE] hash {searcher.get_table().summary()}")
+        if tablebase is not None:
+            print(f"[ENGINE] tablebase hits {searcher.get_tablebase_hits()}")
+            tablebase.close()
+
+    print(f"[ENGINE] best move {move_to_san(position, result.best_move) if result.best_move else '(none)'}")
+
+if __name__ == "__main__":
+    main()
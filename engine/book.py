@@ -0,0 +1,132 @@
+import argparse
+import mmap
+import random
+import struct
+import time
+from typing import Dict, Iterable, List, Tuple
+
+from game import Move, Piece, Position
+from game.pgn import PgnGame, iter_pgn_file
+from game.san import san_to_move
+
+from .transposition import encode_move
+
+# public position hash, hidden queens counted as pawns, encoded move, weight, sorted by hash and then by weight, best first
+BOOK_RECORD = struct.Struct("<QHH")
+
+_MAX_WEIGHT = 0xFFFF
+
+# Points for the side that played the move, so moves from won games are preferred
+_RESULT_POINTS = {"1-0": (2, 0), "0-1": (0, 2), "1/2-1/2": (1, 1), "*": (1, 1)}
+
+def build_book(games: Iterable[PgnGame], path: str, max_plies: int = 20, min_games: int = 1) -> int:
+    entries: Dict[Tuple[int, int], List[int]] = {}
+
+    for game in games:
+        white_points, black_points = _RESULT_POINTS.get(game.result, (1, 1))
+        position = Position.from_fen(game.get_start_fen())
+
+        for san in game.moves[:max_plies]:
+            try:
+                move = san_to_move(position, san)
+            except ValueError:
+                break
+
+            points = white_points if position.get_colour_to_move() == Piece.WHITE else black_points
+            entry = entries.setdefault((position.get_public_hash(), encode_move(move)), [0, 0])
+            entry[0] += 1
+            entry[1] += points
+            position.make_move(move)
+
+    records = [(key, move, weight) for (key, move), (count, weight) in entries.items() if count >= min_games and weight > 0]
+
+    # Weights are stored in 16 bits, so scale everything down together rather than clip the popular moves
+    max_weight = max((weight for _, _, weight in records), default=0)
+    if max_weight > _MAX_WEIGHT:
+        records = [(key, move, max(1, weight * _MAX_WEIGHT // max_weight)) for key, move, weight in records]
+
+    records.sort(key=lambda record: (record[0], -record[2], record[1]))
+    with open(path, "wb") as f:
+        for record in records:
+            f.write(BOOK_RECORD.pack(*record))
+
+    return len(records)
+
+class OpeningBook:
+    def __init__(self, path: str) -> None:
+        # Mapped rather than read, so every process probing the same book shares one page-cached copy
+        self.__file = open(path, "rb")
+        try:
+            self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # An empty file cannot be mapped
+            self.__map = None
+        self.__size = len(self.__map) // BOOK_RECORD.size if self.__map is not None else 0
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def close(self) -> None:
+        if self.__map is not None:
+            self.__map.close()
+            self.__map = None
+        self.__file.close()
+
+    def __enter__(self) -> "OpeningBook":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __get_key(self, index: int) -> int:
+        return struct.unpack_from("<Q", self.__map, index * BOOK_RECORD.size)[0]
+
+    def get_entries(self, key: int) -> List[Tuple[int, int]]:
+        # Lower bound binary search straight over the mapped records
+        lo, hi = 0, self.__size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.__get_key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        entries = []
+        while lo < self.__size:
+            record_key, move, weight = BOOK_RECORD.unpack_from(self.__map, lo * BOOK_RECORD.size)
+            if record_key != key:
+                break
+            entries.append((move, weight))
+            lo += 1
+
+        return entries
+
+    def get_moves(self, position: Position) -> List[Tuple[Move, int]]:
+        # Keyed as the opponent sees the board, so a player's own hidden queen never hides a known opening
+        entries = self.get_entries(position.get_public_hash())
+        if not entries:
+            return []
+
+        # A hash collision or a stale book must never produce an illegal move
+        legal_moves = {encode_move(move): move for move in position.get_legal_moves()}
+        return [(legal_moves[move], weight) for move, weight in entries if move in legal_moves]
+
+    def choose_move(self, position: Position, rng: random.Random | None = None) -> Move | None:
+        moves = self.get_moves(position)
+        if not moves:
+            return None
+
+        rng = rng or random
+        return rng.choices([move for move, _ in moves], weights=[weight for _, weight in moves])[0]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build an opening book from archived games")
+    parser.add_argument("archive", help="PGN archive to read")
+    parser.add_argument("book", help="book file to write")
+    parser.add_argument("--max-plies", type=int, default=20, help="plies of each game to include")
+    parser.add_argument("--min-games", type=int, default=1, help="drop moves played in fewer games than this")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = build_book(iter_pgn_file(args.archive), args.book, args.max_plies, args.min_games)
+    print(f"[BOOK] Wrote {count} entries to {args.book} in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,188 @@
+from multiprocessing import Pool
+import time
+from typing import Callable, List, Tuple
+
+from game import Move, Position
+
+from .search import INFINITY, MAX_PLY, SearchLimits, SearchResult, Searcher, is_mate_score
+from .tablebase import Tablebase
+from .transposition import DEFAULT_SIZE_MB, TranspositionTable, encode_move
+
+# position bytes, root move, depth, alpha, beta, monotonic deadline, node budget
+SearchTask = Tuple[bytes, int, int, int, int, float | None, int | None]
+
+# root move, score, nodes, encoded pv after the root move
+TaskResult = Tuple[int, int, int, List[int]]
+
+_table: TranspositionTable | None = None
+_tablebase: Tablebase | None = None
+
+def _init_worker(table_mb: float, shared_name: str | None, tablebase_dir: str | None) -> None:
+    global _table, _tablebase
+    _tablebase = Tablebase(tablebase_dir) if tablebase_dir is not None else None
+    if shared_name is not None:
+        _table = TranspositionTable.attach_shared(shared_name, table_mb)
+    else:
+        _table = TranspositionTable(table_mb)
+
+def _find_move(position: Position, encoded_move: int) -> Move:
+    for move in position.get_legal_moves():
+        if encode_move(move) == encoded_move:
+            return move
+
+    raise ValueError(f"Move {encoded_move} is not legal in {position.get_fen()}")
+
+def _search_task(task: SearchTask) -> TaskResult | None:
+    data, encoded_move, depth, alpha, beta, deadline, nodes = task
+    position = Position.from_bytes(data)
+    position.make_move(_find_move(position, encoded_move))
+
+    # time.monotonic is system-wide, so a deadline set by the parent means the same instant here
+    time_left = None if deadline is None else max(0.0, deadline - time.monotonic())
+    result = Searcher(position, _table, _tablebase).search_window(depth - 1, -beta, -alpha, SearchLimits(time=time_left, nodes=nodes))
+    if result is None:
+        return None
+
+    # The child searched its own root, so a mate it found is one ply further from ours
+    score = -result.score
+    if is_mate_score(score):
+        score -= 1 if score > 0 else -1
+
+    return encoded_move, score, result.nodes, [encode_move(m) for m in result.pv]
+
+class ParallelSearcher:
+    def __init__(
+        self,
+        workers: int | None = None,
+        table_mb: float = DEFAULT_SIZE_MB,
+        shared_table: bool = False,
+        tablebase_dir: str | None = None
+    ) -> None:
+        # With a shared table every worker sees what the others found, otherwise each keeps its own
+        self.__table = TranspositionTable.create_shared(table_mb) if shared_table else None
+        shared_name = self.__table.get_shared_name() if self.__table is not None else None
+
+        self.__pool = Pool(processes=workers, initializer=_init_worker, initargs=(table_mb, shared_name, tablebase_dir))
+
+    def close(self) -> None:
+        self.__pool.close()
+        self.__pool.join()
+        if self.__table is not None:
+            self.__table.close(unlink=True)
+            self.__table = None
+
+    def __enter__(self) -> "ParallelSearcher":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def search(
+        self,
+        position: Position,
+        limits: SearchLimits | None = None,
+        on_iteration: Callable[[SearchResult], None] | None = None
+    ) -> SearchResult:
+        limits = limits or SearchLimits()
+        start = time.perf_counter()
+        deadline = time.monotonic() + limits.time if limits.time is not None else None
+
+        data = position.to_bytes()
+        root_moves = {encode_move(move): move for move in position.get_legal_moves()}
+        order = list(root_moves)
+
+        result = SearchResult()
+        nodes = 0
+        for depth in range(1, min(limits.depth, MAX_PLY) + 1):
+            if not order:
+                break
+
+            def make_task(encoded_move: int, alpha: int, beta: int) -> SearchTask:
+                budget = None
+                if limits.nodes is not None:
+                    budget = max(1, (limits.nodes - nodes) // len(order))
+                return (data, encoded_move, depth, alpha, beta, deadline, budget)
+
+            # The expected best move is searched alone to set the bar, the rest only need to show they beat it
+            first = self.__pool.apply(_search_task, (make_task(order[0], -INFINITY, INFINITY),))
+            if first is None:
+                break
+            best_move, best_score, searched, best_pv = first
+            nodes += searched
+
+            scores = {best_move: best_score}
+            fail_highs = []
+            complete = True
+            tasks = [make_task(m, best_score, best_score + 1) for m in order[1:]]
+            for task_result in self.__pool.imap_unordered(_search_task, tasks):
+                if task_result is None:
+                    complete = False
+                    continue
+
+                move, score, searched, pv = task_result
+                nodes += searched
+                scores[move] = score
+                if score > best_score:
+                    fail_highs.append(move)
+
+            # Moves that beat the null window are searched again with an open window to get their real score
+            for move in fail_highs:
+                task_result = self.__pool.apply(_search_task, (make_task(move, best_score, INFINITY),))
+                if task_result is None:
+                    complete = False
+                    break
+
+                move, score, searched, pv = task_result
+                nodes += searched
+                scores[move] = score
+                if score > best_score:
+                    best_move, best_score, best_pv = move, score, pv
+
+            if not complete:
+                break
+
+            order.sort(key=lambda m: INFINITY if m == best_move else scores.get(m, -INFINITY), reverse=True)
+
+            result.best_move = root_moves[best_move]
+            result.pv = [result.best_move] + self.__decode_pv(position, result.best_move, best_pv)
+            result.score = best_score
+            result.depth = depth
+            result.nodes = nodes
+            result.elapsed = time.perf_counter() - start
+
+            if on_iteration is not None:
+                on_iteration(result)
+
+            if is_mate_score(best_score):
+                break
+
+            if deadline is not None and time.monotonic() + result.elapsed > deadline:
+                break
+            if limits.nodes is not None and nodes >= limits.nodes:
+                break
+
+        if result.best_move is None and root_moves:
+            result.best_move = root_moves[order[0]]
+            result.pv = [result.best_move]
+
+        result.nodes = nodes
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    @staticmethod
+    def __decode_pv(position: Position, move: Move, pv: List[int]) -> List[Move]:
+        # Workers only send encoded moves back, so replay them here to recover full moves
+        moves = []
+        position.make_move(move)
+        try:
+            for encoded_move in pv:
+                next_move = _find_move(position, encoded_move)
+                moves.append(next_move)
+                position.make_move(next_move)
+        except ValueError:
+            pass
+        finally:
+            for _ in range(len(moves) + 1):
+                position.unmake_move()
+
+        return moves
@@ -0,0 +1,388 @@
+from dataclasses import dataclass, field
+import time
+from typing import Callable, List
+
+from game import Move, Piece, Position
+from game.evaluation import PIECE_VALUES
+from game.move import PROMOTION_TYPES, generate_moves, is_square_attacked
+from game.san import move_to_san
+
+from .tablebase import DRAW, WIN, Tablebase
+from .transposition import EXACT, LOWER_BOUND, UPPER_BOUND, TranspositionTable, encode_move
+
+MAX_PLY = 64
+MATE_SCORE = 100_000
+INFINITY = 1_000_000
+
+# Tablebase mates can lie far beyond the search horizon, so every score this close to mate counts as one
+_MATE_BOUND = MATE_SCORE - 1000
+
+# How often the clock is read, reading it every node costs more than the nodes themselves
+_TIME_CHECK_INTERVAL = 1024
+
+_PV_BONUS = 1_000_000
+_HASH_BONUS = 999_999
+_CAPTURE_BONUS = 100_000
+_KILLER_BONUS = 90_000
+
+class _SearchAborted(Exception):
+    pass
+
+@dataclass
+class SearchLimits:
+    depth: int = MAX_PLY
+    time: float | None = None
+    nodes: int | None = None
+
+@dataclass
+class SearchResult:
+    best_move: Move | None = None
+    score: int = 0
+    depth: int = 0
+    nodes: int = 0
+    elapsed: float = 0.0
+    pv: List[Move] = field(default_factory=list)
+
+    def get_nps(self) -> float:
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+def is_mate_score(score: int) -> bool:
+    return abs(score) >= _MATE_BOUND
+
+def _expand_promotions(moves: List[Move], colour: int) -> List[Move]:
+    expanded = []
+    for move in moves:
+        if move.promotion:
+            for promo_type in PROMOTION_TYPES:
+                expanded.append(Move(
+                    move.start, move.end, move.piece, move.captured_piece, promotion=True, promotion_piece=promo_type | colour
+                ))
+        else:
+            expanded.append(move)
+
+    return expanded
+
+def _mvv_lva(move: Move) -> int:
+    # Most valuable victim first, then least valuable attacker
+    score = 0
+    if move.captured_piece:
+        score += 10 * PIECE_VALUES[Piece.piece_type(move.captured_piece)] - PIECE_VALUES[Piece.piece_type(move.piece)]
+    if move.promotion:
+        score += PIECE_VALUES[Piece.piece_type(move.promotion_piece)]
+    return score
+
+def _score_to_table(score: int, ply: int) -> int:
+    # Mate scores are stored relative to the node, not the root, so they stay correct when reached by another path
+    if score >= _MATE_BOUND:
+        return score + ply
+    if score <= -_MATE_BOUND:
+        return score - ply
+    return score
+
+def _score_from_table(score: int, ply: int) -> int:
+    if score >= _MATE_BOUND:
+        return score - ply
+    if score <= -_MATE_BOUND:
+        return score + ply
+    return score
+
+def _is_same_move(a: Move | None, b: Move) -> bool:
+    return a is not None and a.start == b.start and a.end == b.end and a.promotion_piece == b.promotion_piece
+
+class Searcher:
+    def __init__(
+        self,
+        position: Position,
+        table: TranspositionTable | None = None,
+        tablebase: Tablebase | None = None
+    ) -> None:
+        self.__position = position
+        self.__table = table if table is not None else TranspositionTable()
+
+        self.__tablebase = tablebase
+        self.__tablebase_pieces = tablebase.get_max_pieces() if tablebase is not None else 0
+        self.__pieces = 0
+        self.__captures: List[bool] = []
+        self.__tablebase_hits = 0
+
+        self.__killers: List[List[Move | None]] = [[None, None] for _ in range(MAX_PLY + 1)]
+        self.__history: List[List[int]] = [[0] * 64 for _ in range(64)]
+        self.__pv: List[List[Move]] = [[] for _ in range(MAX_PLY + 1)]
+
+        self.__nodes = 0
+        self.__plies_made = 0
+        self.__deadline: float | None = None
+        self.__node_limit: int | None = None
+
+    def get_position(self) -> Position:
+        return self.__position
+
+    def get_table(self) -> TranspositionTable:
+        return self.__table
+
+    def get_tablebase_hits(self) -> int:
+        return self.__tablebase_hits
+
+    def search(
+        self,
+        limits: SearchLimits | None = None,
+        on_iteration: Callable[[SearchResult], None] | None = None
+    ) -> SearchResult:
+        limits = limits or SearchLimits()
+        start = time.perf_counter()
+        self.__reset(limits, start)
+        self.__table.new_search()
+
+        result = SearchResult()
+        for depth in range(1, min(limits.depth, MAX_PLY) + 1):
+            try:
+                score = self.__negamax(depth, 0, -INFINITY, INFINITY, result.pv)
+            except _SearchAborted:
+                self.__restore_position()
+
+                # Even a partial iteration is better than nothing when the first one did not finish
+                if result.best_move is None and self.__pv[0]:
+                    result.best_move = self.__pv[0][0]
+                    result.pv = self.__pv[0][:]
+                break
+
+            result.best_move = self.__pv[0][0] if self.__pv[0] else None
+            result.pv = self.__pv[0][:]
+            result.score = score
+            result.depth = depth
+            result.nodes = self.__nodes
+            result.elapsed = time.perf_counter() - start
+
+            if on_iteration is not None:
+                on_iteration(result)
+
+            if result.best_move is None or is_mate_score(score):
+                break
+
+            # The next iteration usually costs several times this one, so do not start what cannot finish
+            if self.__deadline is not None and time.perf_counter() + result.elapsed > self.__deadline:
+                break
+
+        if result.best_move is None and (moves := self.__position.get_legal_moves()):
+            result.best_move = moves[0]
+            result.pv = [moves[0]]
+
+        result.nodes = self.__nodes
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    def search_window(self, depth: int, alpha: int, beta: int, limits: SearchLimits | None = None) -> SearchResult | None:
+        # A single fixed-depth search inside the given window, None if the limits cut it short
+        start = time.perf_counter()
+        self.__reset(limits or SearchLimits(), start)
+
+        try:
+            score = self.__negamax(depth, 0, alpha, beta, [])
+        except _SearchAborted:
+            self.__restore_position()
+            return None
+
+        pv = self.__pv[0][:]
+        return SearchResult(pv[0] if pv else None, score, depth, self.__nodes, time.perf_counter() - start, pv)
+
+    def __reset(self, limits: SearchLimits, start: float) -> None:
+        self.__nodes = 0
+        self.__plies_made = 0
+        self.__pieces = sum(1 for square in range(64) if self.__position.get_square(square) != Piece.NONE)
+        self.__captures = []
+        self.__tablebase_hits = 0
+        self.__deadline = start + limits.time if limits.time is not None else None
+        self.__node_limit = limits.nodes
+        self.__killers = [[None, None] for _ in range(MAX_PLY + 1)]
+        self.__history = [[0] * 64 for _ in range(64)]
+
+    def __restore_position(self) -> None:
+        # Leave the position exactly as it was handed to us
+        for _ in range(self.__plies_made):
+            self.__position.unmake_move()
+        self.__plies_made = 0
+        self.__pieces += sum(self.__captures)
+        self.__captures = []
+
+    def __visit(self) -> None:
+        self.__nodes += 1
+
+        if self.__node_limit is not None and self.__nodes >= self.__node_limit:
+            raise _SearchAborted()
+
+        if self.__deadline is not None and self.__nodes % _TIME_CHECK_INTERVAL == 0 and time.perf_counter() >= self.__deadline:
+            raise _SearchAborted()
+
+    def __evaluate(self) -> int:
+        evaluation = self.__position.get_evaluation()
+        return evaluation if self.__position.get_colour_to_move() == Piece.WHITE else -evaluation
+
+    def __is_in_check(self, colour: int) -> bool:
+        return is_square_attacked(self.__position, self.__position.get_king_square(colour), Piece.opposite_colour(colour))
+
+    def __make_move(self, move: Move, colour: int) -> bool:
+        # Moves are generated pseudo-legally, so legality is only paid for moves that are actually searched
+        self.__position.make_move(move)
+        self.__plies_made += 1
+
+        captured = bool(move.captured_piece)
+        self.__captures.append(captured)
+        self.__pieces -= captured
+
+        if self.__is_in_check(colour):
+            self.__unmake_move()
+            return False
+
+        return True
+
+    def __unmake_move(self) -> None:
+        self.__position.unmake_move()
+        self.__plies_made -= 1
+        self.__pieces += self.__captures.pop()
+
+    def __order_moves(self, moves: List[Move], ply: int, pv_move: Move | None, hash_move: int) -> List[Move]:
+        killers = self.__killers[ply]
+
+        def score(move: Move) -> int:
+            if _is_same_move(pv_move, move):
+                return _PV_BONUS
+            if hash_move and encode_move(move) == hash_move:
+                return _HASH_BONUS
+            if move.captured_piece or move.promotion:
+                return _CAPTURE_BONUS + _mvv_lva(move)
+            if _is_same_move(killers[0], move):
+                return _KILLER_BONUS
+            if _is_same_move(killers[1], move):
+                return _KILLER_BONUS - 1
+            return self.__history[move.start][move.end]
+
+        return sorted(moves, key=score, reverse=True)
+
+    def __store_killer(self, move: Move, ply: int) -> None:
+        killers = self.__killers[ply]
+        if not _is_same_move(killers[0], move):
+            killers[1] = killers[0]
+            killers[0] = move
+
+    def __negamax(self, depth: int, ply: int, alpha: int, beta: int, pv_line: List[Move]) -> int:
+        self.__visit()
+        self.__pv[ply] = []
+        position = self.__position
+
+        if ply > 0 and (position.get_repetition_count() >= 2 or position.get_halfmove_clock() >= 50):
+            return 0
+
+        # The piece count is tracked through the search, so the full board scan of a probe is only paid when it can hit
+        if ply > 0 and self.__pieces <= self.__tablebase_pieces and (result := self.__tablebase.probe(position)) is not None:
+            self.__tablebase_hits += 1
+            wdl, dtm = result
+            if wdl == DRAW:
+                return 0
+            return MATE_SCORE - ply - dtm if wdl == WIN else -MATE_SCORE + ply + dtm
+
+        colour = position.get_colour_to_move()
+        in_check = self.__is_in_check(colour)
+
+        # Never stand still in check, a forced sequence of checks could otherwise hide a mate
+        if in_check:
+            depth += 1
+
+        if depth <= 0 or ply >= MAX_PLY:
+            return self.__quiescence(ply, alpha, beta)
+
+        key = position.get_hash()
+        hash_move = 0
+        if (entry := self.__table.probe(key)) is not None:
+            entry_depth, bound, entry_score, hash_move = entry
+
+            # The root always searches, so there is a best move and a PV to report
+            if ply > 0 and entry_depth >= depth:
+                entry_score = _score_from_table(entry_score, ply)
+                if (
+                    bound == EXACT or
+                    (bound == LOWER_BOUND and entry_score >= beta) or
+                    (bound == UPPER_BOUND and entry_score <= alpha)
+                ):
+                    return entry_score
+
+        pv_move = pv_line[0] if pv_line else None
+        moves = self.__order_moves(_expand_promotions(generate_moves(position, colour), colour), ply, pv_move, hash_move)
+
+        original_alpha = alpha
+        legal_moves = 0
+        best_score = -INFINITY
+        best_move = None
+        for move in moves:
+            if not self.__make_move(move, colour):
+                continue
+            legal_moves += 1
+
+            child_line = pv_line[1:] if _is_same_move(pv_move, move) else []
+            score = -self.__negamax(depth - 1, ply + 1, -beta, -alpha, child_line)
+            self.__unmake_move()
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+
+            if score > alpha:
+                alpha = score
+                self.__pv[ply] = [move] + self.__pv[ply + 1]
+
+                if alpha >= beta:
+                    if not move.captured_piece:
+                        self.__store_killer(move, ply)
+                        self.__history[move.start][move.end] += depth * depth
+                    break
+
+        if legal_moves == 0:
+            return -MATE_SCORE + ply if in_check else 0
+
+        if best_score >= beta:
+            bound = LOWER_BOUND
+        elif best_score > original_alpha:
+            bound = EXACT
+        else:
+            bound = UPPER_BOUND
+        self.__table.store(key, depth, bound, _score_to_table(best_score, ply), encode_move(best_move))
+
+        return best_score
+
+    def __quiescence(self, ply: int, alpha: int, beta: int) -> int:
+        self.__visit()
+        self.__pv[ply] = []
+
+        # Only captures and promotions are searched, so the side to move can always decline them
+        stand_pat = self.__evaluate()
+        if stand_pat >= beta or ply >= MAX_PLY:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+
+        colour = self.__position.get_colour_to_move()
+        moves = [m for m in generate_moves(self.__position, colour) if m.captured_piece or m.promotion]
+        moves = sorted(_expand_promotions(moves, colour), key=_mvv_lva, reverse=True)
+
+        for move in moves:
+            if not self.__make_move(move, colour):
+                continue
+
+            score = -self.__quiescence(ply + 1, -beta, -alpha)
+            self.__unmake_move()
+
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+
+        return alpha
+
+def format_pv(position: Position, pv: List[Move]) -> str:
+    sans = []
+    for move in pv:
+        sans.append(move_to_san(position, move))
+        position.make_move(move)
+
+    for _ in pv:
+        position.unmake_move()
+
+    return " ".join(sans)
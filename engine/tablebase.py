@@ -0,0 +1,569 @@
+import argparse
+from array import array
+import mmap
+import os
+import struct
+import time
+from typing import Dict, Iterator, List, Tuple
+
+from game import Move, Piece, Position
+from game.castling_rights import CastlingRights
+from game.move import generate_legal_moves
+
+WIN = 1
+DRAW = 0
+LOSS = -1
+
+# One byte per position: 0 draw, 1-127 win in that many plies, 128-254 loss in (value - 128) plies
+_DRAW_VALUE = 0
+_LOSS_OFFSET = 128
+_MAX_DTM = 126
+_INVALID_VALUE = 255
+
+_HEADER = struct.Struct("<4sB15sI")
+_MAGIC = b"HQTB"
+_VERSION = 1
+
+_PIECE_ORDER = "QRBNP"
+_PIECE_TYPES = {"Q": Piece.QUEEN, "R": Piece.ROOK, "B": Piece.BISHOP, "N": Piece.KNIGHT, "P": Piece.PAWN}
+_PIECE_VALUES = {"K": 0, "Q": 9, "R": 5, "B": 3, "N": 3, "P": 1}
+
+# Without pawns the white king can always be moved into a1-d1-d4, with pawns only a left-right mirror is allowed
+_TRIANGLE = (0, 1, 2, 3, 9, 10, 11, 18, 19, 27)
+_HALF_BOARD = tuple(rank * 8 + file for rank in range(8) for file in range(4))
+
+def _transform(square: int, transform: int) -> int:
+    rank, file = divmod(square, 8)
+    if transform & 1:
+        file = 7 - file
+    if transform & 2:
+        rank = 7 - rank
+    if transform & 4:
+        rank, file = file, rank
+    return rank * 8 + file
+
+_TRANSFORMS = [[_transform(square, t) for square in range(64)] for t in range(8)]
+
+def _first_transform(square: int, region: Tuple[int, ...], transforms: range) -> int:
+    return next(t for t in transforms if _TRANSFORMS[t][square] in region)
+
+_PAWNLESS_KING_TRANSFORM = [_first_transform(square, _TRIANGLE, range(8)) for square in range(64)]
+_PAWN_KING_TRANSFORM = [_first_transform(square, _HALF_BOARD, range(2)) for square in range(64)]
+_TRIANGLE_INDEX = {square: i for i, square in enumerate(_TRIANGLE)}
+_HALF_BOARD_INDEX = {square: i for i, square in enumerate(_HALF_BOARD)}
+
+# (colour, type) of each piece in table order, white king and black king first
+PieceList = List[Tuple[int, int]]
+
+def _side_key(side: str) -> Tuple[int, str]:
+    return (sum(_PIECE_VALUES[c] for c in side), side)
+
+def normalise_signature(signature: str) -> str:
+    white, black = signature.upper().split("V")
+    white = "K" + "".join(sorted(white.replace("K", ""), key=_PIECE_ORDER.index))
+    black = "K" + "".join(sorted(black.replace("K", ""), key=_PIECE_ORDER.index))
+
+    # Tables are only stored with the stronger side as White, the other way round is probed colour-flipped
+    if _side_key(black) > _side_key(white):
+        white, black = black, white
+    return f"{white}v{black}"
+
+def iter_signatures(pieces: int) -> Iterator[str]:
+    seen = set()
+    extra = pieces - 2
+
+    def combinations(count: int, start: int = 0) -> Iterator[str]:
+        if count == 0:
+            yield ""
+            return
+        for i in range(start, len(_PIECE_ORDER)):
+            for rest in combinations(count - 1, i):
+                yield _PIECE_ORDER[i] + rest
+
+    for white_count in range(extra + 1):
+        for white in combinations(white_count):
+            for black in combinations(extra - white_count):
+                signature = normalise_signature(f"K{white}vK{black}")
+                if signature not in seen:
+                    seen.add(signature)
+                    yield signature
+
+def _get_children(signature: str) -> List[str]:
+    # Every table a capture or promotion can lead to, which has to exist before this one is generated
+    white, black = signature.split("v")
+    children = set()
+    for side, other, is_white in ((white, black, True), (black, white, False)):
+        for i, letter in enumerate(side):
+            if letter == "K":
+                continue
+            remaining = side[:i] + side[i + 1:]
+            children.add(f"{remaining}v{other}" if is_white else f"{other}v{remaining}")
+            if letter == "P":
+                for promotion in "QRBN":
+                    promoted = remaining + promotion
+                    children.add(f"{promoted}v{other}" if is_white else f"{other}v{promoted}")
+
+    return sorted(normalise_signature(child) for child in children if len(child) > 3)
+
+class TableLayout:
+    def __init__(self, signature: str) -> None:
+        self.signature = normalise_signature(signature)
+        white, black = self.signature.split("v")
+
+        self.pieces: PieceList = [(Piece.WHITE, Piece.KING), (Piece.BLACK, Piece.KING)]
+        self.pieces += [(Piece.WHITE, _PIECE_TYPES[c]) for c in white[1:]]
+        self.pieces += [(Piece.BLACK, _PIECE_TYPES[c]) for c in black[1:]]
+
+        self.has_pawns = "P" in self.signature
+        self.king_transform = _PAWN_KING_TRANSFORM if self.has_pawns else _PAWNLESS_KING_TRANSFORM
+        self.king_index = _HALF_BOARD_INDEX if self.has_pawns else _TRIANGLE_INDEX
+        self.king_squares = _HALF_BOARD if self.has_pawns else _TRIANGLE
+        self.size = 2 * len(self.king_squares) * 64 ** (len(self.pieces) - 1)
+
+    def get_index(self, squares: List[int], colour_to_move: int) -> int:
+        transform = _TRANSFORMS[self.king_transform[squares[0]]]
+
+        index = (0 if colour_to_move == Piece.WHITE else 1) * len(self.king_squares) + self.king_index[transform[squares[0]]]
+        for square in squares[1:]:
+            index = index * 64 + transform[square]
+        return index
+
+    def get_squares(self, index: int) -> Tuple[List[int], int]:
+        squares = []
+        for _ in range(len(self.pieces) - 1):
+            index, square = divmod(index, 64)
+            squares.append(square)
+
+        side, king = divmod(index, len(self.king_squares))
+        squares.append(self.king_squares[king])
+        squares.reverse()
+        return squares, Piece.WHITE if side == 0 else Piece.BLACK
+
+def _get_value(wdl: int, dtm: int) -> int:
+    if wdl == WIN:
+        return dtm
+    if wdl == LOSS:
+        return _LOSS_OFFSET + dtm
+    return _DRAW_VALUE
+
+def _get_result(value: int) -> Tuple[int, int]:
+    if value == _DRAW_VALUE:
+        return DRAW, 0
+    if value < _LOSS_OFFSET:
+        return WIN, value
+    return LOSS, value - _LOSS_OFFSET
+
+class TablebaseFile:
+    def __init__(self, path: str) -> None:
+        # Mapped rather than read, so every process probing the same file shares the page cache
+        self.__file = open(path, "rb")
+        self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, signature, size = _HEADER.unpack_from(self.__map, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"{path} is not a tablebase file")
+
+        self.layout = TableLayout(signature.rstrip(b"\0").decode())
+        if size != self.layout.size or len(self.__map) != _HEADER.size + size:
+            raise ValueError(f"{path} is truncated or has the wrong size")
+
+    def get_value(self, index: int) -> int:
+        return self.__map[_HEADER.size + index]
+
+    def close(self) -> None:
+        self.__map.close()
+        self.__file.close()
+
+class Tablebase:
+    def __init__(self, directory: str) -> None:
+        self.__directory = directory
+        self.__files: Dict[str, TablebaseFile | None] = {}
+
+        signatures = [name[:-5] for name in os.listdir(directory) if name.endswith(".hqtb")] if os.path.isdir(directory) else []
+        self.__max_pieces = max((len(s) - 1 for s in signatures), default=0)
+
+    def get_max_pieces(self) -> int:
+        return self.__max_pieces
+
+    def close(self) -> None:
+        for table in self.__files.values():
+            if table is not None:
+                table.close()
+        self.__files.clear()
+
+    def __get_file(self, signature: str) -> TablebaseFile | None:
+        if signature not in self.__files:
+            path = get_table_path(self.__directory, signature)
+            self.__files[signature] = TablebaseFile(path) if os.path.exists(path) else None
+        return self.__files[signature]
+
+    def probe_pieces(self, pieces: List[Tuple[int, int, int]], colour_to_move: int) -> int | None:
+        # pieces are (colour, type, square), returns the raw value byte for the side to move
+        white = "".join(sorted((_letter(t) for c, t, _ in pieces if c == Piece.WHITE), key="KQRBNP".index))
+        black = "".join(sorted((_letter(t) for c, t, _ in pieces if c == Piece.BLACK), key="KQRBNP".index))
+        if white == "K" and black == "K":
+            return _DRAW_VALUE
+
+        signature = f"{white}v{black}"
+        canonical = normalise_signature(signature)
+        if canonical != signature:
+            # Swap colours and mirror the ranks so the stronger side is White
+            pieces = [(Piece.opposite_colour(c), t, s ^ 56) for c, t, s in pieces]
+            colour_to_move = Piece.opposite_colour(colour_to_move)
+
+        table = self.__get_file(canonical)
+        if table is None:
+            return None
+
+        squares = []
+        remaining = list(pieces)
+        for colour, piece_type in table.layout.pieces:
+            for i, (c, t, s) in enumerate(remaining):
+                if c == colour and t == piece_type:
+                    squares.append(s)
+                    del remaining[i]
+                    break
+
+        return table.get_value(table.layout.get_index(squares, colour_to_move))
+
+    def probe(self, position: Position) -> Tuple[int, int] | None:
+        # (WIN/DRAW/LOSS, plies to mate) for the side to move, None when no table covers the position
+        if position.get_castling_rights() != CastlingRights.NONE or position.get_enpassant_square() is not None:
+            return None
+
+        pieces = []
+        for square in range(64):
+            piece = position.get_square(square)
+            if piece != Piece.NONE:
+                if Piece.is_hidden_queen(piece) or len(pieces) == self.__max_pieces:
+                    return None
+                pieces.append((Piece.colour(piece), Piece.piece_type(piece), square))
+
+        value = self.probe_pieces(pieces, position.get_colour_to_move())
+        if value is None or value == _INVALID_VALUE:
+            return None
+        return _get_result(value)
+
+def _letter(piece_type: int) -> str:
+    return Piece.piece_letter(piece_type) or "P"
+
+def get_table_path(directory: str, signature: str) -> str:
+    return os.path.join(directory, f"{signature}.hqtb")
+
+# Per-worker state for generation
+_layout: TableLayout | None = None
+_children: Tablebase | None = None
+
+_INVALID = 1
+_MATED = 2
+_STALEMATE = 3
+_NO_EXTERNAL = 255
+
+def _init_worker(signature: str, directory: str) -> None:
+    global _layout, _children
+    _layout = TableLayout(signature)
+    _children = Tablebase(directory)
+
+def _generate_chunk(bounds: Tuple[int, int]) -> Tuple[bytes, bytes, bytes, array, List[Tuple[int, int, int]]]:
+    start, end = bounds
+    status = bytearray(end - start)
+    external = bytearray([_NO_EXTERNAL]) * (end - start)
+    counts = bytearray(end - start)
+    successors = array("I")
+    # (edge, table position, value of the en passant captures) for double pushes the opponent can answer en passant
+    enpassant_edges: List[Tuple[int, int, int]] = []
+    position = Position()
+
+    for i, index in enumerate(range(start, end)):
+        squares, colour = _layout.get_squares(index)
+        board = [Piece.NONE] * 64
+        valid = len(set(squares)) == len(squares)
+        for (piece_colour, piece_type), square in zip(_layout.pieces, squares):
+            if piece_type == Piece.PAWN and square // 8 in (0, 7):
+                valid = False
+            board[square] = piece_type | piece_colour
+
+        if not valid:
+            status[i] = _INVALID
+            continue
+
+        position.set_position(board, colour, CastlingRights.NONE)
+        if position.is_in_check(Piece.opposite_colour(colour)):
+            status[i] = _INVALID
+            continue
+
+        moves = generate_legal_moves(position, colour)
+        if not moves:
+            status[i] = _MATED if position.is_in_check(colour) else _STALEMATE
+            continue
+
+        best_external = None
+        for move in moves:
+            if move.captured_piece or move.promotion:
+                # The move leaves this table, so its value comes from an already generated smaller or promoted one
+                next_pieces = []
+                for (piece_colour, piece_type), square in zip(_layout.pieces, squares):
+                    if square == move.end:
+                        continue
+                    if square == move.start:
+                        square = move.end
+                        if move.promotion:
+                            piece_type = Piece.piece_type(move.promotion_piece)
+                    next_pieces.append((piece_colour, piece_type, square))
+
+                value = _children.probe_pieces(next_pieces, Piece.opposite_colour(colour))
+                if value is None:
+                    raise RuntimeError(f"Missing table for a capture or promotion from {_layout.signature}")
+
+                best_external = _better_external(best_external, _negate(value))
+            else:
+                next_squares = [move.end if s == move.start else s for s in squares]
+                target = _layout.get_index(next_squares, Piece.opposite_colour(colour))
+                if (enpassant_value := _get_enpassant_value(next_squares, move)) is not None:
+                    enpassant_edges.append((len(successors), target, enpassant_value))
+                successors.append(target)
+                counts[i] += 1
+
+        if best_external is not None:
+            external[i] = best_external
+
+    return bytes(status), bytes(external), bytes(counts), successors, enpassant_edges
+
+def _get_enpassant_value(squares: List[int], move: Move) -> int | None:
+    # After a double push the opponent may be able to capture en passant, which the table position with the same
+    # pieces cannot, so the best such capture is returned for the position to be given its own node
+    if Piece.piece_type(move.piece) != Piece.PAWN or abs(move.end - move.start) != 16:
+        return None
+
+    colour = Piece.opposite_colour(Piece.colour(move.piece))
+    board = [Piece.NONE] * 64
+    for (piece_colour, piece_type), square in zip(_layout.pieces, squares):
+        board[square] = piece_type | piece_colour
+
+    rank, file = divmod(move.end, 8)
+    if not any(0 <= f < 8 and board[rank * 8 + f] == Piece.PAWN | colour for f in (file - 1, file + 1)):
+        return None
+
+    position = Position.from_position(board, colour, CastlingRights.NONE, (move.start + move.end) // 2)
+    best = None
+    for capture in generate_legal_moves(position, colour):
+        if not capture.enpassant:
+            continue
+
+        captured_square = move.end
+        next_pieces = [
+            (piece_colour, piece_type, capture.end if square == capture.start else square)
+            for (piece_colour, piece_type), square in zip(_layout.pieces, squares) if square != captured_square
+        ]
+        value = _children.probe_pieces(next_pieces, Piece.opposite_colour(colour))
+        if value is None:
+            raise RuntimeError(f"Missing table for an en passant capture from {_layout.signature}")
+        best = _better_external(best, _negate(value))
+
+    return best
+
+def _negate(value: int) -> int:
+    # A value for the opponent after our move, as a value for us one ply earlier
+    wdl, dtm = _get_result(value)
+    if wdl != DRAW and dtm + 1 > _MAX_DTM:
+        raise RuntimeError(f"A mate longer than {_MAX_DTM} plies does not fit in a table value")
+    if wdl == WIN:
+        return _get_value(LOSS, dtm + 1)
+    if wdl == LOSS:
+        return _get_value(WIN, dtm + 1)
+    return _DRAW_VALUE
+
+def _rank(value: int) -> Tuple[int, int]:
+    wdl, dtm = _get_result(value)
+    return (wdl, -dtm if wdl == WIN else dtm)
+
+def _better_external(current: int | None, value: int) -> int:
+    if current is None or _rank(value) > _rank(current):
+        return value
+    return current
+
+def generate_table(signature: str, directory: str, workers: int | None = None, chunk_size: int = 4096) -> str:
+    layout = TableLayout(signature)
+    start = time.perf_counter()
+    os.makedirs(directory, exist_ok=True)
+
+    chunks = [(i, min(i + chunk_size, layout.size)) for i in range(0, layout.size, chunk_size)]
+    status = bytearray()
+    external = bytearray()
+    counts = bytearray()
+    successors = array("I")
+    enpassant_edges = []
+
+    # Building the move graph is the expensive part and every position is independent, so it is spread over cores.
+    # Pool is imported here since searches only read finished tables and should not pay for multiprocessing
+    from multiprocessing import Pool
+    with Pool(processes=workers, initializer=_init_worker, initargs=(layout.signature, directory)) as pool:
+        for chunk_status, chunk_external, chunk_counts, chunk_successors, chunk_edges in pool.imap(_generate_chunk, chunks):
+            enpassant_edges += [(len(successors) + edge, target, value) for edge, target, value in chunk_edges]
+            status += chunk_status
+            external += chunk_external
+            counts += chunk_counts
+            successors += chunk_successors
+
+    size = _add_enpassant_nodes(layout.size, status, external, counts, successors, enpassant_edges)
+    values = _retrograde(size, status, external, counts, successors)[:layout.size]
+
+    path = get_table_path(directory, layout.signature)
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, layout.signature.encode(), layout.size))
+        f.write(values)
+    os.replace(temp_path, path)
+
+    wins = sum(1 for v in values if 0 < v < _LOSS_OFFSET)
+    losses = sum(1 for v in values if _LOSS_OFFSET <= v < _INVALID_VALUE)
+    longest = max((v for v in values if 0 < v < _LOSS_OFFSET), default=0)
+    print(
+        f"[TABLEBASE] {layout.signature}: {layout.size} positions, {wins} wins, {losses} losses, "
+        f"longest mate {longest} plies, {time.perf_counter() - start:.1f}s"
+    )
+    return path
+
+def _add_enpassant_nodes(
+    size: int,
+    status: bytearray,
+    external: bytearray,
+    counts: bytearray,
+    successors: array,
+    enpassant_edges: List[Tuple[int, int, int]]
+) -> int:
+    # A position with an en passant capture available gets a node past the end of the table: the moves of the table
+    # position with the same pieces plus the capture, which is resolved with the rest and then dropped
+    nodes: Dict[Tuple[int, int], int] = {}
+    for edge, target, value in enpassant_edges:
+        if (node := nodes.get((target, value))) is None:
+            node = nodes[(target, value)] = size + len(nodes)
+        successors[edge] = node
+
+    first_edges = array("I", bytes(4 * (size + 1)))
+    for i in range(size):
+        first_edges[i + 1] = first_edges[i] + counts[i]
+
+    # Appended in node order, which is the order _retrograde walks the successor edges in
+    for target, value in nodes:
+        if status[target] == _INVALID:
+            raise RuntimeError("A legal double push led to an invalid table position")
+        successors += successors[first_edges[target]:first_edges[target] + counts[target]]
+        counts.append(counts[target])
+        # Mated or stalemated without the capture, with it the capture is the only move
+        status.append(0)
+        external.append(value if external[target] == _NO_EXTERNAL else _better_external(external[target], value))
+
+    return size + len(nodes)
+
+def _retrograde(size: int, status: bytes, external: bytes, counts: bytes, successors: array) -> bytearray:
+    # Predecessor lists in compressed form, built by counting sort over the successor edges
+    offsets = array("I", bytes(4 * (size + 1)))
+    for target in successors:
+        offsets[target + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+
+    predecessors = array("I", bytes(4 * len(successors)))
+    fill = array("I", offsets)
+    edge = 0
+    for source in range(size):
+        for _ in range(counts[source]):
+            target = successors[edge]
+            predecessors[fill[target]] = source
+            fill[target] += 1
+            edge += 1
+
+    values = bytearray([_DRAW_VALUE]) * size
+    resolved = bytearray(size)
+    remaining = bytearray(counts)
+
+    # Positions are resolved in order of distance to mate, so the first result a position gets is the shortest
+    buckets: List[List[Tuple[int, int]]] = [[] for _ in range(_MAX_DTM + 2)]
+    for index in range(size):
+        if status[index] == _INVALID:
+            values[index] = _INVALID_VALUE
+            resolved[index] = 1
+        elif status[index] == _MATED:
+            buckets[0].append((index, LOSS))
+        elif status[index] == _STALEMATE:
+            resolved[index] = 1
+        elif external[index] != _NO_EXTERNAL:
+            wdl, dtm = _get_result(external[index])
+            if wdl == WIN:
+                buckets[dtm].append((index, WIN))
+            elif remaining[index] == 0 and wdl == LOSS:
+                buckets[dtm].append((index, LOSS))
+            elif remaining[index] == 0:
+                resolved[index] = 1
+
+    for dtm in range(_MAX_DTM + 1):
+        for index, wdl in buckets[dtm]:
+            if resolved[index]:
+                continue
+            resolved[index] = 1
+            values[index] = _get_value(wdl, dtm)
+
+            for p in range(offsets[index], offsets[index + 1]):
+                predecessor = predecessors[p]
+                if resolved[predecessor]:
+                    continue
+
+                if wdl == LOSS:
+                    buckets[dtm + 1].append((predecessor, WIN))
+                    continue
+
+                remaining[predecessor] -= 1
+                if remaining[predecessor] == 0:
+                    # Every move loses unless a capture or promotion holds, and the loss takes as long as the longest line
+                    fallback = external[predecessor]
+                    if fallback == _NO_EXTERNAL:
+                        buckets[dtm + 1].append((predecessor, LOSS))
+                    else:
+                        fallback_wdl, fallback_dtm = _get_result(fallback)
+                        if fallback_wdl == LOSS:
+                            buckets[max(dtm + 1, fallback_dtm)].append((predecessor, LOSS))
+
+    # A mate one ply longer than a value can hold was never resolved, and left alone it would be stored as a draw
+    if any(not resolved[index] for index, _ in buckets[_MAX_DTM + 1]):
+        raise RuntimeError(f"A mate longer than {_MAX_DTM} plies does not fit in a table value")
+
+    # Anything never forced either way is a draw, which is how the values start out
+    return values
+
+def generate_all(pieces: int, directory: str, workers: int | None = None) -> None:
+    os.makedirs(directory, exist_ok=True)
+
+    done = set()
+
+    def generate(signature: str) -> None:
+        if signature in done:
+            return
+        for child in _get_children(signature):
+            generate(child)
+        if not os.path.exists(get_table_path(directory, signature)):
+            generate_table(signature, directory, workers)
+        done.add(signature)
+
+    for count in range(3, pieces + 1):
+        for signature in iter_signatures(count):
+            generate(signature)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate endgame tablebases by retrograde analysis")
+    parser.add_argument("signatures", nargs="*", help="tables such as KQvK or KRvKP, all 3 and 4 piece tables by default")
+    parser.add_argument("--dir", default="tablebases", help="directory to write tables to")
+    parser.add_argument("--pieces", type=int, default=4, choices=(3, 4), help="largest tables to generate when none are named")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    if args.signatures:
+        os.makedirs(args.dir, exist_ok=True)
+        for signature in args.signatures:
+            signature = normalise_signature(signature)
+            for child in _get_children(signature):
+                if not os.path.exists(get_table_path(args.dir, child)):
+                    generate_table(child, args.dir, args.workers)
+            generate_table(signature, args.dir, args.workers)
+    else:
+        generate_all(args.pieces, args.dir, args.workers)
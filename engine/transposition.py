@@ -0,0 +1,188 @@
+from typing import TYPE_CHECKING, Dict, Tuple
+
+from game import Move, Piece
+
+# Imported where a table is shared, most processes only ever use a private one and skip multiprocessing's start up
+if TYPE_CHECKING:
+    from multiprocessing import shared_memory
+
+DEFAULT_SIZE_MB = 16
+
+EMPTY = 0
+EXACT = 1
+LOWER_BOUND = 2
+UPPER_BOUND = 3
+
+# Column layout of one entry, widest first so every column stays aligned: key, score, move, depth, bound, generation
+_COLUMNS = (("Q", 8), ("i", 4), ("H", 2), ("b", 1), ("B", 1), ("B", 1))
+ENTRY_SIZE = sum(size for _, size in _COLUMNS)
+
+# Slot 0 of each bucket keeps the deepest result, slot 1 always takes the newest
+_BUCKET_SIZE = 2
+
+def encode_move(move: Move | None) -> int:
+    if move is None:
+        return 0
+    return move.start | move.end << 6 | Piece.piece_type(move.promotion_piece) << 12
+
+def _get_bucket_count(size_mb: float) -> int:
+    return max(1, int(size_mb * 1024 * 1024) // (ENTRY_SIZE * _BUCKET_SIZE))
+
+def _pack(score: int, move: int, depth: int, bound: int) -> int:
+    return (score & 0xFFFFFFFF) | move << 32 | (depth & 0xFF) << 48 | bound << 56
+
+class TranspositionTable:
+    def __init__(self, size_mb: float = DEFAULT_SIZE_MB, buffer: memoryview | bytearray | None = None) -> None:
+        self.__buckets = _get_bucket_count(size_mb)
+        self.__size_mb = size_mb
+
+        slots = self.__buckets * _BUCKET_SIZE
+        if buffer is None:
+            buffer = bytearray(slots * ENTRY_SIZE)
+
+        # Parallel typed columns over one flat buffer rather than entry objects, so memory is fixed up front
+        # and the same table can live in shared memory
+        columns = []
+        offset = 0
+        view = memoryview(buffer)
+        for fmt, size in _COLUMNS:
+            columns.append(view[offset:offset + slots * size].cast(fmt))
+            offset += slots * size
+        self.__keys, self.__scores, self.__moves, self.__depths, self.__bounds, self.__generations = columns
+
+        self.__shared_memory: "shared_memory.SharedMemory | None" = None
+        self.__generation = 0
+        self.__probes = 0
+        self.__hits = 0
+        self.__stores = 0
+        self.__replacements = 0
+
+    @classmethod
+    def create_shared(cls, size_mb: float = DEFAULT_SIZE_MB) -> "TranspositionTable":
+        from multiprocessing import shared_memory
+        memory = shared_memory.SharedMemory(create=True, size=_get_bucket_count(size_mb) * _BUCKET_SIZE * ENTRY_SIZE)
+        table = cls(size_mb, memory.buf)
+        table.__shared_memory = memory
+        return table
+
+    @classmethod
+    def attach_shared(cls, name: str, size_mb: float) -> "TranspositionTable":
+        from multiprocessing import shared_memory
+        memory = shared_memory.SharedMemory(name=name)
+        table = cls(size_mb, memory.buf)
+        table.__shared_memory = memory
+        return table
+
+    def get_shared_name(self) -> str | None:
+        return self.__shared_memory.name if self.__shared_memory is not None else None
+
+    def close(self, unlink: bool = False) -> None:
+        if self.__shared_memory is None:
+            return
+
+        # Views into the segment must be released before it can be closed
+        for column in (self.__keys, self.__scores, self.__moves, self.__depths, self.__bounds, self.__generations):
+            column.release()
+
+        self.__shared_memory.close()
+        if unlink:
+            self.__shared_memory.unlink()
+        self.__shared_memory = None
+
+    def get_capacity(self) -> int:
+        return self.__buckets * _BUCKET_SIZE
+
+    def get_size_mb(self) -> float:
+        return self.__size_mb
+
+    def new_search(self) -> None:
+        # Entries from earlier searches stay usable but lose their claim on the depth-preferred slot
+        self.__generation = (self.__generation + 1) & 0xFF
+
+    def clear(self) -> None:
+        self.__bounds[:] = bytes(self.get_capacity())
+        self.__probes = self.__hits = self.__stores = self.__replacements = 0
+
+    def __get_key(self, slot: int) -> int:
+        # Keys are stored xor-ed with the entry, so an entry torn by another process writing it never matches
+        return self.__keys[slot] ^ _pack(self.__scores[slot], self.__moves[slot], self.__depths[slot], self.__bounds[slot])
+
+    def probe(self, key: int) -> Tuple[int, int, int, int] | None:
+        self.__probes += 1
+        index = (key % self.__buckets) * _BUCKET_SIZE
+
+        for slot in (index, index + 1):
+            if self.__bounds[slot] != EMPTY and self.__get_key(slot) == key:
+                self.__hits += 1
+                return self.__depths[slot], self.__bounds[slot], self.__scores[slot], self.__moves[slot]
+
+        return None
+
+    def store(self, key: int, depth: int, bound: int, score: int, move: int) -> None:
+        self.__stores += 1
+        index = (key % self.__buckets) * _BUCKET_SIZE
+
+        if self.__bounds[index] != EMPTY and self.__get_key(index) == key:
+            slot = index
+            # Keep a deeper result for this same position unless the new one is exact
+            if depth < self.__depths[index] and bound != EXACT:
+                return
+            if move == 0:
+                move = self.__moves[index]
+        elif (
+            self.__bounds[index] == EMPTY or
+            depth >= self.__depths[index] or
+            self.__generations[index] != self.__generation
+        ):
+            slot = index
+            self.__demote(index)
+        else:
+            slot = index + 1
+
+        if self.__bounds[slot] != EMPTY and self.__get_key(slot) != key:
+            self.__replacements += 1
+
+        depth = min(depth, 127)
+        self.__scores[slot] = score
+        self.__moves[slot] = move
+        self.__depths[slot] = depth
+        self.__bounds[slot] = bound
+        self.__generations[slot] = self.__generation
+        self.__keys[slot] = key ^ _pack(score, move, depth, bound)
+
+    def __demote(self, index: int) -> None:
+        # An entry pushed out of the depth-preferred slot still beats whatever is in the always-replace slot
+        if self.__bounds[index] == EMPTY:
+            return
+
+        if self.__bounds[index + 1] != EMPTY:
+            self.__replacements += 1
+
+        for column in (self.__keys, self.__scores, self.__moves, self.__depths, self.__bounds, self.__generations):
+            column[index + 1] = column[index]
+
+        self.__bounds[index] = EMPTY
+
+    def get_used(self) -> int:
+        return self.get_capacity() - bytes(self.__bounds).count(EMPTY)
+
+    def get_stats(self) -> Dict[str, float]:
+        used = self.get_used()
+        return {
+            "size_mb": self.__size_mb,
+            "capacity": self.get_capacity(),
+            "used": used,
+            "fill": used / self.get_capacity(),
+            "probes": self.__probes,
+            "hits": self.__hits,
+            "hit_rate": self.__hits / self.__probes if self.__probes else 0.0,
+            "stores": self.__stores,
+            "replacements": self.__replacements,
+        }
+
+    def summary(self) -> str:
+        stats = self.get_stats()
+        return (
+            f"{stats['size_mb']:g} MB, {stats['used']}/{stats['capacity']} entries ({stats['fill']:.1%} full), "
+            f"{stats['hits']}/{stats['probes']} hits ({stats['hit_rate']:.1%}), {stats['replacements']} replacements"
+        )
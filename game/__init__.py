@@ -1,5 +1,12 @@
-from .board import Board
 from .game_result import GameResult
 from .game_state import GameState
 from .move import Move
-from .piece import Piece
\ No newline at end of file
+from .piece import Piece
+from .position import Position
+
+from lazy_imports import lazy_getattr
+
+# Board draws with pygame, so it is imported on first use and headless code never loads pygame
+_LAZY_IMPORTS = {"Board": ".board"}
+
+__getattr__ = lazy_getattr(__name__, _LAZY_IMPORTS)
@@ -0,0 +1,139 @@
+from typing import Iterable, Tuple
+
+# NumPy is only needed here, so nothing else in the game package imports this module
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError("game.batch needs NumPy, install it with pip install -r requirements.txt") from e
+
+from .evaluation import PIECE_VALUES, SQUARE_VALUES
+from .piece import Piece
+from .position import Position
+
+# Same layout as Position squares: one packed Piece per square, a1 first, so any int8 (N, 64) array works
+_SQUARE_VALUES = np.array(SQUARE_VALUES, dtype=np.int32)
+_SQUARE_INDEX = np.arange(64)
+
+def _build_material_values() -> np.ndarray:
+    values = np.zeros(Piece.HIDDEN << 1, dtype=np.int32)
+    for colour, sign in ((Piece.WHITE, 1), (Piece.BLACK, -1)):
+        for piece_type, value in PIECE_VALUES.items():
+            values[piece_type | colour] = sign * value
+        values[Piece.PAWN | Piece.HIDDEN | colour] = sign * PIECE_VALUES[Piece.QUEEN]
+    return values
+
+_MATERIAL_VALUES = _build_material_values()
+
+_KNIGHT_OFFSETS = ((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2))
+_KING_OFFSETS = ((1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1))
+_DIAGONAL_STEPS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+_ORTHOGONAL_STEPS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+def positions_to_array(positions: Iterable[Position]) -> Tuple[np.ndarray, np.ndarray]:
+    # (N, 64) int8 squares and (N,) int8 colours to move, read from the packed bytes rather than square by square
+    data = b"".join(position.to_bytes()[:65] for position in positions)
+    packed = np.frombuffer(data, dtype=np.int8).reshape(-1, 65)
+    return packed[:, :64].copy(), packed[:, 64].copy()
+
+def material_batch(squares: np.ndarray) -> np.ndarray:
+    # White's point of view, like Position.get_evaluation
+    return _MATERIAL_VALUES[squares].sum(axis=1)
+
+def evaluate_batch(squares: np.ndarray) -> np.ndarray:
+    # Material and piece-square scores, equal to evaluate_squares for every row
+    return _SQUARE_VALUES[squares, _SQUARE_INDEX].sum(axis=1)
+
+def _shift(board: np.ndarray, dr: int, df: int) -> np.ndarray:
+    # Moves every (N, 8, 8) entry dr ranks up and df files right, whatever falls off the board is lost
+    shifted = np.zeros_like(board)
+    rows, cols = 8 - abs(dr), 8 - abs(df)
+    shifted[:, max(dr, 0):max(dr, 0) + rows, max(df, 0):max(df, 0) + cols] = \
+        board[:, max(-dr, 0):max(-dr, 0) + rows, max(-df, 0):max(-df, 0) + cols]
+    return shifted
+
+def attack_counts(squares: np.ndarray, colour: int) -> np.ndarray:
+    # (N, 64) count of the colour's pieces attacking each square, with the same rules as is_square_attacked
+    board = squares.reshape(-1, 8, 8)
+    own = (board & (Piece.WHITE | Piece.BLACK)) == colour
+    piece_types = board & 7
+    hidden = own & ((board & Piece.HIDDEN) != 0)
+    empty = board == Piece.NONE
+
+    counts = np.zeros(board.shape, dtype=np.uint8)
+
+    # Hidden queens attack like queens, not like the pawns they stand in for
+    pawns = own & (piece_types == Piece.PAWN) & ~hidden
+    forward = 1 if colour == Piece.WHITE else -1
+    for df in (-1, 1):
+        counts += _shift(pawns, forward, df)
+
+    for offsets, piece_type in ((_KNIGHT_OFFSETS, Piece.KNIGHT), (_KING_OFFSETS, Piece.KING)):
+        pieces = own & (piece_types == piece_type)
+        for dr, df in offsets:
+            counts += _shift(pieces, dr, df)
+
+    # Rays advance one square per step for the whole batch at once and only carry on through empty squares
+    for steps, mask in ((_DIAGONAL_STEPS, 0b101), (_ORTHOGONAL_STEPS, 0b110)):
+        sliders = own & (((piece_types & mask) == mask) | hidden)
+        for dr, df in steps:
+            ray = _shift(sliders, dr, df)
+            while ray.any():
+                counts += ray
+                ray = _shift(ray & empty, dr, df)
+
+    return counts.reshape(-1, 64)
+
+def _build_targets(offsets: Tuple[Tuple[int, int], ...], length: int) -> np.ndarray:
+    # Squares reached from every square along each offset, up to length steps, padded with the off-board index 64
+    targets = np.full((64, len(offsets), length), 64, dtype=np.intp)
+    for square in range(64):
+        rank, file = divmod(square, 8)
+        for i, (dr, df) in enumerate(offsets):
+            for step in range(length):
+                r, f = rank + dr * (step + 1), file + df * (step + 1)
+                if not (0 <= r < 8 and 0 <= f < 8):
+                    break
+                targets[square, i, step] = r * 8 + f
+    return targets
+
+# The last step of every ray is always off the board, so each ray is guaranteed to end on a blocker
+_RAYS = _build_targets(_DIAGONAL_STEPS + _ORTHOGONAL_STEPS, 8)
+_KNIGHT_TARGETS = _build_targets(_KNIGHT_OFFSETS, 1)[:, :, 0]
+_KING_TARGETS = _build_targets(_KING_OFFSETS, 1)[:, :, 0]
+
+# Squares an enemy pawn would attack a king from, for a white king and then a black one
+_PAWN_ATTACKERS = np.stack((_build_targets(((1, -1), (1, 1)), 1)[:, :, 0], _build_targets(((-1, -1), (-1, 1)), 1)[:, :, 0]))
+
+# Stands in for everything off the board: not empty, and neither colour's piece
+_OFF_BOARD = Piece.WHITE | Piece.BLACK
+
+def in_check_batch(squares: np.ndarray, colours: np.ndarray) -> np.ndarray:
+    # Whether the side to move in each row is in check, looking outwards from each king instead of building whole attack maps
+    colours = np.asarray(colours)
+    count = len(squares)
+    kings = squares == (Piece.KING | colours)[:, None]
+    has_king = kings.any(axis=1)
+    king_squares = kings.argmax(axis=1)
+
+    padded = np.concatenate((squares, np.full((count, 1), _OFF_BOARD, dtype=squares.dtype)), axis=1)
+    enemy = (Piece.WHITE | Piece.BLACK) - colours
+    rows = np.arange(count)[:, None]
+
+    # The first piece along each of the 8 rays, diagonals first
+    ray_pieces = padded[rows[:, :, None], _RAYS[king_squares]]
+    first = (ray_pieces != Piece.NONE).argmax(axis=2)
+    blockers = np.take_along_axis(ray_pieces, first[:, :, None], axis=2)[:, :, 0]
+    types = blockers & 7
+    hidden = (blockers & Piece.HIDDEN) != 0
+    diagonal = ((types & 0b101) == 0b101) | hidden
+    orthogonal = ((types & 0b110) == 0b110) | hidden
+    sliders = np.concatenate((diagonal[:, :4], orthogonal[:, 4:]), axis=1) & ((blockers & _OFF_BOARD) == enemy[:, None])
+    in_check = sliders.any(axis=1)
+
+    in_check |= (padded[rows, _KNIGHT_TARGETS[king_squares]] == (Piece.KNIGHT | enemy)[:, None]).any(axis=1)
+    in_check |= (padded[rows, _KING_TARGETS[king_squares]] == (Piece.KING | enemy)[:, None]).any(axis=1)
+
+    pawn_attackers = _PAWN_ATTACKERS[(colours == Piece.BLACK).astype(np.intp), king_squares]
+    in_check |= (padded[rows, pawn_attackers] == (Piece.PAWN | enemy)[:, None]).any(axis=1)
+
+    return in_check & has_king
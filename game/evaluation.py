@@ -0,0 +1,110 @@
+from typing import List
+
+from .piece import Piece
+
+PIECE_VALUES = {
+    Piece.KING: 0,
+    Piece.PAWN: 100,
+    Piece.KNIGHT: 320,
+    Piece.BISHOP: 330,
+    Piece.ROOK: 500,
+    Piece.QUEEN: 900,
+}
+
+# Piece-square tables as seen from White's side of the board, rank 8 first
+_PAWN_TABLE = (
+     0,   0,   0,   0,   0,   0,   0,   0,
+    50,  50,  50,  50,  50,  50,  50,  50,
+    10,  10,  20,  30,  30,  20,  10,  10,
+     5,   5,  10,  25,  25,  10,   5,   5,
+     0,   0,   0,  20,  20,   0,   0,   0,
+     5,  -5, -10,   0,   0, -10,  -5,   5,
+     5,  10,  10, -20, -20,  10,  10,   5,
+     0,   0,   0,   0,   0,   0,   0,   0,
+)
+
+_KNIGHT_TABLE = (
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20,   0,   0,   0,   0, -20, -40,
+    -30,   0,  10,  15,  15,  10,   0, -30,
+    -30,   5,  15,  20,  20,  15,   5, -30,
+    -30,   0,  15,  20,  20,  15,   0, -30,
+    -30,   5,  10,  15,  15,  10,   5, -30,
+    -40, -20,   0,   5,   5,   0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+)
+
+_BISHOP_TABLE = (
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,  10,  10,   5,   0, -10,
+    -10,   5,   5,  10,  10,   5,   5, -10,
+    -10,   0,  10,  10,  10,  10,   0, -10,
+    -10,  10,  10,  10,  10,  10,  10, -10,
+    -10,   5,   0,   0,   0,   0,   5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+)
+
+_ROOK_TABLE = (
+     0,   0,   0,   0,   0,   0,   0,   0,
+     5,  10,  10,  10,  10,  10,  10,   5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+     0,   0,   0,   5,   5,   0,   0,   0,
+)
+
+_QUEEN_TABLE = (
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,   5,   5,   5,   0, -10,
+     -5,   0,   5,   5,   5,   5,   0,  -5,
+      0,   0,   5,   5,   5,   5,   0,  -5,
+    -10,   5,   5,   5,   5,   5,   0, -10,
+    -10,   0,   5,   0,   0,   0,   0, -10,
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+)
+
+_KING_TABLE = (
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+     20,  20,   0,   0,   0,   0,  20,  20,
+     20,  30,  10,   0,   0,  10,  30,  20,
+)
+
+_TABLES = {
+    Piece.KING: _KING_TABLE,
+    Piece.PAWN: _PAWN_TABLE,
+    Piece.KNIGHT: _KNIGHT_TABLE,
+    Piece.BISHOP: _BISHOP_TABLE,
+    Piece.ROOK: _ROOK_TABLE,
+    Piece.QUEEN: _QUEEN_TABLE,
+}
+
+def _build_square_values() -> List[List[int]]:
+    # Indexed by the full piece value, so a lookup needs no masking or mirroring
+    values = [[0] * 64 for _ in range(Piece.HIDDEN << 1)]
+
+    for colour, sign in ((Piece.WHITE, 1), (Piece.BLACK, -1)):
+        for square in range(64):
+            rank, file = divmod(square, 8)
+            index = (7 - rank) * 8 + file if colour == Piece.WHITE else square
+
+            for piece_type, table in _TABLES.items():
+                values[piece_type | colour][square] = sign * (PIECE_VALUES[piece_type] + table[index])
+
+            # A hidden queen is worth a queen to its owner but still stands where a pawn would
+            values[Piece.PAWN | Piece.HIDDEN | colour][square] = sign * (PIECE_VALUES[Piece.QUEEN] + _PAWN_TABLE[index])
+
+    return values
+
+SQUARE_VALUES = _build_square_values()
+
+def evaluate_squares(squares: List[int]) -> int:
+    return sum(SQUARE_VALUES[piece][square] for square, piece in enumerate(squares))
@@ -0,0 +1,139 @@
+from typing import List, Tuple
+
+from .castling_rights import CastlingRights
+from .piece import Piece
+
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+_PIECE_CHARS = {
+    "k": Piece.KING,
+    "p": Piece.PAWN,
+    "n": Piece.KNIGHT,
+    "b": Piece.BISHOP,
+    "r": Piece.ROOK,
+    "q": Piece.QUEEN,
+}
+_CHAR_PIECES = {piece_type: char for char, piece_type in _PIECE_CHARS.items()}
+
+_CASTLING_CHARS = (
+    ("K", CastlingRights.WK),
+    ("Q", CastlingRights.WQ),
+    ("k", CastlingRights.BK),
+    ("q", CastlingRights.BQ),
+)
+
+def square_name(square: int) -> str:
+    rank, file = divmod(square, 8)
+    return "abcdefgh"[file] + str(rank + 1)
+
+def parse_square(name: str) -> int:
+    if len(name) != 2 or name[0] not in "abcdefgh" or name[1] not in "12345678":
+        raise ValueError(f"Invalid square: {name!r}")
+
+    return (int(name[1]) - 1) * 8 + "abcdefgh".index(name[0])
+
+def piece_to_char(piece: int) -> str:
+    # Hidden queens are written as "h" so a snapshot of the true position keeps them
+    char = "h" if Piece.is_hidden_queen(piece) else _CHAR_PIECES[Piece.piece_type(piece)]
+    return char.upper() if Piece.colour(piece) == Piece.WHITE else char
+
+def char_to_piece(char: str) -> int:
+    piece_type = Piece.PAWN | Piece.HIDDEN if char.lower() == "h" else _PIECE_CHARS.get(char.lower())
+    if piece_type is None:
+        raise ValueError(f"Invalid piece character: {char!r}")
+
+    return piece_type | (Piece.WHITE if char.isupper() else Piece.BLACK)
+
+def parse_fen(fen: str) -> Tuple[List[int], int, CastlingRights, int | None, int, int]:
+    fields = fen.split()
+    if len(fields) == 4:
+        fields += ["0", "1"]
+    if len(fields) != 6:
+        raise ValueError(f"Invalid FEN, expected 6 fields: {fen!r}")
+
+    placement, colour_field, castling_field, enpassant_field, halfmove_field, fullmove_field = fields
+
+    rows = placement.split("/")
+    if len(rows) != 8:
+        raise ValueError(f"Invalid FEN, expected 8 ranks: {fen!r}")
+
+    squares = [Piece.NONE] * 64
+    for i, row in enumerate(rows):
+        rank = 7 - i
+        file = 0
+        for char in row:
+            if char.isdigit():
+                file += int(char)
+            else:
+                if file >= 8:
+                    raise ValueError(f"Invalid FEN, rank {rank + 1} has more than 8 files: {fen!r}")
+                squares[rank * 8 + file] = char_to_piece(char)
+                file += 1
+        if file != 8:
+            raise ValueError(f"Invalid FEN, rank {rank + 1} does not have 8 files: {fen!r}")
+
+    for colour in (Piece.WHITE, Piece.BLACK):
+        if squares.count(Piece.KING | colour) != 1:
+            raise ValueError(f"Invalid FEN, {Piece.colour_str(colour)} must have exactly one king: {fen!r}")
+
+    if colour_field == "w":
+        colour_to_move = Piece.WHITE
+    elif colour_field == "b":
+        colour_to_move = Piece.BLACK
+    else:
+        raise ValueError(f"Invalid FEN, side to move must be 'w' or 'b': {fen!r}")
+
+    castling_rights = CastlingRights.NONE
+    if castling_field != "-":
+        for char in castling_field:
+            right = dict(_CASTLING_CHARS).get(char)
+            if right is None:
+                raise ValueError(f"Invalid FEN, bad castling field: {fen!r}")
+            castling_rights |= right
+
+    enpassant_square = None
+    if enpassant_field != "-":
+        enpassant_square = parse_square(enpassant_field)
+        if enpassant_square // 8 != (5 if colour_to_move == Piece.WHITE else 2):
+            raise ValueError(f"Invalid FEN, bad en passant square: {fen!r}")
+
+    try:
+        halfmove_clock = int(halfmove_field)
+        fullmove_number = int(fullmove_field)
+    except ValueError:
+        raise ValueError(f"Invalid FEN, bad move clocks: {fen!r}") from None
+
+    return squares, colour_to_move, castling_rights, enpassant_square, halfmove_clock, fullmove_number
+
+def format_fen(
+    squares: List[int],
+    colour_to_move: int,
+    castling_rights: int,
+    enpassant_square: int | None,
+    halfmove_clock: int,
+    fullmove_number: int
+) -> str:
+    rows = []
+    for rank in range(7, -1, -1):
+        row = ""
+        empty = 0
+        for file in range(8):
+            piece = squares[rank * 8 + file]
+            if piece == Piece.NONE:
+                empty += 1
+                continue
+
+            if empty:
+                row += str(empty)
+                empty = 0
+            row += piece_to_char(piece)
+
+        if empty:
+            row += str(empty)
+        rows.append(row)
+
+    castling_field = "".join(char for char, right in _CASTLING_CHARS if castling_rights & right) or "-"
+    enpassant_field = square_name(enpassant_square) if enpassant_square is not None else "-"
+    colour_field = "w" if colour_to_move == Piece.WHITE else "b"
+
+    return f"{'/'.join(rows)} {colour_field} {castling_field} {enpassant_field} {halfmove_clock} {fullmove_number}"
@@ -7,4 +7,5 @@ class GameResult(Enum):
     STALEMATE = auto()
     INSUFFICIENT_MATERIAL = auto()
     FIFTY_MOVE_RULE = auto()
-    THREEFOLD_REPETITION = auto()
\ No newline at end of file
+    THREEFOLD_REPETITION = auto()
+    TIMEOUT = auto()
\ No newline at end of file
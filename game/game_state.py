@@ -3,5 +3,6 @@ from enum import auto, Enum
 class GameState(Enum):
     NONE = 0
     WAITING = auto()
+    CHOOSING_HIDDEN_QUEEN = auto()
     PLAYING = auto()
     GAME_OVER = auto()
\ No newline at end of file
@@ -0,0 +1,147 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from .game_result import GameResult
+from .move import Move, PROMOTION_TYPES, _is_move_legal, generate_piece_moves, get_changed_squares
+from .piece import Piece
+from .position import Position
+
+@dataclass
+class ViewDelta:
+    changes: List[Tuple[int, int]] = field(default_factory=list)
+    colour_to_move: int | None = None
+    castling_rights: int | None = None
+    enpassant_square: int | None = None
+    game_result: GameResult = GameResult.NONE
+
+    def to_dict(self) -> Dict:
+        data = {"squares": [list(change) for change in self.changes]}
+        if self.colour_to_move is not None:
+            data["turn"] = self.colour_to_move
+            data["castling"] = int(self.castling_rights)
+            data["ep"] = self.enpassant_square
+            data["result"] = self.game_result.value
+        return data
+
+    @staticmethod
+    def from_dict(data: Dict) -> "ViewDelta":
+        changes = []
+        for square, piece in data["squares"]:
+            if not (isinstance(square, int) and isinstance(piece, int) and 0 <= square < 64):
+                raise ValueError(f"Invalid square change: {square!r}, {piece!r}")
+            changes.append((square, piece))
+
+        if "turn" not in data:
+            return ViewDelta(changes)
+
+        return ViewDelta(changes, data["turn"], data["castling"], data["ep"], GameResult(data["result"]))
+
+    def apply_to(self, position: Position) -> None:
+        position.apply_delta(self.changes, self.colour_to_move, self.castling_rights, self.enpassant_square, self.game_result)
+
+class HiddenQueenGame:
+    __slots__ = ("__position", "__hidden_queens", "__views")
+
+    def __init__(self, position: Position) -> None:
+        self.__position = position
+        self.__hidden_queens: Dict[int, int | None] = {Piece.WHITE: None, Piece.BLACK: None}
+
+        # What each player currently sees, kept in step with the true position one changed square at a time
+        self.__views = {
+            colour: bytearray(Piece.visible_to(position.get_square(i), colour) for i in range(64))
+            for colour in (Piece.WHITE, Piece.BLACK)
+        }
+
+    def rebuild_views(self) -> None:
+        # For a game whose moves were replayed straight onto the position, bypassing apply_move
+        for colour, view in self.__views.items():
+            view[:] = bytearray(Piece.visible_to(self.__position.get_square(i), colour) for i in range(64))
+
+    def get_position(self) -> Position:
+        return self.__position
+
+    def get_view(self, colour: int) -> List[int]:
+        return list(self.__views[colour])
+
+    def get_view_position(self, colour: int) -> Position:
+        # A position built only from what this player can see, for anything that plays on their behalf
+        position = self.__position
+        return Position.from_position(
+            self.__views[colour],
+            position.get_colour_to_move(),
+            position.get_castling_rights(),
+            position.get_enpassant_square(),
+            position.get_halfmove_clock(),
+            position.get_fullmove_number()
+        )
+
+    def get_hidden_queen(self, colour: int) -> int | None:
+        return self.__hidden_queens[colour]
+
+    def is_ready(self) -> bool:
+        return all(square is not None for square in self.__hidden_queens.values())
+
+    def designate(self, colour: int, square: int) -> ViewDelta:
+        if self.__hidden_queens[colour] is not None:
+            raise ValueError("Hidden queen already chosen")
+
+        # Already hidden when the game was loaded from a FEN that records it
+        if not (isinstance(square, int) and 0 <= square < 64) or self.__position.get_square(square) & ~Piece.HIDDEN != Piece.PAWN | colour:
+            raise ValueError("Hidden queen must be one of your pawns")
+
+        piece = Piece.PAWN | Piece.HIDDEN | colour
+        self.__position.place_piece(square, piece)
+        self.__hidden_queens[colour] = square
+
+        # Only the owner learns which pawn it is
+        self.__views[colour][square] = piece
+        return ViewDelta([(square, piece)])
+
+    def resolve_move(self, colour: int, move: Move) -> Move | None:
+        # The sender built its move from a filtered view, so rebuild it from the true position
+        if not (0 <= move.start < 64 and 0 <= move.end < 64):
+            return None
+
+        piece = self.__position.get_square(move.start)
+        if Piece.colour(piece) != colour or colour != self.__position.get_colour_to_move():
+            return None
+
+        for candidate in generate_piece_moves(self.__position, move.start, piece):
+            if candidate.end != move.end:
+                continue
+
+            if candidate.promotion:
+                if Piece.colour(move.promotion_piece) != colour or Piece.piece_type(move.promotion_piece) not in PROMOTION_TYPES:
+                    continue
+                candidate = Move(candidate.start, candidate.end, candidate.piece, candidate.captured_piece, promotion=True)
+                candidate.promotion_piece = move.promotion_piece
+
+            if _is_move_legal(self.__position, colour, candidate):
+                return candidate
+
+        return None
+
+    def apply_move(self, move: Move) -> Dict[int, ViewDelta]:
+        squares = get_changed_squares(move)
+        self.__position.apply_move(move)
+        return self.build_deltas(squares)
+
+    def build_deltas(self, squares: Tuple[int, ...]) -> Dict[int, ViewDelta]:
+        # Only squares the last move touched are compared, so this is O(changed squares) per player
+        colour_to_move = self.__position.get_colour_to_move()
+        castling_rights = self.__position.get_castling_rights()
+        enpassant_square = self.__position.get_enpassant_square()
+        game_result = self.__position.get_game_result()
+
+        deltas = {}
+        for colour, view in self.__views.items():
+            changes = []
+            for square in squares:
+                piece = Piece.visible_to(self.__position.get_square(square), colour)
+                if view[square] != piece:
+                    view[square] = piece
+                    changes.append((square, piece))
+
+            deltas[colour] = ViewDelta(changes, colour_to_move, castling_rights, enpassant_square, game_result)
+
+        return deltas
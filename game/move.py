@@ -1,14 +1,48 @@
-from copy import deepcopy
-from dataclasses import asdict, dataclass
+from dataclasses import dataclass
 import json
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 from .castling_rights import CastlingRights
 from .piece import Piece
 from .utils import is_on_board
 
-@dataclass
+_FIELDS = ("start", "end", "piece", "captured_piece", "promotion", "promotion_piece", "enpassant", "castling", "reveal")
+_FLAG_FIELDS = ("promotion", "enpassant", "reveal")
+
+_PIECES = frozenset(
+    piece_type | colour
+    for piece_type in (Piece.KING, Piece.PAWN, Piece.KNIGHT, Piece.BISHOP, Piece.ROOK, Piece.QUEEN)
+    for colour in (Piece.WHITE, Piece.BLACK)
+) | frozenset(Piece.PAWN | Piece.HIDDEN | colour for colour in (Piece.WHITE, Piece.BLACK))
+_CASTLING_VALUES = frozenset((CastlingRights.WK, CastlingRights.WQ, CastlingRights.BK, CastlingRights.BQ))
+
+# Packed form: start, end, piece, captured piece and promotion piece take 6 bits each, then 3 flags and 4 castling bits
+_PACKED_BITS = 37
+
+def _is_int(value) -> bool:
+    # bool is an int too, but never a square or a piece
+    return type(value) is int or isinstance(value, CastlingRights)
+
+def _validate(move: "Move") -> "Move":
+    if not (_is_int(move.start) and _is_int(move.end) and is_on_board(move.start) and is_on_board(move.end)):
+        raise ValueError(f"Invalid move squares {move.start!r}, {move.end!r}")
+    if not _is_int(move.piece) or move.piece not in _PIECES:
+        raise ValueError(f"Invalid moving piece {move.piece!r}")
+    if not _is_int(move.captured_piece) or (move.captured_piece != Piece.NONE and move.captured_piece not in _PIECES):
+        raise ValueError(f"Invalid captured piece {move.captured_piece!r}")
+    if not _is_int(move.promotion_piece) or (move.promotion_piece != Piece.NONE and move.promotion_piece not in _PIECES):
+        raise ValueError(f"Invalid promotion piece {move.promotion_piece!r}")
+    if any(type(getattr(move, name)) is not bool for name in _FLAG_FIELDS):
+        raise ValueError("Move flags must be booleans")
+    # True == 1 would pass as a castling right, and only the rights themselves name a side
+    if move.castling is not False and (not _is_int(move.castling) or move.castling not in _CASTLING_VALUES):
+        raise ValueError(f"Invalid castling right {move.castling!r}")
+
+    return move
+
+@dataclass(slots=True)
 class Move:
+    # Slotted, so the hundreds of moves generated per position carry no per-instance dict
     start: int
     end: int
     piece: int
@@ -17,28 +51,152 @@ class Move:
     promotion_piece: int = Piece.NONE
     enpassant: bool = False
     castling: bool = False
+    reveal: bool = False
     
     @staticmethod
     def from_dict(data: Dict) -> "Move":
-        return Move(**data)
+        # Moves arrive from clients, so anything but the known fields with sensible values is rejected
+        if not isinstance(data, dict) or not data.keys() <= set(_FIELDS):
+            raise ValueError("Invalid move fields")
+
+        try:
+            move = Move(data["start"], data["end"], data["piece"], data.get("captured_piece") or Piece.NONE)
+        except KeyError as e:
+            raise ValueError(f"Missing move field {e}") from None
+
+        move.promotion = data.get("promotion", False)
+        move.promotion_piece = data.get("promotion_piece", Piece.NONE)
+        move.enpassant = data.get("enpassant", False)
+        castling = data.get("castling", False)
+        move.castling = CastlingRights(castling) if _is_int(castling) and castling in _CASTLING_VALUES else castling
+        move.reveal = data.get("reveal", False)
+        return _validate(move)
     
+    def to_dict(self) -> Dict:
+        return {
+            "start": self.start,
+            "end": self.end,
+            "piece": self.piece,
+            "captured_piece": self.captured_piece,
+            "promotion": self.promotion,
+            "promotion_piece": self.promotion_piece,
+            "enpassant": self.enpassant,
+            "castling": int(self.castling) if self.castling else False,
+            "reveal": self.reveal,
+        }
+
     @staticmethod
     def to_json(move: "Move") -> str:
-        return json.dumps(asdict(move))
+        return json.dumps(move.to_dict())
     
     @staticmethod
     def from_json(data: str) -> "Move":
-        return Move(**json.loads(data))
+        return Move.from_dict(json.loads(data))
+
+    def pack(self) -> int:
+        # Every field in one int, for binary records where a JSON object per move would dominate the size
+        return (
+            self.start | self.end << 6 | self.piece << 12 | (self.captured_piece or Piece.NONE) << 18 |
+            self.promotion_piece << 24 | self.promotion << 30 | self.enpassant << 31 | self.reveal << 32 |
+            int(self.castling) << 33
+        )
+
+    @staticmethod
+    def unpack(code: int) -> "Move":
+        if not _is_int(code) or not 0 <= code < 1 << _PACKED_BITS:
+            raise ValueError(f"Invalid packed move {code!r}")
+
+        castling = code >> 33
+        return _validate(Move(
+            code & 63, code >> 6 & 63, code >> 12 & 63, code >> 18 & 63,
+            bool(code >> 30 & 1), code >> 24 & 63, bool(code >> 31 & 1), CastlingRights(castling) if castling else False,
+            bool(code >> 32 & 1)
+        ))
+    
+PROMOTION_TYPES = (Piece.QUEEN, Piece.ROOK, Piece.BISHOP, Piece.KNIGHT)
+
+_KNIGHT_OFFSETS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+_KING_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+_DIAGONAL_STEPS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+_ORTHOGONAL_STEPS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+_CASTLING_ROOK_SQUARES = {
+    CastlingRights.WK: (7, 5),
+    CastlingRights.WQ: (0, 3),
+    CastlingRights.BK: (63, 61),
+    CastlingRights.BQ: (56, 59),
+}
+
+def get_changed_squares(move: Move) -> Tuple[int, ...]:
+    if move.castling:
+        return (move.start, move.end) + _CASTLING_ROOK_SQUARES[move.castling]
+
+    if move.enpassant:
+        captured_square = move.end - 8 if Piece.colour(move.piece) == Piece.WHITE else move.end + 8
+        return (move.start, move.end, captured_square)
+
+    return (move.start, move.end)
+
+def is_square_attacked(board: "Board", square: int, by_colour: int) -> bool:
+    rank, file = divmod(square, 8)
+    
+    # Pawns attack diagonally forward, so look one rank behind the square from the attacker's side
+    pawn_rank = rank - 1 if by_colour == Piece.WHITE else rank + 1
+    if 0 <= pawn_rank < 8:
+        for df in (-1, 1):
+            if 0 <= file + df < 8 and board.get_square(pawn_rank * 8 + file + df) == Piece.PAWN | by_colour:
+                return True
+    
+    for offsets, piece in ((_KNIGHT_OFFSETS, Piece.KNIGHT | by_colour), (_KING_OFFSETS, Piece.KING | by_colour)):
+        for dr, df in offsets:
+            r, f = rank + dr, file + df
+            if 0 <= r < 8 and 0 <= f < 8 and board.get_square(r * 8 + f) == piece:
+                return True
+    
+    for steps, can_slide in ((_DIAGONAL_STEPS, Piece.can_slide_diagonal), (_ORTHOGONAL_STEPS, Piece.can_slide_orthogonal)):
+        for dr, df in steps:
+            r, f = rank + dr, file + df
+            while 0 <= r < 8 and 0 <= f < 8:
+                target_piece = board.get_square(r * 8 + f)
+                if target_piece != Piece.NONE:
+                    if Piece.colour(target_piece) == by_colour and (can_slide(target_piece) or Piece.is_hidden_queen(target_piece)):
+                        return True
+                    break
+                r += dr
+                f += df
+    
+    return False
     
 def _is_move_legal(board: "Board", colour: int, move: Move):
-    board_copy = deepcopy(board)
-    board_copy.make_move(move)
+    board.make_move(move)
+    in_check = is_square_attacked(board, board.get_king_square(colour), Piece.opposite_colour(colour))
+    board.unmake_move()
+    
+    if not in_check:
+        return move
+    
+def is_legal_move(board: "Board", move: Move) -> bool:
+    colour = board.get_colour_to_move()
+    if not (is_on_board(move.start) and is_on_board(move.end)):
+        return False
+    
+    piece = board.get_square(move.start)
+    if piece != move.piece or Piece.colour(piece) != colour:
+        return False
+    
+    for candidate in generate_piece_moves(board, move.start, piece):
+        if candidate.end != move.end:
+            continue
         
-    king_square = board_copy.get_king_square(colour)
+        if candidate.promotion:
+            if Piece.colour(move.promotion_piece) != colour or Piece.piece_type(move.promotion_piece) not in PROMOTION_TYPES:
+                continue
+            candidate = Move(candidate.start, candidate.end, candidate.piece, candidate.captured_piece, promotion=True, promotion_piece=move.promotion_piece)
         
-    opp_responses = generate_moves(board_copy, Piece.opposite_colour(colour))
-    if not any([res for res in opp_responses if res.end == king_square]):
-        return move
+        if candidate == move:
+            return _is_move_legal(board, colour, move) is not None
+        
+    return False
     
 def generate_legal_moves(board: "Board", colour: int) -> List[Move]:
     moves = generate_moves(board, colour)
@@ -46,7 +204,7 @@ def generate_legal_moves(board: "Board", colour: int) -> List[Move]:
     
     for move in moves:
         if move.promotion:
-            for promo_type in (Piece.QUEEN, Piece.ROOK, Piece.BISHOP, Piece.KNIGHT):
+            for promo_type in PROMOTION_TYPES:
                 promo_move = Move(move.start, move.end, move.piece, move.captured_piece, promotion=True)
                 promo_move.promotion_piece = promo_type | colour
                         
@@ -58,6 +216,16 @@ def generate_legal_moves(board: "Board", colour: int) -> List[Move]:
             
     return legal_moves
 
+def has_legal_move(board: "Board", colour: int) -> bool:
+    for move in generate_moves(board, colour):
+        if move.promotion:
+            move = Move(move.start, move.end, move.piece, move.captured_piece, promotion=True, promotion_piece=Piece.QUEEN | colour)
+            
+        if _is_move_legal(board, colour, move):
+            return True
+        
+    return False
+
 def generate_moves(board: "Board", colour: int, include_king: bool = True) -> List[Move]:
     moves = []
     
@@ -66,20 +234,30 @@ def generate_moves(board: "Board", colour: int, include_king: bool = True) -> Li
         if Piece.colour(piece) != colour:
             continue
         
-        piece_type = Piece.piece_type(piece)
-
-        if piece_type == Piece.PAWN:
-            moves += _generate_pawn_moves(board, square, piece)
-        elif piece_type == Piece.KING and include_king:
-            moves += _generate_king_moves(board, square, piece)
-            moves += _generate_castling_moves(board, piece)
-        elif piece_type == Piece.KNIGHT:
-            moves += _generate_knight_moves(board, square, piece)
-        elif Piece.is_sliding_piece(piece):
-            moves += _generate_sliding_moves(board, square, piece)
+        if Piece.piece_type(piece) == Piece.KING and not include_king:
+            continue
+        
+        moves += generate_piece_moves(board, square, piece)
             
     return moves
 
+def generate_piece_moves(board: "Board", square: int, piece: int) -> List[Move]:
+    piece_type = Piece.piece_type(piece)
+
+    if piece_type == Piece.PAWN:
+        moves = _generate_pawn_moves(board, square, piece)
+        if Piece.is_hidden_queen(piece):
+            moves += _generate_hidden_queen_moves(board, square, piece, moves)
+        return moves
+    elif piece_type == Piece.KING:
+        return _generate_king_moves(board, square, piece) + _generate_castling_moves(board, piece)
+    elif piece_type == Piece.KNIGHT:
+        return _generate_knight_moves(board, square, piece)
+    elif Piece.is_sliding_piece(piece):
+        return _generate_sliding_moves(board, square, piece)
+    
+    return []
+
 def _generate_king_moves(board: "Board", square: int, piece: int) -> List[Move]:
     moves = []
     start_file = square % 8
@@ -111,15 +289,25 @@ def _generate_castling_moves(board: "Board", piece: int) -> List[Move]:
     rank = 0 if is_white else 7
     base_index = rank * 8
     king_start = base_index + 4
+    # The king may not pass through an attacked square, the square it lands on is checked like any other move
+    opponent = Piece.opposite_colour(Piece.colour(piece))
 
     short_right = CastlingRights.WK if is_white else CastlingRights.BK
     short_clear_files = (5, 6)
-    if board.can_castle(short_right) and all(board.get_square(base_index + f) == Piece.NONE for f in short_clear_files):
+    if (
+        board.can_castle(short_right) and
+        all(board.get_square(base_index + f) == Piece.NONE for f in short_clear_files) and
+        not is_square_attacked(board, king_start + 1, opponent)
+    ):
         moves.append(Move(king_start, king_start + 2, piece, Piece.NONE, castling=short_right))
 
     long_right = CastlingRights.WQ if is_white else CastlingRights.BQ
     long_clear_files = (1, 2, 3)
-    if board.can_castle(long_right) and all(board.get_square(base_index + f) == Piece.NONE for f in long_clear_files):
+    if (
+        board.can_castle(long_right) and
+        all(board.get_square(base_index + f) == Piece.NONE for f in long_clear_files) and
+        not is_square_attacked(board, king_start - 1, opponent)
+    ):
         moves.append(Move(king_start, king_start - 2, piece, Piece.NONE, castling=long_right))
  
     return moves
@@ -135,7 +323,7 @@ def _generate_pawn_moves(board: "Board", square: int, piece: int) -> List[Move]:
     
     one_forward = square + direction * 8
     if is_on_board(one_forward) and board.get_square(one_forward) == Piece.NONE:
-        if rank + 1 == promotion_rank:
+        if rank + direction == promotion_rank:
             moves.append(Move(square, one_forward, piece, Piece.NONE, promotion=True))  # 1 step forward + promotion
         else:
             moves.append(Move(square, one_forward, piece, Piece.NONE))  # 1 step forward
@@ -162,7 +350,7 @@ def _generate_pawn_moves(board: "Board", square: int, piece: int) -> List[Move]:
                 
     # Enpassant
     last_move = board.get_last_move()
-    if last_move is not None and Piece.piece_type(last_move.piece) == Piece.PAWN:
+    if last_move is not None and Piece.piece_type(last_move.piece) == Piece.PAWN and not last_move.reveal:
         diff = abs(last_move.start - last_move.end)
         if diff == 16:  # 2 steps forward
             last_end_rank, last_end_file = divmod(last_move.end, 8)
@@ -173,6 +361,17 @@ def _generate_pawn_moves(board: "Board", square: int, piece: int) -> List[Move]:
             
     return moves
 
+def _generate_hidden_queen_moves(board: "Board", square: int, piece: int, pawn_moves: List[Move]) -> List[Move]:
+    # Anything a pawn could also do keeps the queen hidden, every other queen move reveals it
+    pawn_targets = {m.end for m in pawn_moves}
+    queen = Piece.QUEEN | Piece.colour(piece)
+    
+    return [
+        Move(square, m.end, piece, m.captured_piece, reveal=True)
+        for m in _generate_sliding_moves(board, square, queen)
+        if m.end not in pawn_targets
+    ]
+
 def _generate_knight_moves(board: "Board", square: int, piece: int) -> List[Move]:
     moves = []
     start_rank = square // 8
@@ -0,0 +1,171 @@
+from array import array
+from collections import OrderedDict
+import sys
+import threading
+from typing import Dict, List
+
+from .castling_rights import CastlingRights
+from .move import Move, PROMOTION_TYPES, generate_legal_moves
+from .piece import Piece
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_MAX_FULLMOVE = 20
+
+# Move kinds stored in the top 4 bits of each 16-bit move, promotions take one kind per piece type
+_NORMAL = 0
+_ENPASSANT = 1
+_CASTLING = 2
+_REVEAL = 3
+_PROMOTION = 4
+
+_CASTLING_BY_END = {6: CastlingRights.WK, 2: CastlingRights.WQ, 62: CastlingRights.BK, 58: CastlingRights.BQ}
+
+# Rough cost of the OrderedDict link and int key that come with every entry
+_ENTRY_OVERHEAD = 120
+
+# The squares, colour to move, castling rights and en passant square at the front of Position.to_bytes,
+# everything the legal moves depend on, stored ahead of each move list so a hash collision is caught
+_CHECK_SIZE = 67
+
+def encode_moves(moves: List[Move]) -> bytes:
+    codes = array("H")
+    for move in moves:
+        if move.promotion:
+            kind = _PROMOTION + PROMOTION_TYPES.index(Piece.piece_type(move.promotion_piece))
+        elif move.enpassant:
+            kind = _ENPASSANT
+        elif move.castling:
+            kind = _CASTLING
+        elif move.reveal:
+            kind = _REVEAL
+        else:
+            kind = _NORMAL
+        codes.append(move.start | move.end << 6 | kind << 12)
+
+    return codes.tobytes()
+
+def decode_moves(position: "Position", data: bytes) -> List[Move]:
+    # Only squares and kinds are stored, pieces are read back from the position the list belongs to
+    codes = array("H")
+    codes.frombytes(data)
+
+    moves = []
+    for code in codes:
+        start, end, kind = code & 63, code >> 6 & 63, code >> 12
+        piece = position.get_square(start)
+
+        if kind == _NORMAL:
+            moves.append(Move(start, end, piece, position.get_square(end)))
+        elif kind == _ENPASSANT:
+            captured_square = end - 8 if Piece.colour(piece) == Piece.WHITE else end + 8
+            moves.append(Move(start, end, piece, position.get_square(captured_square), enpassant=True))
+        elif kind == _CASTLING:
+            moves.append(Move(start, end, piece, Piece.NONE, castling=_CASTLING_BY_END[end]))
+        elif kind == _REVEAL:
+            moves.append(Move(start, end, piece, position.get_square(end), reveal=True))
+        else:
+            promotion_piece = PROMOTION_TYPES[kind - _PROMOTION] | Piece.colour(piece)
+            moves.append(Move(start, end, piece, position.get_square(end), promotion=True, promotion_piece=promotion_piece))
+
+    return moves
+
+class MoveCache:
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, max_fullmove: int = DEFAULT_MAX_FULLMOVE) -> None:
+        self.__max_bytes = max_bytes
+
+        # Past the opening almost every position is new, caching those would only churn the cache
+        self.__max_fullmove = max_fullmove
+
+        self.__entries: OrderedDict[int, bytes] = OrderedDict()
+        self.__bytes = 0
+        self.__hits = 0
+        self.__misses = 0
+        self.__collisions = 0
+        self.__evictions = 0
+
+        # Shared by every room's thread
+        self.__lock = threading.Lock()
+
+    def covers(self, position: "Position") -> bool:
+        return position.get_fullmove_number() <= self.__max_fullmove
+
+    def get_legal_moves(self, position: "Position") -> List[Move]:
+        if not self.covers(position):
+            return generate_legal_moves(position, position.get_colour_to_move())
+
+        key = position.get_hash()
+        check = position.to_bytes()[:_CHECK_SIZE]
+        with self.__lock:
+            data = self.__entries.get(key)
+            if data is not None and data.startswith(check):
+                self.__entries.move_to_end(key)
+                self.__hits += 1
+            else:
+                # Another position with the same hash is a miss, its moves would not be legal here
+                if data is not None:
+                    self.__collisions += 1
+                    data = None
+                self.__misses += 1
+
+        if data is not None:
+            return decode_moves(position, data[_CHECK_SIZE:])
+
+        moves = generate_legal_moves(position, position.get_colour_to_move())
+        self.__put(key, check + encode_moves(moves))
+        return moves
+
+    def __put(self, key: int, data: bytes) -> None:
+        size = sys.getsizeof(data) + _ENTRY_OVERHEAD
+        with self.__lock:
+            # Another thread may have generated the same position meanwhile, a colliding one is replaced
+            if (current := self.__entries.get(key)) is not None:
+                if current[:_CHECK_SIZE] == data[:_CHECK_SIZE]:
+                    return
+                del self.__entries[key]
+                self.__bytes -= sys.getsizeof(current) + _ENTRY_OVERHEAD
+
+            self.__entries[key] = data
+            self.__bytes += size
+
+            while self.__bytes > self.__max_bytes and self.__entries:
+                _, evicted = self.__entries.popitem(last=False)
+                self.__bytes -= sys.getsizeof(evicted) + _ENTRY_OVERHEAD
+                self.__evictions += 1
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries.clear()
+            self.__bytes = 0
+            self.__hits = self.__misses = self.__collisions = self.__evictions = 0
+
+    def get_stats(self) -> Dict[str, float]:
+        with self.__lock:
+            lookups = self.__hits + self.__misses
+            return {
+                "entries": len(self.__entries),
+                "bytes": self.__bytes,
+                "max_bytes": self.__max_bytes,
+                "hits": self.__hits,
+                "misses": self.__misses,
+                "hit_rate": self.__hits / lookups if lookups else 0.0,
+                "collisions": self.__collisions,
+                "evictions": self.__evictions,
+            }
+
+    def summary(self) -> str:
+        stats = self.get_stats()
+        return (
+            f"{stats['entries']} positions, {stats['bytes'] / 1024:.0f}/{stats['max_bytes'] / 1024:.0f} KB, "
+            f"{stats['hits']} hits / {stats['misses']} misses ({stats['hit_rate']:.1%}), {stats['collisions']} collisions, "
+            f"{stats['evictions']} evictions"
+        )
+
+_move_cache: MoveCache | None = MoveCache()
+
+def get_move_cache() -> MoveCache | None:
+    return _move_cache
+
+def set_move_cache(cache: MoveCache | None) -> None:
+    # Pass None to turn caching off, e.g. to compare against plain generation
+    global _move_cache
+    _move_cache = cache
@@ -0,0 +1,144 @@
+from dataclasses import dataclass, field
+import re
+from typing import Dict, Iterable, Iterator, List
+
+from .fen import STARTING_FEN
+from .game_result import GameResult
+from .move import Move
+from .piece import Piece
+from .position import Position
+from .san import move_to_san
+
+PGN_RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+
+_HEADER_RE = re.compile(r'^\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]\s*$')
+_MOVE_NUMBER_RE = re.compile(r"^\d+\.+")
+_LINE_WIDTH = 80
+
+@dataclass
+class PgnGame:
+    headers: Dict[str, str] = field(default_factory=dict)
+    moves: List[str] = field(default_factory=list)
+    result: str = "*"
+
+    def get_start_fen(self) -> str:
+        return self.headers.get("FEN", STARTING_FEN)
+
+def result_to_pgn(result: GameResult, colour_to_move: int, loser: int | None = None) -> str:
+    if result == GameResult.CHECKMATE:
+        loser = colour_to_move
+
+    if result in (GameResult.CHECKMATE, GameResult.DISCONNECT, GameResult.TIMEOUT):
+        if loser is None:
+            return "*"
+        return "0-1" if loser == Piece.WHITE else "1-0"
+
+    if result == GameResult.NONE:
+        return "*"
+
+    return "1/2-1/2"
+
+def game_to_pgn(start_fen: str, moves: List[Move], result: str = "*", headers: Dict[str, str] | None = None) -> str:
+    tags = {
+        "Event": "?",
+        "Site": "?",
+        "Date": "????.??.??",
+        "Round": "-",
+        "White": "?",
+        "Black": "?",
+    }
+    tags.update(headers or {})
+    tags["Result"] = result
+    if start_fen != STARTING_FEN:
+        tags["SetUp"] = "1"
+        tags["FEN"] = start_fen
+
+    board = Position.from_fen(start_fen)
+    tokens = []
+    for i, move in enumerate(moves):
+        fullmove_number = board.get_fullmove_number()
+        if board.get_colour_to_move() == Piece.WHITE:
+            tokens.append(f"{fullmove_number}.")
+        elif i == 0:
+            tokens.append(f"{fullmove_number}...")
+
+        tokens.append(move_to_san(board, move))
+        board.apply_move(move)
+    tokens.append(result)
+
+    lines = []
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > _LINE_WIDTH:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+
+    header_lines = [f'[{key} "{_escape(value)}"]' for key, value in tags.items()]
+    return "\n".join(header_lines) + "\n\n" + "\n".join(lines) + "\n\n"
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+def _unescape(value: str) -> str:
+    return re.sub(r"\\(.)", r"\1", value)
+
+def _tokenise_movetext(text: str) -> Iterator[str]:
+    # Drop comments and variations, neither of which the archive writes
+    text = re.sub(r"\{[^}]*\}|;[^\n]*", " ", text)
+    depth = 0
+    for token in text.replace("(", " ( ").replace(")", " ) ").split():
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth = max(depth - 1, 0)
+        elif depth == 0 and not token.startswith("$"):
+            token = _MOVE_NUMBER_RE.sub("", token)
+            if token:
+                yield token
+
+def read_pgn_games(lines: Iterable[str]) -> Iterator[PgnGame]:
+    game = None
+    movetext = []
+
+    def finish() -> PgnGame:
+        game.result = game.headers.get("Result", "*")
+        for token in _tokenise_movetext(" ".join(movetext)):
+            if token in PGN_RESULTS:
+                game.result = token
+            else:
+                game.moves.append(token)
+        return game
+
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("%"):
+            continue
+
+        if line.startswith("["):
+            match = _HEADER_RE.match(line)
+            if match is None:
+                continue
+
+            # A header after movetext starts the next game
+            if game is not None and movetext:
+                yield finish()
+                game = None
+                movetext = []
+
+            if game is None:
+                game = PgnGame()
+            game.headers[match.group(1)] = _unescape(match.group(2))
+        else:
+            if game is None:
+                game = PgnGame()
+            movetext.append(line)
+
+    if game is not None:
+        yield finish()
+
+def iter_pgn_file(path: str) -> Iterator[PgnGame]:
+    with open(path, "r", encoding="utf-8") as f:
+        yield from read_pgn_games(f)
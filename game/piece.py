@@ -10,6 +10,9 @@ class Piece:
     WHITE = 0b01000  # 8
     BLACK = 0b10000  # 16
     
+    # Marks the pawn a player secretly chose as their hidden queen
+    HIDDEN = 0b100000  # 32
+    
     __TYPE_MASK = 0b00111  # 7
     __COLOUR_MASK = 0b11000  # 24 
     
@@ -45,6 +48,14 @@ class Piece:
     def can_slide_orthogonal(piece: int) -> int:
         return (piece & 0b00110) == 0b00110
     
+    @staticmethod
+    def is_hidden_queen(piece: int) -> int:
+        return piece & Piece.HIDDEN
+    
+    @staticmethod
+    def visible_to(piece: int, colour: int) -> int:
+        return piece if piece & Piece.__COLOUR_MASK == colour else piece & ~Piece.HIDDEN
+    
     @staticmethod
     def piece_type(piece: int) -> int:
         return piece & Piece.__TYPE_MASK
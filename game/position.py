@@ -0,0 +1,649 @@
+from array import array
+import struct
+from typing import Dict, List, Tuple
+
+from .castling_rights import CastlingRights
+from .evaluation import SQUARE_VALUES, evaluate_squares
+from .fen import format_fen, parse_fen
+from .game_result import GameResult
+from .move import Move, generate_legal_moves, get_changed_squares, has_legal_move, is_legal_move, is_square_attacked
+from .move_cache import get_move_cache
+from .piece import Piece
+from .utils import is_on_board
+from .zobrist import BLACK_TO_MOVE_KEY, CASTLING_KEYS, ENPASSANT_KEYS, PIECE_KEYS, hash_squares
+
+# Squares, colour to move, castling rights, en passant square (255 for none), halfmove clock, fullmove number
+_PACKED_POSITION = struct.Struct("<64sBBBHH")
+_NO_ENPASSANT = 255
+
+# Bishops on light squares can never meet bishops on dark ones, which insufficient material needs to know
+_LIGHT_SQUARES = [(square // 8 + square % 8) % 2 == 1 for square in range(64)]
+
+_debug_checks = False
+
+def set_debug_checks(enabled: bool) -> None:
+    # Cross-checks the incremental bookkeeping against full board scans after every applied move, slow
+    global _debug_checks
+    _debug_checks = enabled
+
+class Position:
+    __slots__ = (
+        "__squares", "__colour_to_move", "__castling_rights", "__last_move", "__evaluation", "__hash",
+        "__piece_counts", "__light_bishops", "__king_squares", "__history", "__position_freq", "__initial_fen",
+        "__game_result", "__fifty_move_count", "__fullmove_number", "__moves", "__compact", "__packed_moves"
+    )
+
+    def __init__(
+        self,
+        squares: List[int] | None = None,
+        colour_to_move: int = Piece.WHITE,
+        castling_rights: int = CastlingRights.ALL,
+        enpassant_square: int | None = None,
+        halfmove_clock: int = 0,
+        fullmove_number: int = 1
+    ) -> None:
+        # The start position unless squares are given, so from_position sets a position up once rather than twice
+        self.__compact = False
+        if squares is None:
+            squares = self.__get_initial_squares()
+        self.set_position(squares, colour_to_move, castling_rights, enpassant_square, halfmove_clock, fullmove_number)
+
+    @classmethod
+    def from_position(
+        cls,
+        squares: List[int],
+        colour_to_move: int,
+        castling_rights: int,
+        enpassant_square: int | None = None,
+        halfmove_clock: int = 0,
+        fullmove_number: int = 1
+    ) -> "Position":
+        return cls(squares, colour_to_move, castling_rights, enpassant_square, halfmove_clock, fullmove_number)
+
+    @classmethod
+    def from_fen(cls, fen: str) -> "Position":
+        return cls.from_position(*parse_fen(fen))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Position":
+        squares, colour_to_move, castling_rights, enpassant_square, halfmove_clock, fullmove_number = _PACKED_POSITION.unpack(data)
+        if enpassant_square == _NO_ENPASSANT:
+            enpassant_square = None
+        return cls.from_position(list(squares), colour_to_move, castling_rights, enpassant_square, halfmove_clock, fullmove_number)
+
+    @staticmethod
+    def __get_initial_squares() -> List[int]:
+        return [
+            14, 11, 13, 15, 9, 13, 11, 14,
+            10, 10, 10, 10, 10, 10, 10, 10,
+            *([0] * 32),
+            18, 18, 18, 18, 18, 18, 18, 18,
+            22, 19, 21, 23, 17, 21, 19, 22
+        ]
+
+    def set_position(
+        self,
+        squares: List[int],
+        colour_to_move: int,
+        castling_rights: int,
+        enpassant_square: int | None = None,
+        halfmove_clock: int = 0,
+        fullmove_number: int = 1
+    ) -> None:
+        # One byte per square, a copy per ply of history costs an eighth of a list's
+        self.__squares = bytearray(squares)
+        self.__colour_to_move = colour_to_move
+        self.__castling_rights = CastlingRights(castling_rights)
+        self.__last_move = Position.__get_enpassant_move(enpassant_square, colour_to_move)
+        self.__evaluation = evaluate_squares(self.__squares)
+        self.__hash = self.__hash_position()
+        self.__piece_counts, self.__light_bishops, self.__king_squares = Position.__count_material(self.__squares)
+
+        self.__history = []
+        self.__packed_moves = array("Q")
+        self.__position_freq = {}
+        self.__increment_position_key()
+
+        self.__initial_fen = None
+
+        self.__game_result = GameResult.NONE
+        self.__fifty_move_count = halfmove_clock
+        self.__fullmove_number = fullmove_number
+
+        # Legal moves are generated on first use so that setting up a position stays cheap
+        self.__moves = None
+
+    @staticmethod
+    def __get_enpassant_move(enpassant_square: int | None, colour_to_move: int) -> Move | None:
+        if enpassant_square is None:
+            return None
+
+        # Only the last move is tracked, so recreate the double pawn push that allows en passant
+        direction = 8 if colour_to_move == Piece.WHITE else -8
+        pawn = Piece.PAWN | Piece.opposite_colour(colour_to_move)
+        return Move(enpassant_square + direction, enpassant_square - direction, pawn, Piece.NONE)
+
+    def set_compact(self, compact: bool) -> None:
+        # For games that only ever move forwards, such as a server's rooms: applied moves cannot be unmade, they are
+        # stored packed, and repetitions are only counted since the last capture or pawn move, the only ones that can recur
+        if self.__history or self.__packed_moves:
+            raise ValueError("Compact mode can only be changed before the first move")
+
+        self.__compact = compact
+
+    def is_compact(self) -> bool:
+        return self.__compact
+
+    def load_fen(self, fen: str) -> None:
+        self.set_position(*parse_fen(fen))
+
+    def get_initial_fen(self) -> str:
+        if self.__initial_fen is None:
+            if self.__history:
+                first = self.__history[0]
+                self.__initial_fen = format_fen(
+                    first["squares"],
+                    first["colour_to_move"],
+                    first["castling_rights"],
+                    Position.__get_enpassant_target(first["last_move"]),
+                    first["fifty_move_count"],
+                    first["fullmove_number"]
+                )
+            else:
+                self.__initial_fen = self.get_fen()
+
+        return self.__initial_fen
+
+    def get_fen(self) -> str:
+        return format_fen(
+            self.__squares,
+            self.__colour_to_move,
+            self.__castling_rights,
+            self.get_enpassant_square(),
+            self.__fifty_move_count,
+            self.__fullmove_number
+        )
+
+    def to_bytes(self) -> bytes:
+        # A fixed 71 byte form for handing positions to other processes, history is not included
+        enpassant_square = self.get_enpassant_square()
+        return _PACKED_POSITION.pack(
+            bytes(self.__squares),
+            self.__colour_to_move,
+            self.__castling_rights,
+            _NO_ENPASSANT if enpassant_square is None else enpassant_square,
+            self.__fifty_move_count,
+            self.__fullmove_number
+        )
+
+    def save_history(self) -> None:
+        # The start is all a compact position remembers once its history is dropped, for archiving the game
+        if self.__compact and not self.__packed_moves:
+            self.get_initial_fen()
+
+        self.__history.append({
+            "squares": self.__squares[:],
+            "colour_to_move": self.__colour_to_move,
+            "castling_rights": self.__castling_rights,
+            "last_move": self.__last_move,
+            "fifty_move_count": self.__fifty_move_count,
+            "fullmove_number": self.__fullmove_number,
+            "moves": self.__moves,
+            "evaluation": self.__evaluation,
+            "hash": self.__hash,
+            # Replaced rather than mutated by make_move, so the references stay valid snapshots
+            "piece_counts": self.__piece_counts,
+            "light_bishops": self.__light_bishops,
+            "king_squares": self.__king_squares,
+        })
+
+    def __get_position_key(self) -> bytes:
+        # Squares then colour, castling rights and any en passant capture, a fraction of the size of a tuple of ints
+        return bytes(self.__squares) + bytes((
+            self.__colour_to_move,
+            self.__castling_rights,
+            self.__last_move.captured_piece if self.__last_move and self.__last_move.enpassant else Piece.NONE
+        ))
+
+    def __increment_position_key(self) -> None:
+        key = self.__get_position_key()
+        self.__position_freq[key] = self.__position_freq.get(key, 0) + 1
+
+    def get_square(self, index: int) -> int:
+        if not is_on_board(index):
+            raise IndexError()
+
+        return self.__squares[index]
+
+    def get_colour_to_move(self) -> int:
+        return self.__colour_to_move
+
+    def get_last_move(self) -> Move | None:
+        return self.__last_move
+
+    def get_enpassant_square(self) -> int | None:
+        return Position.__get_enpassant_target(self.__last_move)
+
+    @staticmethod
+    def __get_enpassant_target(last_move: Move | None) -> int | None:
+        if (
+            last_move is not None and
+            Piece.piece_type(last_move.piece) == Piece.PAWN and
+            not last_move.reveal and
+            abs(last_move.start - last_move.end) == 16
+        ):
+            return (last_move.start + last_move.end) // 2
+
+        return None
+
+    def get_fullmove_number(self) -> int:
+        return self.__fullmove_number
+
+    def get_halfmove_clock(self) -> int:
+        return self.__fifty_move_count
+
+    def get_repetition_count(self) -> int:
+        return self.__position_freq.get(self.__get_position_key(), 0)
+
+    def get_hash(self) -> int:
+        return self.__hash
+
+    def get_public_hash(self) -> int:
+        # Hidden queens hashed as the pawns both players see, so hidden queen games share keys with standard ones
+        hidden_pawn = Piece.PAWN | Piece.HIDDEN
+        if not (self.__piece_counts[Piece.WHITE | hidden_pawn] or self.__piece_counts[Piece.BLACK | hidden_pawn]):
+            return self.__hash
+        return hash_squares(
+            [piece & ~Piece.HIDDEN for piece in self.__squares], self.__colour_to_move, self.__castling_rights, self.get_enpassant_square()
+        )
+
+    def __hash_position(self) -> int:
+        return hash_squares(self.__squares, self.__colour_to_move, self.__castling_rights, self.get_enpassant_square())
+
+    def get_evaluation(self) -> int:
+        # Material and piece-square score from White's point of view, kept up to date by make_move
+        return self.__evaluation
+
+    def get_moves_played(self) -> List[Move]:
+        if self.__compact:
+            return [Move.unpack(code) for code in self.__packed_moves]
+
+        if not self.__history:
+            return []
+
+        return [state["last_move"] for state in self.__history[1:]] + [self.__last_move]
+
+    def get_ply_count(self) -> int:
+        # The length of get_moves_played without building the list
+        return len(self.__packed_moves) if self.__compact else len(self.__history)
+
+    def get_packed_moves(self) -> array:
+        # A copy of the moves played as Move.pack codes, which compact positions already hold
+        if self.__compact:
+            return self.__packed_moves[:]
+
+        return array("Q", (move.pack() for move in self.get_moves_played()))
+
+    def get_legal_moves(self) -> List[Move]:
+        if self.__moves is None:
+            self.__moves = self.__generate_legal_moves()
+
+        return self.__moves
+
+    def __generate_legal_moves(self) -> List[Move]:
+        # Positions every game passes through are generated once per process and then looked up
+        cache = get_move_cache()
+        if cache is None:
+            return generate_legal_moves(self, self.__colour_to_move)
+
+        return cache.get_legal_moves(self)
+
+    def get_castling_rights(self) -> CastlingRights:
+        return self.__castling_rights
+
+    def can_castle(self, castling_right: int) -> bool:
+        return self.__castling_rights & castling_right
+
+    def get_game_result(self) -> int:
+        return self.__game_result
+
+    def set_game_result(self, result: GameResult) -> None:
+        # For results decided away from the board, such as a flag falling
+        self.__game_result = result
+
+    def is_game_over(self) -> bool:
+        return self.__game_result != GameResult.NONE
+
+    def is_valid_move(self, move: Move) -> bool:
+        if self.__moves is None:
+            # Compact positions keep no move list, but in the opening the shared cache still makes this a lookup
+            cache = get_move_cache()
+            if not (self.__compact and cache is not None and cache.covers(self)):
+                # Otherwise check the single move instead of generating them all
+                return is_legal_move(self, move)
+            self.__moves = cache.get_legal_moves(self)
+
+        for m in self.__moves:
+            if move == m:
+                return True
+
+        return False
+
+    def apply_move(self, move: Move) -> None:
+        self.make_move(move)
+
+        # Legality checks still make and unmake moves on top, but nothing before an applied move is ever unmade
+        if self.__compact:
+            self.__history.clear()
+
+            # Nothing from before a capture or pawn move can be reached again
+            if self.__fifty_move_count == 0:
+                self.__position_freq.clear()
+                self.__increment_position_key()
+        else:
+            self.__moves = self.__generate_legal_moves()
+        self.__check_game_end()
+
+    def make_move(self, move: Move) -> None:
+        self.save_history()
+
+        # Evaluation and hash are updated from the few squares the move touches rather than recomputed
+        changed_squares = get_changed_squares(move)
+        evaluation = self.__evaluation
+        key = self.__hash ^ BLACK_TO_MOVE_KEY ^ CASTLING_KEYS[self.__castling_rights]
+        if (enpassant_square := self.get_enpassant_square()) is not None:
+            key ^= ENPASSANT_KEYS[enpassant_square % 8]
+
+        # Only captures, promotions and reveals change material, so most moves leave the counts alone
+        material_changed = move.promotion or move.reveal or move.enpassant or self.__squares[move.end] != Piece.NONE
+        if material_changed:
+            piece_counts = self.__piece_counts[:]
+            light_bishops = self.__light_bishops
+
+        for square in changed_squares:
+            piece = self.__squares[square]
+            evaluation -= SQUARE_VALUES[piece][square]
+            key ^= PIECE_KEYS[piece][square]
+            if material_changed:
+                piece_counts[piece] -= 1
+                if Piece.piece_type(piece) == Piece.BISHOP and _LIGHT_SQUARES[square]:
+                    light_bishops -= 1
+
+        self.__fifty_move_count += 1
+        if (Piece.piece_type(move.piece) == Piece.PAWN and not move.reveal) or move.captured_piece != Piece.NONE:
+            self.__fifty_move_count = 0
+
+        if self.__colour_to_move == Piece.BLACK:
+            self.__fullmove_number += 1
+
+        if move.promotion:
+            self.__squares[move.end] = move.promotion_piece
+            self.__squares[move.start] = Piece.NONE
+        elif move.reveal:
+            self.__squares[move.end] = Piece.QUEEN | Piece.colour(move.piece)
+        elif move.enpassant:
+            direction = 8 if self.__colour_to_move == Piece.WHITE else -8
+            captured_square = move.end - direction
+            self.__squares[captured_square] = Piece.NONE
+            self.__squares[move.end] = move.piece
+        elif move.castling:
+            if self.__colour_to_move == Piece.WHITE:
+                self.__castling_rights &= CastlingRights.B
+            else:
+                self.__castling_rights &= CastlingRights.W
+
+            match move.castling:
+                case CastlingRights.WK:
+                    self.__squares[4] = Piece.NONE
+                    self.__squares[7] = Piece.NONE
+                    self.__squares[6] = Piece.KING | Piece.WHITE
+                    self.__squares[5] = Piece.ROOK | Piece.WHITE
+                case CastlingRights.WQ:
+                    self.__squares[4] = Piece.NONE
+                    self.__squares[0] = Piece.NONE
+                    self.__squares[2] = Piece.KING | Piece.WHITE
+                    self.__squares[3] = Piece.ROOK | Piece.WHITE
+                case CastlingRights.BK:
+                    self.__squares[60] = Piece.NONE
+                    self.__squares[63] = Piece.NONE
+                    self.__squares[62] = Piece.KING | Piece.BLACK
+                    self.__squares[61] = Piece.ROOK | Piece.BLACK
+                case CastlingRights.BQ:
+                    self.__squares[60] = Piece.NONE
+                    self.__squares[56] = Piece.NONE
+                    self.__squares[58] = Piece.KING | Piece.BLACK
+                    self.__squares[59] = Piece.ROOK | Piece.BLACK
+        else:
+            piece_type = Piece.piece_type(move.piece)
+
+            if piece_type == Piece.KING:
+                if Piece.colour(move.piece) == Piece.WHITE:
+                    self.__castling_rights &= CastlingRights.B
+                else:
+                    self.__castling_rights &= CastlingRights.W
+
+            elif piece_type == Piece.ROOK:
+                if move.start == 0:
+                    self.__castling_rights &= ~CastlingRights.WQ
+                elif move.start == 7:
+                    self.__castling_rights &= ~CastlingRights.WK
+                elif move.start == 56:
+                    self.__castling_rights &= ~CastlingRights.BQ
+                elif move.start == 63:
+                    self.__castling_rights &= ~CastlingRights.BK
+
+            self.__squares[move.end] = move.piece
+
+        # Any capture on a rook's starting square, including by promotion, removes that castling right
+        if Piece.piece_type(move.captured_piece) == Piece.ROOK:
+            if move.end == 0:
+                self.__castling_rights &= ~CastlingRights.WQ
+            elif move.end == 7:
+                self.__castling_rights &= ~CastlingRights.WK
+            elif move.end == 56:
+                self.__castling_rights &= ~CastlingRights.BQ
+            elif move.end == 63:
+                self.__castling_rights &= ~CastlingRights.BK
+
+        self.__squares[move.start] = Piece.NONE
+
+        for square in changed_squares:
+            piece = self.__squares[square]
+            evaluation += SQUARE_VALUES[piece][square]
+            key ^= PIECE_KEYS[piece][square]
+            if material_changed:
+                piece_counts[piece] += 1
+                if Piece.piece_type(piece) == Piece.BISHOP and _LIGHT_SQUARES[square]:
+                    light_bishops += 1
+
+        if material_changed:
+            self.__piece_counts = piece_counts
+            self.__light_bishops = light_bishops
+
+        # Castling moves the king to the move's end square too
+        if Piece.piece_type(move.piece) == Piece.KING:
+            self.__king_squares = {**self.__king_squares, Piece.colour(move.piece): move.end}
+
+        key ^= CASTLING_KEYS[self.__castling_rights]
+        if (enpassant_square := Position.__get_enpassant_target(move)) is not None:
+            key ^= ENPASSANT_KEYS[enpassant_square % 8]
+
+        self.__evaluation = evaluation
+        self.__hash = key
+
+        self.__last_move = move
+        self.__colour_to_move = Piece.WHITE if self.__colour_to_move == Piece.BLACK else Piece.BLACK
+        self.__moves = None
+
+        if self.__compact:
+            self.__packed_moves.append(move.pack())
+        self.__increment_position_key()
+
+    def unmake_move(self) -> None:
+        if not self.__history:
+            return
+
+        if self.__compact:
+            self.__packed_moves.pop()
+
+        key = self.__get_position_key()
+        if key in self.__position_freq:
+            self.__position_freq[key] -= 1
+            if self.__position_freq[key] == 0:
+                del self.__position_freq[key]
+
+        last_state = self.__history.pop()
+
+        self.__squares = last_state["squares"]
+        self.__colour_to_move = last_state["colour_to_move"]
+        self.__castling_rights = last_state["castling_rights"]
+        self.__last_move = last_state["last_move"]
+        self.__fifty_move_count = last_state["fifty_move_count"]
+        self.__fullmove_number = last_state["fullmove_number"]
+        self.__moves = last_state["moves"]
+        self.__evaluation = last_state["evaluation"]
+        self.__hash = last_state["hash"]
+        self.__piece_counts = last_state["piece_counts"]
+        self.__light_bishops = last_state["light_bishops"]
+        self.__king_squares = last_state["king_squares"]
+
+    def place_piece(self, square: int, piece: int) -> None:
+        if self.__history or self.__packed_moves:
+            raise ValueError("Pieces can only be placed before the first move")
+
+        key = self.__get_position_key()
+        self.__position_freq.pop(key, None)
+
+        self.__squares[square] = piece
+        self.__evaluation = evaluate_squares(self.__squares)
+        self.__hash = self.__hash_position()
+        self.__piece_counts, self.__light_bishops, self.__king_squares = Position.__count_material(self.__squares)
+        self.__initial_fen = None
+        self.__moves = None
+        self.__increment_position_key()
+
+    def apply_delta(
+        self,
+        changes: List[Tuple[int, int]],
+        colour_to_move: int | None = None,
+        castling_rights: int | None = None,
+        enpassant_square: int | None = None,
+        game_result: GameResult = GameResult.NONE
+    ) -> None:
+        # Used by clients that only see a filtered view and are sent changed squares rather than moves
+        if colour_to_move is not None:
+            self.save_history()
+            self.__colour_to_move = colour_to_move
+            self.__last_move = Position.__get_enpassant_move(enpassant_square, colour_to_move)
+            if colour_to_move == Piece.WHITE:
+                self.__fullmove_number += 1
+
+        if castling_rights is not None:
+            self.__castling_rights = CastlingRights(castling_rights)
+
+        for square, piece in changes:
+            self.__squares[square] = piece
+        self.__evaluation = evaluate_squares(self.__squares)
+        self.__hash = self.__hash_position()
+        self.__piece_counts, self.__light_bishops, self.__king_squares = Position.__count_material(self.__squares)
+
+        self.__game_result = game_result
+        self.__moves = None
+
+    @staticmethod
+    def __count_material(squares: List[int]) -> Tuple[List[int], int, Dict[int, int]]:
+        # Counts indexed by the full piece value, empty squares included, as make_move keeps them
+        piece_counts = [0] * (Piece.HIDDEN << 1)
+        light_bishops = 0
+        king_squares = {}
+
+        for square, piece in enumerate(squares):
+            piece_counts[piece] += 1
+            if Piece.piece_type(piece) == Piece.BISHOP and _LIGHT_SQUARES[square]:
+                light_bishops += 1
+            elif Piece.piece_type(piece) == Piece.KING:
+                king_squares[Piece.colour(piece)] = square
+
+        return piece_counts, light_bishops, king_squares
+
+    def get_piece_count(self, piece: int) -> int:
+        return self.__piece_counts[piece]
+
+    def get_king_square(self, colour: int) -> int:
+        if colour not in self.__king_squares:
+            raise ValueError(f"No {Piece.colour_str(colour)} king on the board")
+
+        return self.__king_squares[colour]
+
+    def is_in_check(self, colour: int) -> bool:
+        return is_square_attacked(self, self.get_king_square(colour), Piece.opposite_colour(colour))
+
+    def __is_insufficient_material(self) -> bool:
+        counts = self.__piece_counts
+        pieces = 64 - counts[Piece.NONE]
+
+        if pieces == 2:
+            return True
+
+        minor_pieces = (
+            counts[Piece.KNIGHT | Piece.WHITE] + counts[Piece.KNIGHT | Piece.BLACK] +
+            counts[Piece.BISHOP | Piece.WHITE] + counts[Piece.BISHOP | Piece.BLACK]
+        )
+        if pieces == 3:
+            return minor_pieces == 1
+
+        # Kings and bishops that all stand on one square colour can never give mate
+        bishops = counts[Piece.BISHOP | Piece.WHITE] + counts[Piece.BISHOP | Piece.BLACK]
+        return pieces - 2 == bishops and self.__light_bishops in (0, bishops)
+
+    def __is_insufficient_material_full_scan(self) -> bool:
+        pieces = [(square, p) for square, p in enumerate(self.__squares) if p != Piece.NONE]
+        material = [Piece.piece_type(p) for _, p in pieces]
+
+        if material == [Piece.KING, Piece.KING]:
+            return True
+
+        if len(material) == 3:
+            return Piece.KNIGHT in material or Piece.BISHOP in material
+
+        bishop_colours = {_LIGHT_SQUARES[square] for square, p in pieces if Piece.piece_type(p) == Piece.BISHOP}
+        return material.count(Piece.KING) + material.count(Piece.BISHOP) == len(material) and len(bishop_colours) == 1
+
+    def __is_threefold_repetition(self) -> bool:
+        # Counts only grow for the position just reached, so no other position can have hit three unnoticed
+        return self.get_repetition_count() >= 3
+
+    def __is_threefold_repetition_full_scan(self) -> bool:
+        for count in self.__position_freq.values():
+            if count >= 3:
+                return True
+
+        return False
+
+    def __verify_bookkeeping(self) -> None:
+        piece_counts, light_bishops, king_squares = Position.__count_material(self.__squares)
+        if (piece_counts, light_bishops, king_squares) != (self.__piece_counts, self.__light_bishops, self.__king_squares):
+            raise AssertionError(f"Incremental material out of sync in {self.get_fen()}")
+
+        if self.__is_insufficient_material() != self.__is_insufficient_material_full_scan():
+            raise AssertionError(f"Insufficient material check out of sync in {self.get_fen()}")
+
+        if self.__is_threefold_repetition() != self.__is_threefold_repetition_full_scan():
+            raise AssertionError(f"Repetition check out of sync in {self.get_fen()}")
+
+    def __check_game_end(self) -> None:
+        if _debug_checks:
+            self.__verify_bookkeeping()
+
+        # Compact positions only look for one legal move, the full list is built if anyone asks for it
+        if not (self.__moves if self.__moves is not None else has_legal_move(self, self.__colour_to_move)):
+            if self.is_in_check(self.__colour_to_move):
+                self.__game_result = GameResult.CHECKMATE
+            else:
+                self.__game_result = GameResult.STALEMATE
+        elif self.__is_insufficient_material():
+            self.__game_result = GameResult.INSUFFICIENT_MATERIAL
+        elif self.__fifty_move_count >= 50:
+            self.__game_result = GameResult.FIFTY_MOVE_RULE
+        elif self.__is_threefold_repetition():
+            self.__game_result = GameResult.THREEFOLD_REPETITION
@@ -0,0 +1,107 @@
+import argparse
+from dataclasses import dataclass, field
+from multiprocessing import Pool
+import time
+from typing import Iterable, Iterator, List, Tuple
+
+from .pgn import iter_pgn_file
+from .position import Position
+from .san import san_to_move
+
+@dataclass
+class ReplayResult:
+    game_index: int
+    plies: int
+    illegal_ply: int | None = None
+    error: str | None = None
+
+    def is_valid(self) -> bool:
+        return self.illegal_ply is None
+
+@dataclass
+class ReplayReport:
+    results: List[ReplayResult] = field(default_factory=list)
+    games: int = 0
+    plies: int = 0
+    invalid_games: int = 0
+    elapsed: float = 0.0
+
+    def games_per_second(self) -> float:
+        return self.games / self.elapsed if self.elapsed > 0 else 0.0
+
+    def plies_per_second(self) -> float:
+        return self.plies / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.games} games, {self.plies} plies in {self.elapsed:.2f}s "
+            f"({self.games_per_second():.1f} games/s, {self.plies_per_second():.0f} plies/s), "
+            f"{self.invalid_games} invalid"
+        )
+
+def replay_game(game_index: int, start_fen: str, moves: List[str]) -> ReplayResult:
+    try:
+        position = Position.from_fen(start_fen)
+    except ValueError as e:
+        return ReplayResult(game_index, 0, 0, str(e))
+
+    # make_move skips the full legal move generation that apply_move does after every ply
+    for ply, san in enumerate(moves):
+        try:
+            move = san_to_move(position, san)
+        except ValueError as e:
+            return ReplayResult(game_index, ply, ply + 1, str(e))
+
+        position.make_move(move)
+
+    return ReplayResult(game_index, len(moves))
+
+def _replay_task(task: Tuple[int, str, List[str]]) -> ReplayResult:
+    return replay_game(*task)
+
+def replay_games(
+    games: Iterable[Tuple[str, List[str]]],
+    workers: int | None = None,
+    chunksize: int = 64,
+    keep_valid: bool = False
+) -> ReplayReport:
+    report = ReplayReport()
+    tasks = ((i, start_fen, moves) for i, (start_fen, moves) in enumerate(games))
+
+    start = time.perf_counter()
+    if workers == 1:
+        results = map(_replay_task, tasks)
+        _collect(report, results, keep_valid)
+    else:
+        with Pool(processes=workers) as pool:
+            _collect(report, pool.imap(_replay_task, tasks, chunksize=chunksize), keep_valid)
+    report.elapsed = time.perf_counter() - start
+
+    return report
+
+def _collect(report: ReplayReport, results: Iterator[ReplayResult], keep_valid: bool) -> None:
+    for result in results:
+        report.games += 1
+        report.plies += result.plies
+        if not result.is_valid():
+            report.invalid_games += 1
+
+        # Only failures are kept by default so memory stays flat on large archives
+        if keep_valid or not result.is_valid():
+            report.results.append(result)
+
+def iter_archive_games(path: str) -> Iterator[Tuple[str, List[str]]]:
+    for game in iter_pgn_file(path):
+        yield game.get_start_fen(), game.moves
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay and validate archived games")
+    parser.add_argument("archive", help="PGN archive to validate")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=64)
+    args = parser.parse_args()
+
+    report = replay_games(iter_archive_games(args.archive), workers=args.workers, chunksize=args.chunksize)
+    for result in report.results:
+        print(f"[REPLAY] Game {result.game_index}: illegal ply {result.illegal_ply}: {result.error}")
+    print(f"[REPLAY] {report.summary()}")
@@ -0,0 +1,123 @@
+import re
+from typing import List
+
+from .fen import parse_square, square_name
+from .move import Move, _is_move_legal, generate_piece_moves, has_legal_move
+from .piece import Piece
+
+_SAN_RE = re.compile(r"^([KQRBN])?([a-h])?([1-8])?(x)?([a-h][1-8])(?:=?([QRBN]))?$")
+
+_PIECE_LETTERS = {
+    "K": Piece.KING,
+    "Q": Piece.QUEEN,
+    "R": Piece.ROOK,
+    "B": Piece.BISHOP,
+    "N": Piece.KNIGHT,
+}
+
+def _find_moves_to(board: "Board", piece: int, end: int) -> List[Move]:
+    # Only the pieces that could land on the target square are generated, not the whole move list
+    colour = Piece.colour(piece)
+    moves = []
+    for square in range(64):
+        square_piece = board.get_square(square)
+        if square_piece & ~Piece.HIDDEN != piece:
+            continue
+
+        for move in generate_piece_moves(board, square, square_piece):
+            if move.end == end and not move.castling and not move.reveal and _is_move_legal(board, colour, move):
+                moves.append(move)
+
+    return moves
+
+def move_to_san(board: "Board", move: Move) -> str:
+    colour = board.get_colour_to_move()
+    opp_colour = Piece.opposite_colour(colour)
+    piece_type = Piece.piece_type(move.piece)
+    is_capture = move.enpassant or move.captured_piece != Piece.NONE
+    target = square_name(move.end)
+
+    if move.castling:
+        san = "O-O" if move.end > move.start else "O-O-O"
+    elif move.reveal:
+        # A hidden queen is revealed by moving as a queen, always written from its full square
+        san = "Q" + square_name(move.start) + ("x" if is_capture else "") + target
+    elif piece_type == Piece.PAWN:
+        san = square_name(move.start)[0] + "x" + target if is_capture else target
+        if move.promotion:
+            san += "=" + Piece.piece_letter(Piece.piece_type(move.promotion_piece))
+    else:
+        # Disambiguate between identical pieces that can reach the same square
+        start_rank, start_file = divmod(move.start, 8)
+        rivals = [m.start for m in _find_moves_to(board, move.piece, move.end) if m.start != move.start]
+        disambiguation = ""
+        if rivals:
+            start_name = square_name(move.start)
+            if all(start_file != rival % 8 for rival in rivals):
+                disambiguation = start_name[0]
+            elif all(start_rank != rival // 8 for rival in rivals):
+                disambiguation = start_name[1]
+            else:
+                disambiguation = start_name
+
+        san = Piece.piece_letter(piece_type) + disambiguation + ("x" if is_capture else "") + target
+
+    board.make_move(move)
+    if board.is_in_check(opp_colour):
+        san += "+" if has_legal_move(board, opp_colour) else "#"
+    board.unmake_move()
+
+    return san
+
+def san_to_move(board: "Board", san: str) -> Move:
+    # Accept zero-based castling as written by some tools
+    san = san.rstrip("+#!?").replace("0", "O")
+    colour = board.get_colour_to_move()
+
+    if san in ("O-O", "O-O-O"):
+        king = Piece.KING | colour
+        candidates = [
+            m for m in generate_piece_moves(board, board.get_king_square(colour), king)
+            if m.castling and (m.end > m.start) == (san == "O-O") and _is_move_legal(board, colour, m)
+        ]
+    else:
+        match = _SAN_RE.match(san)
+        if match is None:
+            raise ValueError(f"Malformed SAN move: {san!r}")
+
+        letter, from_file, from_rank, _, target, promotion = match.groups()
+        piece = (_PIECE_LETTERS[letter] if letter else Piece.PAWN) | colour
+        end = parse_square(target)
+
+        moves = _find_moves_to(board, piece, end)
+        if letter == "Q" and from_file and from_rank:
+            start = parse_square(from_file + from_rank)
+            hidden_queen = board.get_square(start)
+            if Piece.is_hidden_queen(hidden_queen) and Piece.colour(hidden_queen) == colour:
+                moves += [
+                    m for m in generate_piece_moves(board, start, hidden_queen)
+                    if m.reveal and m.end == end and _is_move_legal(board, colour, m)
+                ]
+
+        candidates = []
+        for move in moves:
+            if from_file and move.start % 8 != "abcdefgh".index(from_file):
+                continue
+            if from_rank and move.start // 8 != int(from_rank) - 1:
+                continue
+
+            if move.promotion:
+                if promotion is None:
+                    continue
+                move = Move(move.start, move.end, move.piece, move.captured_piece, promotion=True)
+                move.promotion_piece = _PIECE_LETTERS[promotion] | colour
+            elif promotion is not None:
+                continue
+
+            candidates.append(move)
+
+    if len(candidates) != 1:
+        reason = "Illegal" if not candidates else "Ambiguous"
+        raise ValueError(f"{reason} SAN move: {san!r}")
+
+    return candidates[0]
@@ -0,0 +1,30 @@
+import random
+from typing import List
+
+from .piece import Piece
+
+# Fixed seed so hashes are stable across processes, runs and machines
+_rng = random.Random(0x5EED)
+
+PIECE_KEYS: List[List[int]] = [
+    [_rng.getrandbits(64) if Piece.colour(piece) else 0 for _ in range(64)]
+    for piece in range(Piece.HIDDEN << 1)
+]
+BLACK_TO_MOVE_KEY = _rng.getrandbits(64)
+CASTLING_KEYS = [_rng.getrandbits(64) for _ in range(16)]
+ENPASSANT_KEYS = [_rng.getrandbits(64) for _ in range(8)]
+
+def hash_squares(squares: List[int], colour_to_move: int, castling_rights: int, enpassant_square: int | None) -> int:
+    key = 0
+    for square, piece in enumerate(squares):
+        key ^= PIECE_KEYS[piece][square]
+
+    if colour_to_move == Piece.BLACK:
+        key ^= BLACK_TO_MOVE_KEY
+
+    key ^= CASTLING_KEYS[castling_rights]
+
+    if enpassant_square is not None:
+        key ^= ENPASSANT_KEYS[enpassant_square % 8]
+
+    return key
@@ -0,0 +1,15 @@
+import importlib
+import sys
+from typing import Any, Callable, Dict
+
+def lazy_getattr(package: str, imports: Dict[str, str]) -> Callable[[str], Any]:
+    # A module __getattr__ for a package that imports each name from its relative module on first use,
+    # then keeps it in the package so later lookups never come back here
+    def __getattr__(name: str) -> Any:
+        if name not in imports:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(imports[name], package), name)
+        setattr(sys.modules[package], name, value)
+        return value
+
+    return __getattr__
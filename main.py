@@ -23,9 +23,23 @@ def main() -> None:
     state = GameState.WAITING
     result = GameResult.NONE
     banner_msg = "Waiting for opponent..."
+    oriented = False
+    
+    def _orient_board():
+        nonlocal oriented
+        if not oriented and client.get_colour() == Piece.BLACK:
+            Board.flip_board(board)
+        oriented = True
+    
+    def _on_choose_hidden_queen():
+        nonlocal state, banner_msg
+        _orient_board()
+        state = GameState.CHOOSING_HIDDEN_QUEEN
+        banner_msg = "Choose a pawn to be your hidden queen"
     
     def _on_game_start():
         nonlocal state, banner_msg
+        _orient_board()
         state = GameState.PLAYING
         banner_msg = ""
 
@@ -36,23 +50,35 @@ def main() -> None:
             result = GameResult.DISCONNECT
             banner_msg = "Opponent disconnected. You win!"
     
+    def _on_timeout(loser: int):
+        nonlocal state, result, banner_msg
+        if state != GameState.GAME_OVER:
+            state = GameState.GAME_OVER
+            result = GameResult.TIMEOUT
+            winner = "White" if loser == Piece.BLACK else "Black"
+            banner_msg = f"Game Over: {winner} wins on time!"
+    
     board = Board()
     board.set_pos_centre(win)
     
-    client = networking.Client(_on_game_start, board.apply_move, _on_opponent_disconnect)    
+    client = networking.Client(
+        _on_game_start,
+        board.apply_move,
+        _on_opponent_disconnect,
+        on_choose_hidden_queen=_on_choose_hidden_queen,
+        on_delta_received=lambda delta: delta.apply_to(board),
+        on_timeout=_on_timeout
+    )
     try:
         client.connect()
     except (ConnectionRefusedError, ConnectionResetError) as e:
         print(f"[ERROR] Could not connect to server: {e}")
         return
 
-    if client.get_colour() is None:
-        print("[ERROR] Could not get player colour from server.")
+    if not client.is_connected():
+        print("[ERROR] Could not connect to server.")
         return
     
-    if client.get_colour() == Piece.BLACK:
-        Board.flip_board(board)
-    
     while True:
         clock.tick(FPS)
         
@@ -87,6 +113,13 @@ def main() -> None:
                 pg.quit()
                 sys.exit(0)
                 
+            if state == GameState.CHOOSING_HIDDEN_QUEEN and e.type == pg.MOUSEBUTTONDOWN:
+                square = board.get_square_at(e.pos)
+                if square is not None and board.get_square(square) == Piece.PAWN | client.get_colour():
+                    client.send_hidden_queen(square)
+                    state = GameState.WAITING
+                    banner_msg = "Waiting for opponent to choose..."
+                
             if state == GameState.PLAYING and board.get_colour_to_move() == client.get_colour(): 
                 # Handle move events
                 move = board.handle_pg_event(e)
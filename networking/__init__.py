@@ -1,3 +1,6 @@
-from .client import Client
-from .game_room import GameRoom
-from .server import Server
\ No newline at end of file
+from lazy_imports import lazy_getattr
+
+# Imported on first use, so running one tool such as the server or the load generator does not import the others
+_LAZY_IMPORTS = {"Client": ".client", "GameRoom": ".game_room", "Server": ".server"}
+
+__getattr__ = lazy_getattr(__name__, _LAZY_IMPORTS)
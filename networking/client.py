@@ -1,11 +1,13 @@
 import json
 import socket
 import threading
-from typing import Callable
+import time
+from typing import Callable, Dict
 
 import networking.utils as utils
 
 from game import Move, Piece
+from game.hidden_queen import ViewDelta
 
 class Client:
     def __init__(
@@ -14,30 +16,62 @@ class Client:
         on_move_received: Callable[[Move], None],
         on_opponent_disconnect: Callable[[], None],
         host: str = "127.0.0.1", 
-        port: int = 5555
+        port: int = 5555,
+        on_choose_hidden_queen: Callable[[], None] | None = None,
+        on_delta_received: Callable[[ViewDelta], None] | None = None,
+        on_timeout: Callable[[int], None] | None = None,
+        resume_timeout: float = 30.0,
+        rating: int | None = None,
+        time_control: str | None = None
     ) -> None:
         self.__on_game_start = on_game_start
         self.__on_move_received = on_move_received
         self.__on_opponent_disconnect = on_opponent_disconnect
+        self.__on_choose_hidden_queen = on_choose_hidden_queen
+        self.__on_delta_received = on_delta_received
+        self.__on_timeout = on_timeout
         
         self.__host = host
         self.__port = port
+        self.__resume_timeout = resume_timeout
+        self.__rating = rating
+        self.__time_control = time_control
         
         self.__socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)#
         self.__connected = True
         
         self.__colour: int | None = None
+        self.__clock: Dict[str, float] | None = None
+        self.__session: str | None = None
+        self.__finished = False
         self.__receive_thread: threading.Thread | None = None
         
     def get_colour(self) -> int:
         return self.__colour    
+    
+    def get_clock(self) -> Dict[str, float] | None:
+        # Seconds left for "white" and "black" as of the last move, None without a time control
+        return self.__clock
+    
+    def get_session(self) -> str | None:
+        # Only servers that snapshot their rooms hand out sessions, and only then is a dropped game resumed
+        return self.__session
+    
+    def is_connected(self) -> bool:
+        return self.__connected
         
     def connect(self) -> None:
         try:
             self.__socket.connect((self.__host, self.__port))
             self.__connected = True
-            self.__receive_initial_message()
+            self.__log("Connected, waiting for an opponent")
             
+            # Servers that wait for a hello pair us by it, the others ignore it
+            if self.__rating is not None or self.__time_control is not None:
+                hello = {"rating": self.__rating, "time_control": self.__time_control}
+                utils.send_json(self.__socket, json.dumps({"hello": hello}))
+            
+            # Colour is only assigned once the matchmaker pairs us, so it arrives on the receive loop
             self.__receive_thread = threading.Thread(target=self.__receive_loop)
             self.__receive_thread.start()
             
@@ -45,41 +79,84 @@ class Client:
             self.__log(f"Connection error: {e}")
             self.disconnect()
     
-    def __receive_initial_message(self) -> None:
-        try:
-            msg = self.__socket.recv(1024).decode()
-            self.__colour = json.loads(msg).get("colour")
-            self.__log(f"Connected as player {Piece.colour_str(self.__colour)}")
-        except Exception as e:
-            self.__log(f"Failed to read initial message: {e}")
-            self.disconnect()
-    
     def send_move(self, move: Move) -> None:
         try:
             utils.send_move(self.__socket, move)
         except Exception as e:
             self.__log(f"Failed to send move: {e}")
 
+    def send_hidden_queen(self, square: int) -> None:
+        try:
+            utils.send_json(self.__socket, json.dumps({"hidden_queen": square}))
+        except Exception as e:
+            self.__log(f"Failed to send hidden queen: {e}")
+
     def __receive_loop(self) -> None:
         buffer = ""
         while self.__connected:
             try:
                 if not (data := self.__socket.recv(4096)):
                     self.__log("Server disconnected")
-                    break
+                    if (buffer := self.__resume()) is None:
+                        break
+                else:
+                    buffer += data.decode()
                 
-                buffer += data.decode()
                 while "\n" in buffer:
                     line, buffer = buffer.split("\n", 1)
                     self.__handle_message(line.strip())
                     
             except (OSError, socket.error) as e:
-                if self.__connected:
-                    self.__log(f"Receive error: {e}")
-                break
+                if not self.__connected:
+                    break
+                self.__log(f"Receive error: {e}")
+                if (buffer := self.__resume()) is None:
+                    break
 
         self.disconnect()
 
+    def __resume(self) -> str | None:
+        # A restarted server holds our seat for a while, so keep knocking until it is back, returning what it sent
+        if self.__session is None or self.__finished or not self.__connected:
+            return None
+        
+        deadline = time.monotonic() + self.__resume_timeout
+        while self.__connected and time.monotonic() < deadline:
+            time.sleep(1.0)
+            conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            try:
+                conn.settimeout(5.0)
+                conn.connect((self.__host, self.__port))
+                utils.send_json(conn, json.dumps({"resume": self.__session}))
+                
+                reply = b""
+                while b"\n" not in reply:
+                    if not (data := conn.recv(4096)):
+                        raise ConnectionError("Closed before replying")
+                    reply += data
+                conn.settimeout(None)
+            except OSError:
+                conn.close()
+                continue
+            
+            line = reply.partition(b"\n")[0]
+            try:
+                resumed = json.loads(line).get("resumed")
+            except (ValueError, AttributeError):
+                resumed = False
+            
+            if not resumed:
+                self.__log(f"Could not resume the game: {line.decode(errors='replace')}")
+                conn.close()
+                return None
+            
+            self.__socket.close()
+            self.__socket = conn
+            self.__log("Resumed the game")
+            return reply.decode()
+        
+        return None
+
     def __handle_message(self, msg: str) -> None:
         if not msg:
             return
@@ -90,15 +167,45 @@ class Client:
             self.__log("Received invalid JSON")
             return
 
+        if (colour := msg_dict.get("colour")) is not None:
+            self.__colour = colour
+            self.__log(f"Playing as {Piece.colour_str(colour)}")
+        
+        if session := msg_dict.get("session"):
+            self.__session = session
+
         if err := msg_dict.get("error"):
             self.__log(f"`Error`: {err}")
 
         if msg_dict.get("disconnect"):
             self.__log("Opponent disconnected")
+            self.__finished = True
             if self.__on_opponent_disconnect:
                 self.__on_opponent_disconnect()
             return
             
+        if (seq := msg_dict.get("ping")) is not None:
+            try:
+                utils.send_json(self.__socket, json.dumps({"pong": seq}))
+            except OSError as e:
+                self.__log(f"Failed to answer ping: {e}")
+            return
+        
+        if (loser := msg_dict.get("timeout")) is not None:
+            self.__log(f"{Piece.colour_str(loser)} ran out of time")
+            self.__finished = True
+            if self.__on_timeout:
+                self.__on_timeout(loser)
+            return
+        
+        if clock := msg_dict.get("clock"):
+            self.__clock = clock
+            
+        if msg_dict.get("choose_hidden_queen"):
+            self.__log("Choose a pawn to be your hidden queen")
+            if self.__on_choose_hidden_queen:
+                self.__on_choose_hidden_queen()
+            
         if msg_dict.get("begin"):
             self.__log("Game started!")
             if self.__on_game_start:
@@ -111,6 +218,14 @@ class Client:
                     self.__on_move_received(move)
             except Exception as e:
                 self.__log(f"Failed to parse move: {e}")
+        
+        if delta_dict := msg_dict.get("delta"):
+            try:
+                delta = ViewDelta.from_dict(delta_dict)
+                if self.__on_delta_received:
+                    self.__on_delta_received(delta)
+            except Exception as e:
+                self.__log(f"Failed to parse update: {e}")
                 
     def disconnect(self) -> None:
         if self.__connected == False:
@@ -0,0 +1,54 @@
+import time
+from typing import Dict
+
+from game import Piece
+
+class ChessClock:
+    __slots__ = ("__increment", "__remaining", "__running", "__turn_started")
+
+    def __init__(self, base: float, increment: float = 0.0) -> None:
+        self.__increment = increment
+        self.__remaining = {Piece.WHITE: base, Piece.BLACK: base}
+        self.__running: int | None = None
+        self.__turn_started = 0.0
+
+    def get_running(self) -> int | None:
+        return self.__running
+
+    def get_remaining(self, colour: int, now: float | None = None) -> float:
+        remaining = self.__remaining[colour]
+        if colour == self.__running:
+            remaining -= (time.monotonic() if now is None else now) - self.__turn_started
+        return remaining
+
+    def set_remaining(self, colour: int, remaining: float) -> None:
+        self.__remaining[colour] = remaining
+
+    def start(self, colour: int, now: float | None = None) -> None:
+        self.__running = colour
+        self.__turn_started = time.monotonic() if now is None else now
+
+    def stop(self, now: float | None = None) -> None:
+        if self.__running is not None:
+            self.__remaining[self.__running] = self.get_remaining(self.__running, now)
+            self.__running = None
+
+    def press(self, colour: int, now: float | None = None) -> bool:
+        # Charges the mover for the time since their turn began, False if it ran out before the move arrived
+        now = time.monotonic() if now is None else now
+        remaining = self.get_remaining(colour, now)
+        self.__remaining[colour] = remaining
+        if remaining <= 0:
+            self.__running = None
+            return False
+
+        self.__remaining[colour] += self.__increment
+        self.start(Piece.opposite_colour(colour), now)
+        return True
+
+    def to_dict(self, now: float | None = None) -> Dict[str, float]:
+        now = time.monotonic() if now is None else now
+        return {
+            "white": round(max(0.0, self.get_remaining(Piece.WHITE, now)), 3),
+            "black": round(max(0.0, self.get_remaining(Piece.BLACK, now)), 3),
+        }
@@ -0,0 +1,100 @@
+from dataclasses import dataclass, field
+import os
+import queue
+import threading
+import time
+from typing import Dict, Iterator, List
+
+from .position_index import PositionIndexWriter
+
+from game import Move
+from game.pgn import PgnGame, game_to_pgn, iter_pgn_file
+
+@dataclass
+class ArchivedGame:
+    start_fen: str
+    moves: List[Move]
+    result: str
+    headers: Dict[str, str] = field(default_factory=dict)
+
+class GameArchiveWriter:
+    def __init__(self, path: str, batch_size: int = 64, flush_interval: float = 1.0, index_dir: str | None = None) -> None:
+        self.__path = path
+        self.__batch_size = batch_size
+        self.__flush_interval = flush_interval
+
+        # Fed on the writer thread as each game is written, so the server never waits on indexing
+        self.__index = PositionIndexWriter(index_dir) if index_dir else None
+
+        self.__queue: queue.Queue[ArchivedGame | None] = queue.Queue()
+        self.__closed = False
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.__thread = threading.Thread(target=self.__write_loop, daemon=True)
+        self.__thread.start()
+
+    def submit(self, game: ArchivedGame) -> None:
+        if self.__closed:
+            return
+
+        # Never blocks, formatting and disk I/O happen on the writer thread
+        self.__queue.put_nowait(game)
+
+    def close(self) -> None:
+        if self.__closed:
+            return
+
+        # Waits for the queue to drain, games still queued would otherwise be lost with the daemon thread at exit
+        self.__closed = True
+        self.__queue.put(None)
+        self.__thread.join()
+
+    def __write_loop(self) -> None:
+        try:
+            self.__write_games()
+        finally:
+            # Closed on this thread once the last game is written, so it is never closed while a game is being indexed
+            if self.__index is not None:
+                self.__index.close()
+
+    def __write_games(self) -> None:
+        with open(self.__path, "a", encoding="utf-8") as f:
+            running = True
+            while running:
+                batch = []
+                deadline = time.monotonic() + self.__flush_interval
+
+                while len(batch) < self.__batch_size:
+                    try:
+                        game = self.__queue.get(timeout=max(deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        break
+
+                    if game is None:
+                        running = False
+                        break
+
+                    try:
+                        batch.append(game_to_pgn(game.start_fen, game.moves, game.result, game.headers))
+                    except Exception as e:
+                        self.__log(f"Failed to format game: {e}")
+                        continue
+
+                    if self.__index is not None:
+                        try:
+                            self.__index.add_game(game.start_fen, game.moves, game.result)
+                        except Exception as e:
+                            self.__log(f"Failed to index game: {e}")
+
+                if batch:
+                    f.write("".join(batch))
+                    f.flush()
+
+    def __log(self, msg: str) -> None:
+        print(f"[ARCHIVE] {msg}")
+
+def iter_archive(path: str) -> Iterator[PgnGame]:
+    return iter_pgn_file(path)
@@ -1,12 +1,31 @@
 from dataclasses import dataclass, field
 import json
 import socket
-from typing import List
+from typing import Dict, List
 
-from game.board import Board
+from .clock import ChessClock
+from .timer_wheel import Timer
 
-@dataclass
+from engine import TranspositionTable
+from game import Position
+from game.hidden_queen import HiddenQueenGame
+
+def _new_board() -> Position:
+    # The server never draws or undoes anything, so rooms hold a compact headless position rather than a Board
+    position = Position()
+    position.set_compact(True)
+    return position
+
+@dataclass(slots=True)
 class GameRoom:
     room_id: int
     players: List[socket.socket] = field(default_factory=list)
-    board: Board = field(default_factory=Board)
\ No newline at end of file
+    colours: Dict[socket.socket, int] = field(default_factory=dict)
+    board: Position = field(default_factory=_new_board)
+    hidden_queen: HiddenQueenGame | None = None
+    archived: bool = False
+    bot_colour: int | None = None
+    bot_table: TranspositionTable | None = None
+    clock: ChessClock | None = None
+    flag_timer: Timer | None = None
+    sessions: Dict[int, str] = field(default_factory=dict)
\ No newline at end of file
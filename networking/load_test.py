@@ -0,0 +1,235 @@
+import argparse
+import asyncio
+from dataclasses import dataclass, field
+import json
+import random
+import time
+from typing import List
+
+from networking.metrics import latency_summary
+import networking.utils as utils
+
+from game import Move, Piece, Position
+from game.hidden_queen import ViewDelta
+
+MAX_CONSECUTIVE_ERRORS = 20
+
+@dataclass
+class LoadStats:
+    latencies: List[float] = field(default_factory=list)
+    moves_sent: int = 0
+    errors: int = 0
+    connect_failures: int = 0
+    disconnects: int = 0
+    timeouts: int = 0
+    rejected: int = 0
+    games_started: int = 0
+    games_finished: int = 0
+
+    def summary(self, elapsed: float) -> str:
+        acked = len(self.latencies)
+        error_rate = self.errors / self.moves_sent if self.moves_sent else 0.0
+        return "\n".join((
+            f"Games started: {self.games_started}, finished: {self.games_finished}, "
+            f"opponent disconnects: {self.disconnects}, timeouts: {self.timeouts}, "
+            f"rejected as busy: {self.rejected}, connect failures: {self.connect_failures}",
+            f"Moves sent: {self.moves_sent}, acknowledged: {acked}, errors: {self.errors} ({error_rate:.2%})",
+            latency_summary(self.latencies, elapsed),
+        ))
+
+class LoadBot:
+    def __init__(self, stats: LoadStats, host: str, port: int, max_plies: int, think_time: float) -> None:
+        self.__stats = stats
+        self.__host = host
+        self.__port = port
+        self.__max_plies = max_plies
+        self.__think_time = think_time
+
+        self.__position = Position()
+        self.__colour: int | None = None
+        self.__started = False
+        self.__sent_at: float | None = None
+        self.__plies = 0
+        self.__consecutive_errors = 0
+
+    async def run(self) -> None:
+        try:
+            reader, writer = await asyncio.open_connection(self.__host, self.__port)
+        except OSError:
+            self.__stats.connect_failures += 1
+            return
+
+        try:
+            while line := await reader.readline():
+                if not await self.__handle_message(line.decode().strip(), writer):
+                    break
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def __handle_message(self, msg: str, writer: asyncio.StreamWriter) -> bool:
+        if not msg:
+            return True
+
+        try:
+            msg_dict = json.loads(msg)
+        except json.JSONDecodeError:
+            self.__stats.errors += 1
+            return True
+
+        if (seq := msg_dict.get("ping")) is not None:
+            writer.write((json.dumps({"pong": seq}) + "\n").encode())
+            await writer.drain()
+            return True
+
+        if "colour" in msg_dict:
+            self.__colour = msg_dict["colour"]
+
+        if msg_dict.get("error") == "Server busy":
+            self.__stats.rejected += 1
+            return False
+
+        if msg_dict.get("error"):
+            self.__stats.errors += 1
+            self.__consecutive_errors += 1
+            if self.__consecutive_errors >= MAX_CONSECUTIVE_ERRORS:
+                return False
+            
+            # The server rejected our move, so it is still our turn
+            self.__sent_at = None
+            return await self.__play(writer)
+
+        if msg_dict.get("disconnect"):
+            self.__stats.disconnects += 1
+            return False
+
+        if msg_dict.get("timeout") is not None:
+            # Counted once per game, by the player that lost on time
+            if msg_dict["timeout"] == self.__colour:
+                self.__stats.timeouts += 1
+            return False
+
+        if msg_dict.get("choose_hidden_queen"):
+            pawns = [sq for sq in range(64) if self.__position.get_square(sq) == Piece.PAWN | self.__colour]
+            writer.write((json.dumps({"hidden_queen": random.choice(pawns)}) + "\n").encode())
+            await writer.drain()
+            return True
+
+        if msg_dict.get("begin"):
+            self.__started = True
+            if self.__colour == Piece.WHITE:
+                self.__stats.games_started += 1
+            return await self.__play(writer)
+
+        if move_dict := msg_dict.get("move"):
+            if self.__sent_at is not None:
+                self.__stats.latencies.append(time.perf_counter() - self.__sent_at)
+                self.__sent_at = None
+
+            self.__position.apply_move(Move.from_dict(move_dict))
+            return await self.__on_move_applied(writer)
+
+        if delta_dict := msg_dict.get("delta"):
+            delta = ViewDelta.from_dict(delta_dict)
+            delta.apply_to(self.__position)
+            if delta.colour_to_move is None:
+                return True
+
+            if self.__sent_at is not None:
+                self.__stats.latencies.append(time.perf_counter() - self.__sent_at)
+                self.__sent_at = None
+
+            return await self.__on_move_applied(writer)
+
+        return True
+
+    async def __on_move_applied(self, writer: asyncio.StreamWriter) -> bool:
+        self.__plies += 1
+        self.__consecutive_errors = 0
+        if self.__position.is_game_over() or self.__plies >= self.__max_plies:
+            if self.__colour == Piece.WHITE:
+                self.__stats.games_finished += 1
+            return False
+
+        return await self.__play(writer)
+
+    async def __play(self, writer: asyncio.StreamWriter) -> bool:
+        if not self.__started or self.__colour != self.__position.get_colour_to_move():
+            return True
+
+        moves = self.__position.get_legal_moves()
+        if not moves:
+            return False
+
+        if self.__think_time > 0:
+            await asyncio.sleep(random.uniform(0, self.__think_time))
+
+        move = random.choice(moves)
+        self.__sent_at = time.perf_counter()
+        self.__stats.moves_sent += 1
+        writer.write(utils.encode_move(move))
+        await writer.drain()
+        return True
+
+async def run_load_test(
+    host: str,
+    port: int,
+    connections: int,
+    max_plies: int = 200,
+    think_time: float = 0.0,
+    ramp_up: float = 1.0,
+    duration: float | None = None,
+    idle_connections: int = 0
+) -> LoadStats:
+    stats = LoadStats()
+
+    async def hold_idle_connection() -> None:
+        # Connects and then never reads or answers, like a peer that vanished without closing its socket
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+        except OSError:
+            stats.connect_failures += 1
+            return
+        try:
+            await asyncio.sleep(duration if duration is not None else 3600)
+        finally:
+            writer.close()
+
+    async def start_bot(i: int) -> None:
+        # Spread connection attempts so the server sees a ramp rather than one burst
+        await asyncio.sleep(ramp_up * i / connections)
+        await LoadBot(stats, host, port, max_plies, think_time).run()
+
+    idle = [asyncio.create_task(hold_idle_connection()) for _ in range(idle_connections)]
+    tasks = [asyncio.create_task(start_bot(i)) for i in range(connections)]
+    done, pending = await asyncio.wait(tasks, timeout=duration)
+    pending |= set(idle)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless load generator for the game server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5555)
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--max-plies", type=int, default=200)
+    parser.add_argument("--think-time", type=float, default=0.0, help="max random delay before each move, in seconds")
+    parser.add_argument("--ramp-up", type=float, default=1.0, help="seconds over which connections are opened")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    parser.add_argument("--idle-connections", type=int, default=0, help="silent connections opened alongside the players")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = asyncio.run(run_load_test(
+        args.host, args.port, args.connections, args.max_plies, args.think_time, args.ramp_up, args.duration,
+        args.idle_connections
+    ))
+    print(stats.summary(time.perf_counter() - start))
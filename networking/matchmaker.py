@@ -0,0 +1,171 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import itertools
+import queue
+import socket
+import threading
+import time
+from typing import Callable, Dict, Tuple
+
+from .metrics import Histogram
+import networking.utils as utils
+
+@dataclass
+class MatchRequest:
+    ticket: int
+    conn: socket.socket
+    rating: int | None = None
+    time_control: str | None = None
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+BucketKey = Tuple[str | None, int | None]
+
+class Matchmaker:
+    def __init__(
+        self,
+        on_match: Callable[[MatchRequest, MatchRequest], None],
+        rating_bucket_size: int = 200,
+        reap_interval: float = 1.0,
+        report_interval: float = 60.0
+    ) -> None:
+        self.__on_match = on_match
+        self.__rating_bucket_size = rating_bucket_size
+        self.__reap_interval = reap_interval
+        self.__report_interval = report_interval
+
+        # One FIFO per (time control, rating bucket), plus a ticket index for O(1) cancellation
+        self.__buckets: Dict[BucketKey, OrderedDict[int, MatchRequest]] = {}
+        self.__tickets: Dict[int, BucketKey] = {}
+        self.__next_ticket = itertools.count(1)
+
+        self.__wait_times = Histogram()
+        self.__matches = 0
+        self.__cancelled = 0
+
+        # Separate from the server lock so connection bursts never wait on game traffic
+        self.__lock = threading.Lock()
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__maintenance_loop, daemon=True)
+        self.__thread.start()
+
+        # Pairs are handed to on_match on their own thread, setting up a room locks and writes to sockets,
+        # which the thread calling enqueue must never wait on
+        self.__pairs: queue.Queue[Tuple[MatchRequest, MatchRequest] | None] = queue.Queue()
+        self.__match_thread = threading.Thread(target=self.__match_loop, daemon=True)
+        self.__match_thread.start()
+
+    def __get_bucket_key(self, rating: int | None, time_control: str | None) -> BucketKey:
+        return (time_control, rating // self.__rating_bucket_size if rating is not None else None)
+
+    def enqueue(self, conn: socket.socket, rating: int | None = None, time_control: str | None = None) -> int:
+        request = MatchRequest(next(self.__next_ticket), conn, rating, time_control)
+        key = self.__get_bucket_key(rating, time_control)
+
+        while True:
+            with self.__lock:
+                bucket = self.__buckets.get(key)
+                if not bucket:
+                    self.__buckets.setdefault(key, OrderedDict())[request.ticket] = request
+                    self.__tickets[request.ticket] = key
+                    return request.ticket
+
+                _, opponent = bucket.popitem(last=False)
+                del self.__tickets[opponent.ticket]
+                if not bucket:
+                    del self.__buckets[key]
+
+            # Off the queue, so the probe runs without the lock and nobody else can match or reap this player meanwhile
+            if utils.is_connection_alive(opponent.conn):
+                break
+
+            with self.__lock:
+                self.__cancelled += 1
+            self.__drop(opponent)
+
+        with self.__lock:
+            self.__matches += 1
+
+        now = time.monotonic()
+        self.__wait_times.observe(now - opponent.enqueued_at)
+        self.__wait_times.observe(now - request.enqueued_at)
+
+        # The player who waited longer moves first
+        self.__pairs.put((opponent, request))
+        return request.ticket
+
+    def cancel(self, ticket: int) -> MatchRequest | None:
+        with self.__lock:
+            key = self.__tickets.pop(ticket, None)
+            if key is None:
+                return None
+
+            bucket = self.__buckets[key]
+            request = bucket.pop(ticket)
+            if not bucket:
+                del self.__buckets[key]
+            self.__cancelled += 1
+
+        return request
+
+    def get_queue_depth(self) -> int:
+        with self.__lock:
+            return len(self.__tickets)
+
+    def get_wait_times(self) -> Histogram:
+        return self.__wait_times
+
+    def get_stats(self) -> Dict[str, int]:
+        with self.__lock:
+            return {
+                "queue_depth": len(self.__tickets),
+                "buckets": len(self.__buckets),
+                "matches": self.__matches,
+                "cancelled": self.__cancelled,
+            }
+
+    def stop(self) -> None:
+        self.__running = False
+        self.__pairs.put(None)
+
+    def __drop(self, request: MatchRequest) -> None:
+        try:
+            request.conn.close()
+        except OSError:
+            pass
+        self.__log(f"Dropped queued connection (ticket {request.ticket})")
+
+    def __reap(self) -> None:
+        # Probed outside the lock so enqueue never waits on it, a request matched in the meantime is no longer
+        # in the ticket index and is left alone
+        with self.__lock:
+            queued = [request for bucket in self.__buckets.values() for request in bucket.values()]
+
+        dead = [request for request in queued if not utils.is_connection_alive(request.conn)]
+        for request in dead:
+            if self.cancel(request.ticket) is not None:
+                self.__drop(request)
+
+    def __match_loop(self) -> None:
+        while (pair := self.__pairs.get()) is not None:
+            try:
+                self.__on_match(*pair)
+            except Exception as e:
+                self.__log(f"Failed to start a matched game: {e}")
+
+    def __maintenance_loop(self) -> None:
+        last_report = time.monotonic()
+        while self.__running:
+            time.sleep(self.__reap_interval)
+            self.__reap()
+
+            if time.monotonic() - last_report >= self.__report_interval:
+                last_report = time.monotonic()
+                stats = self.get_stats()
+                self.__log(
+                    f"Queue depth {stats['queue_depth']} in {stats['buckets']} buckets, "
+                    f"{stats['matches']} matches, {stats['cancelled']} cancelled, "
+                    f"wait times {self.__wait_times.summary()}"
+                )
+
+    def __log(self, msg: str) -> None:
+        print(f"[MATCHMAKER] {msg}")
@@ -0,0 +1,68 @@
+import bisect
+import threading
+from typing import List, Sequence, Tuple
+
+class Histogram:
+    DEFAULT_BOUNDS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, bounds: Sequence[float] = DEFAULT_BOUNDS) -> None:
+        self.__bounds = tuple(bounds)
+        self.__counts = [0] * (len(self.__bounds) + 1)
+        self.__total = 0
+        self.__sum = 0.0
+        self.__max = 0.0
+        self.__lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.__bounds, value)
+        with self.__lock:
+            self.__counts[index] += 1
+            self.__total += 1
+            self.__sum += value
+            self.__max = max(self.__max, value)
+
+    def get_count(self) -> int:
+        return self.__total
+
+    def get_mean(self) -> float:
+        return self.__sum / self.__total if self.__total else 0.0
+
+    def get_buckets(self) -> List[Tuple[float, int]]:
+        with self.__lock:
+            return list(zip(self.__bounds + (float("inf"),), self.__counts))
+
+    def percentile(self, p: float) -> float:
+        # Upper bound of the bucket holding the p-th percentile
+        with self.__lock:
+            target = p / 100 * self.__total
+            seen = 0
+            for bound, count in zip(self.__bounds, self.__counts):
+                seen += count
+                if seen >= target and seen > 0:
+                    return bound
+            return self.__max
+
+    def summary(self) -> str:
+        buckets = ", ".join(
+            f"<={bound:g}: {count}" if bound != float("inf") else f">{self.__bounds[-1]:g}: {count}"
+            for bound, count in self.get_buckets() if count
+        )
+        return f"n={self.__total} mean={self.get_mean():.3f} max={self.__max:.3f} [{buckets}]"
+
+def percentile(values: Sequence[float], p: float) -> float:
+    # Nearest rank over the raw samples, for tools that keep every latency rather than a histogram
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    index = min(int(round(p / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+def latency_summary(latencies: Sequence[float], elapsed: float) -> str:
+    # Acknowledged moves per second and their latency spread, as the load generator and replayer both report them
+    return "\n".join((
+        f"Throughput: {len(latencies) / elapsed if elapsed > 0 else 0:.1f} moves/s over {elapsed:.1f}s",
+        "Latency ms: " + ", ".join(
+            f"p{p}={percentile(latencies, p) * 1000:.2f}" for p in (50, 90, 99, 99.9)
+        ) + f", max={max(latencies, default=0) * 1000:.2f}",
+    ))
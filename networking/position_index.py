@@ -0,0 +1,400 @@
+import argparse
+from array import array
+import bisect
+from dataclasses import dataclass
+import heapq
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from engine.transposition import encode_move
+from game import Move, Piece, Position
+from game.pgn import PgnGame, iter_pgn_file
+from game.san import move_to_san, san_to_move
+
+# public position hash, hidden queens counted as pawns, encoded move, games, white wins, draws, black wins, sorted by hash and then by move
+INDEX_RECORD = struct.Struct("<QHIIII")
+
+# After the records, every FENCE_STRIDE-th record's hash and then this footer: record count, fence count
+_FOOTER = struct.Struct("<QQ")
+FENCE_STRIDE = 64
+
+_MANIFEST = "MANIFEST"
+_RUN_PREFIX = "run-"
+_RUN_SUFFIX = ".idx"
+
+# Where a result's game lands among the white win, draw and black win counters, unfinished games count towards none
+_RESULT_SLOTS = {"1-0": 0, "1/2-1/2": 1, "0-1": 2}
+
+# Records read per chunk while merging, so a merge holds a few pages of each run rather than the runs themselves
+_MERGE_CHUNK = 4096
+
+@dataclass(slots=True)
+class IndexEntry:
+    move: int
+    games: int = 0
+    white_wins: int = 0
+    draws: int = 0
+    black_wins: int = 0
+
+    def get_score(self, colour: int) -> float:
+        # Points per game for the side that played the move
+        if not self.games:
+            return 0.0
+        wins = self.white_wins if colour == Piece.WHITE else self.black_wins
+        return (wins + self.draws / 2) / self.games
+
+def _read_manifest(directory: str) -> Tuple[int, List[str]]:
+    try:
+        with open(os.path.join(directory, _MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return 0, []
+    return manifest["next_run"], manifest["runs"]
+
+def _write_manifest(directory: str, next_run: int, runs: List[str]) -> None:
+    # Renamed over the old one, so a reader only ever sees a whole list of runs
+    path = os.path.join(directory, _MANIFEST)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump({"next_run": next_run, "runs": runs}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f"{path}.tmp", path)
+
+def _iter_run(path: str) -> Iterator[Tuple[int, int, int, int, int, int]]:
+    with open(path, "rb") as f:
+        f.seek(-_FOOTER.size, os.SEEK_END)
+        remaining, _ = _FOOTER.unpack(f.read(_FOOTER.size))
+        f.seek(0)
+        while remaining:
+            count = min(remaining, _MERGE_CHUNK)
+            yield from INDEX_RECORD.iter_unpack(f.read(INDEX_RECORD.size * count))
+            remaining -= count
+
+class _Run:
+    __slots__ = ("file", "map", "size", "fences")
+
+    def __init__(self, path: str) -> None:
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size, fence_count = _FOOTER.unpack_from(self.map, len(self.map) - _FOOTER.size)
+        # A few bytes per FENCE_STRIDE records stay in memory and narrow each search to one stride of the mapped run
+        self.fences = array("Q", struct.unpack_from(f"<{fence_count}Q", self.map, self.size * INDEX_RECORD.size))
+
+    def close(self) -> None:
+        self.map.close()
+        self.file.close()
+
+class PositionIndexWriter:
+    def __init__(
+        self,
+        directory: str,
+        max_plies: int | None = 40,
+        buffer_entries: int = 200_000,
+        max_runs: int = 8,
+        merge_factor: int = 4
+    ) -> None:
+        self.__directory = directory
+        self.__max_plies = max_plies
+        self.__buffer_entries = buffer_entries
+        self.__max_runs = max_runs
+        self.__merge_factor = merge_factor
+
+        os.makedirs(directory, exist_ok=True)
+        self.__next_run, self.__runs = _read_manifest(directory)
+        self.__remove_orphans()
+
+        # New games only ever touch this buffer, it becomes a sorted run on disk once it holds buffer_entries moves
+        self.__buffer: Dict[Tuple[int, int], List[int]] = {}
+        self.__games = 0
+
+        self.__lock = threading.Lock()
+        self.__merge_wanted = threading.Event()
+        self.__closed = False
+        self.__merger = threading.Thread(target=self.__merge_loop, daemon=True)
+        self.__merger.start()
+        if len(self.__runs) > self.__max_runs:
+            self.__merge_wanted.set()
+
+    def get_run_count(self) -> int:
+        with self.__lock:
+            return len(self.__runs)
+
+    def get_games(self) -> int:
+        return self.__games
+
+    def add_game(self, start_fen: str, moves: List[Move], result: str) -> None:
+        position = Position.from_fen(start_fen)
+        slot = _RESULT_SLOTS.get(result)
+        for move in moves[:self.__max_plies]:
+            self.__count(position, move, slot)
+            position.make_move(move)
+        self.__finish_game()
+
+    def add_pgn_game(self, game: PgnGame) -> None:
+        position = Position.from_fen(game.get_start_fen())
+        slot = _RESULT_SLOTS.get(game.result)
+        for san in game.moves[:self.__max_plies]:
+            try:
+                move = san_to_move(position, san)
+            except ValueError:
+                break
+            self.__count(position, move, slot)
+            position.make_move(move)
+        self.__finish_game()
+
+    def flush(self) -> None:
+        if not self.__buffer:
+            return
+
+        records = sorted((key, move, *counts) for (key, move), counts in self.__buffer.items())
+        self.__buffer = {}
+
+        with self.__lock:
+            name = self.__take_run_name()
+        self.__write_run(name, records)
+
+        with self.__lock:
+            self.__runs.append(name)
+            _write_manifest(self.__directory, self.__next_run, self.__runs)
+            if len(self.__runs) > self.__max_runs:
+                self.__merge_wanted.set()
+
+    def close(self, timeout: float | None = 30.0) -> None:
+        if self.__closed:
+            return
+
+        # A merge already under way is allowed to finish, one that has not started is left for next time
+        self.flush()
+        self.__closed = True
+        self.__merge_wanted.set()
+        self.__merger.join(timeout=timeout)
+
+    def __count(self, position: Position, move: Move, slot: int | None) -> None:
+        entry = self.__buffer.get(key := (position.get_public_hash(), encode_move(move)))
+        if entry is None:
+            entry = self.__buffer[key] = [0, 0, 0, 0]
+        entry[0] += 1
+        if slot is not None:
+            entry[slot + 1] += 1
+
+    def __finish_game(self) -> None:
+        self.__games += 1
+        if len(self.__buffer) >= self.__buffer_entries:
+            self.flush()
+
+    def __take_run_name(self) -> str:
+        name = f"{_RUN_PREFIX}{self.__next_run:08d}{_RUN_SUFFIX}"
+        self.__next_run += 1
+        return name
+
+    def __write_run(self, name: str, records: Iterable[Tuple[int, int, int, int, int, int]]) -> None:
+        path = os.path.join(self.__directory, name)
+        fences = array("Q")
+        count = 0
+        with open(f"{path}.tmp", "wb") as f:
+            for record in records:
+                if count % FENCE_STRIDE == 0:
+                    fences.append(record[0])
+                f.write(INDEX_RECORD.pack(*record))
+                count += 1
+            f.write(struct.pack(f"<{len(fences)}Q", *fences))
+            f.write(_FOOTER.pack(count, len(fences)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{path}.tmp", path)
+
+    def __merge_loop(self) -> None:
+        while True:
+            self.__merge_wanted.wait()
+            self.__merge_wanted.clear()
+            if self.__closed:
+                return
+
+            try:
+                while self.__merge_once():
+                    pass
+            except Exception as e:
+                self.__log(f"Merge failed: {e}")
+
+    def __merge_once(self) -> bool:
+        with self.__lock:
+            if len(self.__runs) <= self.__max_runs:
+                return False
+
+            # The smallest runs go first, so every record is rewritten a logarithmic number of times rather than on every merge
+            sizes = {name: os.path.getsize(os.path.join(self.__directory, name)) for name in self.__runs}
+            inputs = sorted(self.__runs, key=lambda name: sizes[name])[:self.__merge_factor]
+            name = self.__take_run_name()
+
+        start = time.perf_counter()
+        self.__write_run(name, self.__merge_runs(inputs))
+
+        with self.__lock:
+            self.__runs = [run for run in self.__runs if run not in inputs] + [name]
+            _write_manifest(self.__directory, self.__next_run, self.__runs)
+
+        for run in inputs:
+            self.__remove(run)
+        self.__log(f"Merged {len(inputs)} runs into {name} in {time.perf_counter() - start:.2f}s")
+        return True
+
+    def __merge_runs(self, inputs: List[str]) -> Iterator[Tuple[int, int, int, int, int, int]]:
+        # Streamed through a heap, counts for the same position and move are summed into one record
+        merged = heapq.merge(*(_iter_run(os.path.join(self.__directory, name)) for name in inputs))
+        current = None
+        for record in merged:
+            if current is not None and record[:2] == current[:2]:
+                current = (*record[:2], *(a + b for a, b in zip(current[2:], record[2:])))
+                continue
+            if current is not None:
+                yield current
+            current = record
+        if current is not None:
+            yield current
+
+    def __remove_orphans(self) -> None:
+        # Runs written by a merge or flush that never reached the manifest, or inputs that could not be removed in time
+        live = set(self.__runs)
+        for name in os.listdir(self.__directory):
+            if name.startswith(_RUN_PREFIX) and name not in live:
+                self.__remove(name)
+
+    def __remove(self, name: str) -> None:
+        # A reader may still have the run mapped, which on some platforms blocks removal until it lets go
+        try:
+            os.remove(os.path.join(self.__directory, name))
+        except OSError:
+            pass
+
+    def __log(self, msg: str) -> None:
+        print(f"[INDEX] {msg}")
+
+class PositionIndex:
+    def __init__(self, directory: str, refresh_interval: float = 1.0) -> None:
+        self.__directory = directory
+        self.__manifest_path = os.path.join(directory, _MANIFEST)
+        self.__manifest_version = None
+        self.__refresh_interval = refresh_interval
+        self.__next_refresh = 0.0
+        self.__runs: Dict[str, _Run] = {}
+        self.refresh()
+
+    def __len__(self) -> int:
+        return sum(run.size for run in self.__runs.values())
+
+    def get_run_count(self) -> int:
+        return len(self.__runs)
+
+    def close(self) -> None:
+        for run in self.__runs.values():
+            run.close()
+        self.__runs = {}
+
+    def __enter__(self) -> "PositionIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def refresh(self) -> None:
+        # Picks up runs flushed or merged since, lookups call it at most once every refresh_interval seconds
+        self.__next_refresh = time.monotonic() + self.__refresh_interval
+        try:
+            version = os.stat(self.__manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            version = None
+        if version == self.__manifest_version:
+            return
+
+        _, names = _read_manifest(self.__directory)
+        runs = {}
+        for name in names:
+            if name in self.__runs:
+                runs[name] = self.__runs.pop(name)
+                continue
+            try:
+                runs[name] = _Run(os.path.join(self.__directory, name))
+            except FileNotFoundError:
+                # Merged away between reading the manifest and opening the run, the next refresh picks up its replacement
+                version = None
+
+        self.close()
+        self.__runs = runs
+        self.__manifest_version = version
+
+    def get_entries(self, key: int) -> List[IndexEntry]:
+        if time.monotonic() >= self.__next_refresh:
+            self.refresh()
+
+        # A position lives in every run its games were flushed to, so each one is searched and the counts added up
+        entries: Dict[int, IndexEntry] = {}
+        for run in self.__runs.values():
+            run_map = run.map
+            size = run.size
+            # Only the stride before the first fence at or past the key can hold its first record
+            fence = bisect.bisect_left(run.fences, key)
+            lo, hi = max(0, (fence - 1) * FENCE_STRIDE), min(size, fence * FENCE_STRIDE)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if struct.unpack_from("<Q", run_map, mid * INDEX_RECORD.size)[0] < key:
+                    lo = mid + 1
+                else:
+                    hi = mid
+
+            while lo < size:
+                record_key, move, games, white_wins, draws, black_wins = INDEX_RECORD.unpack_from(run_map, lo * INDEX_RECORD.size)
+                if record_key != key:
+                    break
+                if (entry := entries.get(move)) is None:
+                    entry = entries[move] = IndexEntry(move)
+                entry.games += games
+                entry.white_wins += white_wins
+                entry.draws += draws
+                entry.black_wins += black_wins
+                lo += 1
+
+        return sorted(entries.values(), key=lambda entry: -entry.games)
+
+    def get_moves(self, position: Position) -> List[Tuple[Move, IndexEntry]]:
+        entries = self.get_entries(position.get_public_hash())
+        if not entries:
+            return []
+
+        # A hash collision must never produce an illegal move
+        legal_moves = {encode_move(move): move for move in position.get_legal_moves()}
+        return [(legal_moves[entry.move], entry) for entry in entries if entry.move in legal_moves]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Position index over archived games, and an opening explorer to query it")
+    parser.add_argument("index", help="index directory")
+    parser.add_argument("--add", default=None, help="PGN archive whose games are added to the index")
+    parser.add_argument("--max-plies", type=int, default=40, help="plies of each game to index")
+    parser.add_argument("--fen", default=None, help="position to show move statistics for, the starting position by default")
+    args = parser.parse_args()
+
+    if args.add:
+        start = time.perf_counter()
+        writer = PositionIndexWriter(args.index, args.max_plies)
+        for game in iter_pgn_file(args.add):
+            writer.add_pgn_game(game)
+        writer.close()
+        print(f"[INDEX] Added {writer.get_games()} games in {time.perf_counter() - start:.2f}s, {writer.get_run_count()} runs")
+
+    position = Position.from_fen(args.fen) if args.fen else Position()
+    with PositionIndex(args.index) as index:
+        start = time.perf_counter()
+        moves = index.get_moves(position)
+        elapsed = time.perf_counter() - start
+
+        print(f"{len(index)} records in {index.get_run_count()} runs, looked up in {elapsed * 1000:.3f} ms")
+        colour = position.get_colour_to_move()
+        for move, entry in moves:
+            print(
+                f"  {move_to_san(position, move):8} {entry.games:8} games  "
+                f"+{entry.white_wins} ={entry.draws} -{entry.black_wins}  {entry.get_score(colour):.0%} for the mover"
+            )
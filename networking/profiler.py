@@ -0,0 +1,195 @@
+from collections import Counter
+import json
+import os
+import sys
+import threading
+import time
+from types import CodeType, FrameType
+from typing import Dict, List, Tuple
+
+from .metrics import Histogram
+
+from game import Move, Position
+
+# In milliseconds, moves are timed well below the default seconds buckets
+_PHASE_BOUNDS = (0.1, 0.5, 1.0, 5.0, 10.0, 50.0, 100.0, 500.0, 1000.0)
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.01, cpu_only: bool = True) -> None:
+        self.__interval = interval
+        # Handler threads spend nearly all their time blocked in recv, counting them would bury the hot paths
+        self.__cpu_only = cpu_only and hasattr(time, "pthread_getcpuclockid")
+        self.__stacks: Counter = Counter()
+        self.__labels: Dict[CodeType, str] = {}
+        self.__cpu_times: Dict[int, float] = {}
+        self.__samples = 0
+
+        self.__lock = threading.Lock()
+        self.__stopped = threading.Event()
+        self.__thread: threading.Thread | None = None
+
+    def is_running(self) -> bool:
+        return self.__thread is not None
+
+    def get_samples(self) -> int:
+        return self.__samples
+
+    def start(self) -> None:
+        if self.__thread is not None:
+            return
+        self.__stopped.clear()
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+    def stop(self) -> None:
+        if self.__thread is None:
+            return
+        self.__stopped.set()
+        self.__thread.join()
+        self.__thread = None
+
+    def reset(self) -> None:
+        with self.__lock:
+            self.__stacks.clear()
+            self.__cpu_times.clear()
+            self.__samples = 0
+
+    def write_collapsed(self, path: str) -> int:
+        # One "outer;inner micros" line per distinct stack, what flamegraph.pl and speedscope read
+        with self.__lock:
+            stacks = sorted(self.__stacks.items())
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            for stack, count in stacks:
+                f.write(f"{stack} {count}\n")
+        return len(stacks)
+
+    def __run(self) -> None:
+        own = threading.get_ident()
+        while not self.__stopped.wait(self.__interval):
+            self.__sample(own)
+
+    def __sample(self, own: int) -> None:
+        frames = sys._current_frames()
+        with self.__lock:
+            self.__samples += 1
+            cpu_times = {}
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                weight = self.__get_cpu_used(ident, cpu_times) if self.__cpu_only else self.__interval
+                # Microseconds rather than sample counts, so a thread that only woke to read one line barely registers
+                if (micros := round(weight * 1_000_000)) > 0:
+                    self.__stacks[self.__collapse(frame)] += micros
+            if self.__cpu_only:
+                # Rebuilt every sample, so threads that have finished drop out
+                self.__cpu_times = cpu_times
+
+    def __get_cpu_used(self, ident: int, cpu_times: Dict[int, float]) -> float:
+        # CPU seconds the thread has used since the last sample, none at all while it waits on a socket or lock
+        try:
+            cpu_time = time.clock_gettime(time.pthread_getcpuclockid(ident))
+        except OSError:
+            return 0.0
+        cpu_times[ident] = cpu_time
+        previous = self.__cpu_times.get(ident)
+        return 0.0 if previous is None else cpu_time - previous
+
+    def __collapse(self, frame: FrameType) -> str:
+        labels = []
+        while frame is not None:
+            code = frame.f_code
+            if (label := self.__labels.get(code)) is None:
+                label = f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}".replace(";", ":").replace(" ", "_")
+                self.__labels[code] = label
+            labels.append(label)
+            frame = frame.f_back
+        labels.reverse()
+        return ";".join(labels)
+
+class MoveTimer:
+    __slots__ = ("__position", "__last", "__phases")
+
+    def __init__(self, position: bytes) -> None:
+        # The position before the move, kept as bytes and only turned into a FEN if the move proves slow
+        self.__position = position
+        self.__last = time.perf_counter()
+        self.__phases: List[Tuple[str, float]] = []
+
+    def get_position(self) -> bytes:
+        return self.__position
+
+    def mark(self, phase: str) -> None:
+        # Charges the time since the previous mark to this phase
+        now = time.perf_counter()
+        self.__phases.append((phase, now - self.__last))
+        self.__last = now
+
+    def get_phases(self) -> List[Tuple[str, float]]:
+        return self.__phases
+
+    def get_total(self) -> float:
+        return sum(seconds for _, seconds in self.__phases)
+
+class MoveTimings:
+    def __init__(self, slow_path: str | None = None, slow_threshold: float = 0.05) -> None:
+        self.__slow_path = slow_path
+        self.__slow_threshold = slow_threshold
+        self.__slow_moves = 0
+
+        self.__phases: Dict[str, Histogram] = {}
+        self.__rooms: Dict[int, Dict[str, float]] = {}
+        self.__lock = threading.Lock()
+
+        if slow_path:
+            directory = os.path.dirname(slow_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+    def get_slow_moves(self) -> int:
+        return self.__slow_moves
+
+    def observe(self, room_id: int, move: Move, timer: MoveTimer) -> None:
+        total = timer.get_total()
+        with self.__lock:
+            room = self.__rooms.setdefault(room_id, {"moves": 0})
+            room["moves"] += 1
+            for phase, seconds in timer.get_phases():
+                if (histogram := self.__phases.get(phase)) is None:
+                    histogram = self.__phases[phase] = Histogram(_PHASE_BOUNDS)
+                histogram.observe(seconds * 1000)
+                room[phase] = room.get(phase, 0.0) + seconds
+
+            if total < self.__slow_threshold:
+                return
+            self.__slow_moves += 1
+
+        record = {
+            "time": round(time.time(), 3),
+            "room": room_id,
+            "fen": Position.from_bytes(timer.get_position()).get_fen(),
+            "move": move.to_dict(),
+            "ms": {phase: round(seconds * 1000, 3) for phase, seconds in timer.get_phases()},
+        }
+        print(f"[TIMING] Slow move in room {room_id}: {total * 1000:.1f} ms at {record['fen']}")
+        if self.__slow_path:
+            with self.__lock, open(self.__slow_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+    def finish_room(self, room_id: int) -> str | None:
+        with self.__lock:
+            room = self.__rooms.pop(room_id, None)
+        if room is None:
+            return None
+
+        moves = room.pop("moves")
+        phases = ", ".join(f"{phase} {seconds * 1000 / moves:.2f}" for phase, seconds in room.items())
+        return f"{moves} moves, mean ms per move: {phases}"
+
+    def summary(self) -> List[str]:
+        with self.__lock:
+            phases = list(self.__phases.items())
+        return [f"{phase} ms: {histogram.summary()}" for phase, histogram in phases]
@@ -0,0 +1,279 @@
+import argparse
+import asyncio
+from dataclasses import dataclass, field
+import json
+import time
+from typing import Callable, Dict, List, Tuple
+
+from .metrics import latency_summary
+from .traffic import CLOSE, CONNECT, FRAME, TrafficRecord, read_traffic
+
+# How long a frame may wait for its turn before the connection is given up as out of step with the recording
+GATE_TIMEOUT = 10.0
+
+@dataclass
+class ReplayStats:
+    latencies: List[float] = field(default_factory=list)
+    connections: int = 0
+    frames_sent: int = 0
+    moves_sent: int = 0
+    errors: int = 0
+    rejected: int = 0
+    connect_failures: int = 0
+    stalled: int = 0
+    skipped: int = 0
+
+    def summary(self, elapsed: float) -> str:
+        acked = len(self.latencies)
+        return "\n".join((
+            f"Connections: {self.connections}, rejected as busy: {self.rejected}, connect failures: {self.connect_failures}, "
+            f"stalled: {self.stalled}",
+            f"Frames sent: {self.frames_sent}, skipped: {self.skipped}, moves sent: {self.moves_sent}, "
+            f"acknowledged: {acked}, errors: {self.errors}",
+            latency_summary(self.latencies, elapsed),
+        ))
+
+class ReplayConnection:
+    def __init__(
+        self,
+        stats: ReplayStats,
+        host: str,
+        port: int,
+        records: List[TrafficRecord],
+        speed: float,
+        start: float,
+        previous: asyncio.Event | None,
+        connected: asyncio.Event,
+        on_sent: Callable[[], None],
+        all_sent: asyncio.Event
+    ) -> None:
+        self.__stats = stats
+        self.__host = host
+        self.__port = port
+        self.__records = records
+        self.__speed = speed
+        self.__start = start
+        self.__previous = previous
+        self.__connected = connected
+        self.__on_sent = on_sent
+        self.__all_sent = all_sent
+        self.__sent = False
+
+        self.__colour: int | None = None
+        self.__plies = 0
+        self.__choosing = False
+        self.__begun = False
+        self.__closed = False
+        self.__sent_at: float | None = None
+        self.__changed = asyncio.Event()
+
+    async def run(self) -> None:
+        # Connections open in the order they were accepted, so the matchmaker pairs and colours players as it did then
+        try:
+            await self.__wait_until(self.__records[0].offset)
+            if self.__previous is not None:
+                await self.__previous.wait()
+            reader, writer = await asyncio.open_connection(self.__host, self.__port)
+        except OSError:
+            self.__stats.connect_failures += 1
+            self.__done_sending()
+            return
+        finally:
+            self.__connected.set()
+
+        self.__stats.connections += 1
+        listener = asyncio.create_task(self.__listen(reader, writer))
+        try:
+            await self.__send_frames(writer)
+            self.__done_sending()
+            await self.__hang_up()
+        except OSError:
+            pass
+        finally:
+            self.__done_sending()
+            listener.cancel()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def __send_frames(self, writer: asyncio.StreamWriter) -> None:
+        frames = [record for record in self.__records if record.kind == FRAME]
+        for i, record in enumerate(frames):
+            await self.__wait_until(record.offset)
+            kind, ready = self.__classify(record)
+            if kind == "pong":
+                continue
+
+            if not await self.__wait_for(ready):
+                if not self.__closed:
+                    self.__stats.stalled += 1
+                self.__stats.skipped += len(frames) - i
+                return
+
+            if kind == "move":
+                self.__sent_at = time.perf_counter()
+                self.__stats.moves_sent += 1
+            self.__stats.frames_sent += 1
+            writer.write(record.payload + b"\n")
+            await writer.drain()
+
+    async def __hang_up(self) -> None:
+        # Once the game is as far along as when the recorded player left, so the opponent's last move still lands
+        if (last := self.__records[-1]).kind == CLOSE:
+            await self.__wait_for(lambda: self.__sent_at is None and self.__plies >= last.ply)
+            await self.__wait_until(last.offset)
+            return
+
+        # Still open when the capture stopped, so it stays open until every other connection has sent its frames
+        await self.__wait_for(lambda: self.__sent_at is None)
+        await self.__all_sent.wait()
+
+    def __done_sending(self) -> None:
+        if not self.__sent:
+            self.__sent = True
+            self.__on_sent()
+
+    def __classify(self, record: TrafficRecord) -> Tuple[str, Callable[[], bool]]:
+        # Every frame waits for the plies its room had reached when it was recorded, which keeps both players in step
+        reached = lambda: self.__plies >= record.ply
+        try:
+            msg_dict = json.loads(record.payload)
+        except ValueError:
+            return "other", reached
+        if not isinstance(msg_dict, dict):
+            return "other", reached
+
+        # Recorded pongs answered the recording server's pings, this server's are answered as they come
+        if "pong" in msg_dict:
+            return "pong", reached
+        if "move" in msg_dict:
+            return "move", lambda: self.__begun and self.__sent_at is None and reached()
+        if "hidden_queen" in msg_dict:
+            return "hidden_queen", lambda: self.__choosing and reached()
+        return "other", reached
+
+    async def __wait_until(self, offset: float) -> None:
+        # At speed 0 nothing waits on the recorded times, only on the server's replies
+        if self.__speed > 0 and (delay := self.__start + offset / self.__speed - time.perf_counter()) > 0:
+            await asyncio.sleep(delay)
+
+    async def __wait_for(self, ready: Callable[[], bool]) -> bool:
+        deadline = time.perf_counter() + GATE_TIMEOUT
+        while not ready():
+            if self.__closed:
+                return False
+            self.__changed.clear()
+            try:
+                await asyncio.wait_for(self.__changed.wait(), deadline - time.perf_counter())
+            except asyncio.TimeoutError:
+                return ready()
+        return True
+
+    async def __listen(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                await self.__handle_message(line.decode().strip(), writer)
+                self.__changed.set()
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.__closed = True
+            self.__changed.set()
+
+    async def __handle_message(self, msg: str, writer: asyncio.StreamWriter) -> None:
+        if not msg:
+            return
+
+        try:
+            msg_dict = json.loads(msg)
+        except json.JSONDecodeError:
+            self.__stats.errors += 1
+            return
+
+        if (seq := msg_dict.get("ping")) is not None:
+            writer.write((json.dumps({"pong": seq}) + "\n").encode())
+            await writer.drain()
+            return
+
+        if "colour" in msg_dict:
+            self.__colour = msg_dict["colour"]
+
+        if msg_dict.get("error") == "Server busy":
+            self.__stats.rejected += 1
+            self.__closed = True
+            return
+
+        if msg_dict.get("error"):
+            # A rejected move still answers it, the turn stays where it was
+            self.__stats.errors += 1
+            self.__sent_at = None
+            return
+
+        if msg_dict.get("disconnect") or msg_dict.get("timeout") is not None:
+            self.__closed = True
+            return
+
+        if msg_dict.get("choose_hidden_queen"):
+            self.__choosing = True
+
+        if msg_dict.get("begin"):
+            self.__begun = True
+
+        # A move in standard games and a delta that passes the turn in hidden queen ones, either way one ply
+        if msg_dict.get("move") or (msg_dict.get("delta") or {}).get("turn") is not None:
+            self.__plies += 1
+            self.__acknowledge()
+
+    def __acknowledge(self) -> None:
+        if self.__sent_at is not None:
+            self.__stats.latencies.append(time.perf_counter() - self.__sent_at)
+            self.__sent_at = None
+
+async def replay_traffic(host: str, port: int, records: List[TrafficRecord], speed: float = 1.0) -> ReplayStats:
+    stats = ReplayStats()
+
+    by_connection: Dict[int, List[TrafficRecord]] = {}
+    for record in records:
+        by_connection.setdefault(record.connection, []).append(record)
+
+    # Only connections whose opening was captured, anything else began before the capture did
+    replayed = [connection_records for connection_records in by_connection.values() if connection_records[0].kind == CONNECT]
+    remaining = len(replayed)
+    all_sent = asyncio.Event()
+
+    def on_sent() -> None:
+        nonlocal remaining
+        remaining -= 1
+        if remaining == 0:
+            all_sent.set()
+
+    start = time.perf_counter()
+    previous = None
+    tasks = []
+    for connection_records in replayed:
+        connected = asyncio.Event()
+        replayer = ReplayConnection(stats, host, port, connection_records, speed, start, previous, connected, on_sent, all_sent)
+        tasks.append(asyncio.create_task(replayer.run()))
+        previous = connected
+
+    await asyncio.gather(*tasks)
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replays captured traffic against a freshly started server")
+    parser.add_argument("capture", help="file written by the server's --capture option")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5555)
+    parser.add_argument("--speed", type=float, default=1.0, help="multiple of the recorded pace, 0 to send as fast as the server answers")
+    args = parser.parse_args()
+
+    started_at, records = read_traffic(args.capture)
+    connections = len({record.connection for record in records})
+    duration = records[-1].offset if records else 0.0
+    print(f"Replaying {len(records)} records from {connections} connections, {duration:.1f}s captured at {time.ctime(started_at)}")
+
+    start = time.perf_counter()
+    stats = asyncio.run(replay_traffic(args.host, args.port, records, args.speed))
+    print(stats.summary(time.perf_counter() - start))
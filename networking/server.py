@@ -1,88 +1,532 @@
+import argparse
+from datetime import date
+import itertools
 import json
+import os
+import queue
+import random
+import secrets
+import select
+import signal
 import socket
 import threading
-from typing import Dict
+import time
+from typing import Dict, List, Tuple
 
+from .clock import ChessClock
+from .game_archive import ArchivedGame, GameArchiveWriter
 from .game_room import GameRoom
+from .matchmaker import Matchmaker, MatchRequest
+from .profiler import MoveTimer, MoveTimings, SamplingProfiler
+from .snapshot import RoomSnapshot, SnapshotWriter, read_snapshot, replay_snapshot
+from .timer_wheel import TimerWheel
+from .traffic import TrafficCapture
 import networking.utils as utils
 
-from game import Move, Piece
+from engine import Searcher, SearchLimits, TranspositionTable
+from engine.book import OpeningBook
+from engine.tablebase import Tablebase
+from game import GameResult, Move, Piece, Position
+from game.hidden_queen import HiddenQueenGame, ViewDelta
+from game.pgn import result_to_pgn
 
 class Server:
-    def __init__(self, host: str = "127.0.0.1", port: str = 5555) -> None:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: str = 5555,
+        archive_path: str | None = "games.pgn",
+        hidden_queen: bool = True,
+        bot_limits: SearchLimits | None = None,
+        bot_hash_mb: float = 4,
+        bot_book: str | None = None,
+        bot_tablebase: str | None = None,
+        time_control: Tuple[float, float] | None = None,
+        max_connections: int = 1000,
+        max_rooms: int = 500,
+        heartbeat_interval: float = 10.0,
+        read_timeout: float | None = 30.0,
+        send_timeout: float | None = 10.0,
+        hello_timeout: float = 0.0,
+        snapshot_path: str | None = None,
+        snapshot_interval: float = 5.0,
+        resume_grace: float = 60.0,
+        profile_dir: str | None = None,
+        profile_interval: float = 0.01,
+        time_moves: bool = False,
+        slow_move_path: str | None = None,
+        slow_move_ms: float = 50.0,
+        capture_path: str | None = None,
+        index_dir: str | None = None
+    ) -> None:
         self.__host = host
         self.__port = port
+        self.__hidden_queen = hidden_queen
+        
+        # With bot limits set, every player gets a room against the engine instead of queueing
+        self.__bot_limits = bot_limits
+        self.__bot_hash_mb = bot_hash_mb
+        self.__bot_book = OpeningBook(bot_book) if bot_book else None
+        self.__bot_tablebase = Tablebase(bot_tablebase) if bot_tablebase else None
+
+        # Base seconds and increment per move, every room's flag is a timer on the one shared wheel
+        self.__time_control = time_control
+        self.__timers = TimerWheel() if time_control is not None else None
+        
+        # Checked before anything is allocated for a connection, so a storm of new ones cannot slow games in progress
+        self.__max_connections = max_connections
+        self.__max_rooms = max_rooms
+        self.__room_connections = 0
+        self.__rejected = 0
+        
+        # A peer that sends nothing, not even a pong, for read_timeout seconds is treated as gone
+        self.__heartbeat_interval = heartbeat_interval
+        self.__read_timeout = read_timeout
+        self.__heartbeat_seq = itertools.count(1)
+        self.__reaped = 0
+        
+        # Only sends time out on the socket itself, a player too slow to read a frame for this long is disconnected
+        self.__send_timeout = send_timeout
+        
+        # Players may name a rating and time control before being queued, only waited for when asked so nobody else is held up
+        self.__hello_timeout = hello_timeout
         
         self.__socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # A restarted server must be able to bind again straight away, while its old connections are still closing
+        self.__socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.__socket.bind((self.__host, self.__port))
         self.__socket.listen()
         
         self.__rooms: Dict[int, GameRoom] = {}
-        self.__waiting_room: GameRoom | None = None
-        self.__next_room_id = 1
+        self.__next_room_id = itertools.count(1)
         
         self.__lock = threading.Lock()
         
+        # Rooms are set up off the accept thread, matched pairs on the matchmaker's thread and bot games on a thread of their own
+        self.__matchmaker = Matchmaker(self.__start_game)
+        self.__bot_setups: queue.Queue[socket.socket | None] = queue.Queue()
+        if self.__bot_limits is not None:
+            threading.Thread(target=self.__bot_setup_loop, daemon=True).start()
+        
+        self.__archive = GameArchiveWriter(archive_path, index_dir=index_dir) if archive_path else None
+        
+        # Live rooms are written out every few seconds, after a restart their players have resume_grace seconds to reclaim them
+        self.__sessions: Dict[str, Tuple[int, int]] = {}
+        self.__restored_rooms: Dict[int, RoomSnapshot] = {}
+        self.__snapshots = None
+        if snapshot_path:
+            self.__load_snapshot(snapshot_path)
+            expiry = threading.Timer(resume_grace, self.__expire_sessions)
+            expiry.daemon = True
+            expiry.start()
+            self.__snapshots = SnapshotWriter(snapshot_path, self.__collect_snapshots, snapshot_interval)
+        
+        # Both off unless asked for, the profiler samples every thread's stack and the timings split each move into phases
+        self.__profile_dir = profile_dir
+        self.__profiler = SamplingProfiler(profile_interval) if profile_dir else None
+        self.__timings = MoveTimings(slow_move_path, slow_move_ms / 1000) if time_moves else None
+        
+        # Every inbound line is recorded with its connection and time, so the same workload can be replayed against any build
+        self.__capture = TrafficCapture(capture_path) if capture_path else None
+        
         self.__log(f"Initialised on {self.__host}:{self.__port}")
         
     def start(self) -> None:
         self.__log("Listening for connections...")
-        while True:
-            conn, addr = self.__socket.accept()
-            self.__log(f"New Connection from {addr}")
-            threading.Thread(target=self.__assign_to_room, args=(conn,), daemon=True).start()
+        try:
+            while True:
+                conn, addr = self.__socket.accept()
+                conn.settimeout(self.__send_timeout)
+                if self.__capture is not None:
+                    self.__capture.connect(conn)
+                if self.__is_busy():
+                    self.__reject(conn, addr)
+                    continue
+                
+                self.__log(f"New Connection from {addr}")
+                # Only while restored seats are waiting or hellos are expected, otherwise new players are never held up
+                if self.__sessions or self.__hello_timeout > 0:
+                    threading.Thread(target=self.__admit, args=(conn,), daemon=True).start()
+                else:
+                    self.__assign_to_room(conn)
+        finally:
+            self.__matchmaker.stop()
+            self.__bot_setups.put(None)
+            if self.__profiler is not None and self.__profiler.is_running():
+                self.toggle_profiler()
+            if self.__timings is not None:
+                for line in self.__timings.summary():
+                    self.__log(f"Move timings, {line}")
+            if self.__snapshots is not None:
+                self.__snapshots.close()
+            if self.__timers is not None:
+                self.__timers.stop()
+            if self.__bot_book is not None:
+                self.__bot_book.close()
+            if self.__bot_tablebase is not None:
+                self.__bot_tablebase.close()
+            if self.__archive is not None:
+                self.__archive.close()
+            if self.__capture is not None:
+                self.__log(f"Captured {self.__capture.get_records()} records of traffic")
+                self.__capture.close()
             
-    def __assign_to_room(self, conn: socket.socket) -> None:
+    def toggle_profiler(self) -> bool:
+        # Started and stopped while the server runs, each run is written out as collapsed stacks for a flamegraph
+        if self.__profiler is None:
+            self.__log("Profiling is off, start the server with a profile directory")
+            return False
+        
+        if not self.__profiler.is_running():
+            self.__profiler.reset()
+            self.__profiler.start()
+            self.__log("Profiler started")
+            return True
+        
+        self.__profiler.stop()
+        path = os.path.join(self.__profile_dir, f"server-{time.strftime('%Y%m%d-%H%M%S')}.folded")
+        try:
+            stacks = self.__profiler.write_collapsed(path)
+            self.__log(f"Profiler stopped, {self.__profiler.get_samples()} samples and {stacks} stacks written to {path}")
+        except OSError as e:
+            self.__log(f"Failed to write profile: {e}")
+        return False
+    
+    def __is_busy(self) -> bool:
+        # Read without the game lock, which moves hold while they broadcast, a count one connection out of date does no harm.
+        # Queued players need a room too once they are paired
+        connections = self.__room_connections + self.__matchmaker.get_queue_depth()
+        return connections >= self.__max_connections or len(self.__rooms) >= self.__max_rooms
+    
+    def __reject(self, conn: socket.socket, addr: Tuple[str, int] | None = None) -> None:
+        self.__rejected += 1
+        if addr is not None:
+            self.__log(f"Server busy, rejected {addr} ({self.__rejected} rejected so far)")
+        
+        # A single non-blocking send, the reply fits an empty send buffer and nothing waits on a client that is slow to read it
+        try:
+            conn.setblocking(False)
+            conn.send((json.dumps({"error": "Server busy"}) + "\n").encode())
+        except OSError:
+            pass
+        finally:
+            conn.close()
+            if self.__capture is not None:
+                self.__capture.disconnect(conn)
+    
+    def __load_snapshot(self, path: str) -> None:
+        if not os.path.exists(path):
+            return
+        
+        try:
+            taken_at, snapshots = read_snapshot(path)
+        except Exception as e:
+            self.__log(f"Ignoring unreadable snapshot {path}: {e}")
+            return
+        
+        # Rooms are only rebuilt when a player comes back for them, so loading stays quick however many there are
+        for snapshot in snapshots:
+            self.__restored_rooms[snapshot.room_id] = snapshot
+            for colour, session in snapshot.sessions.items():
+                self.__sessions[session] = (snapshot.room_id, colour)
+        
+        if snapshots:
+            self.__next_room_id = itertools.count(max(self.__restored_rooms) + 1)
+        self.__log(f"Restored {len(snapshots)} rooms from a snapshot taken {time.time() - taken_at:.1f}s ago")
+    
+    def __collect_snapshots(self) -> List[RoomSnapshot]:
+        # Only copies references under the lock, encoding and disk I/O happen on the writer thread
         with self.__lock:
-            if self.__waiting_room is None:
-                # New room
-                room = GameRoom(room_id=self.__next_room_id)
-                self.__next_room_id += 1
-                room.players.append(conn)
-                self.__waiting_room = room
-                colour = Piece.WHITE
-            else:
-                # Join waiting room
-                room = self.__waiting_room
-                room.players.append(conn)
-                self.__rooms[room.room_id] = room
-                self.__waiting_room = None
-                colour = Piece.BLACK
-
-        # Notify the player of their colour
+            now = time.monotonic()
+            snapshots = list(self.__restored_rooms.values())
+            for room in self.__rooms.values():
+                board = room.board
+                if board.is_game_over():
+                    continue
+                
+                snapshots.append(RoomSnapshot(
+                    room.room_id,
+                    board.get_initial_fen(),
+                    board.to_bytes(),
+                    board.get_packed_moves(),
+                    dict(room.sessions),
+                    {
+                        colour: room.hidden_queen.get_hidden_queen(colour) for colour in (Piece.WHITE, Piece.BLACK)
+                    } if room.hidden_queen is not None else None,
+                    room.bot_colour,
+                    (
+                        room.clock.get_remaining(Piece.WHITE, now), room.clock.get_remaining(Piece.BLACK, now)
+                    ) if room.clock is not None else None
+                ))
+        
+        return snapshots
+    
+    def __admit(self, conn: socket.socket) -> None:
+        # Returning players name their session first, new ones may say hello, and anyone who stays quiet is queued as is
+        buffer = b""
         try:
-            conn.sendall(f'{{"colour": {colour}}}\n'.encode())
-        except:
-            self.__log("Failed to notify player of their colour, closing connection")
-            self.__handle_disconnect(room, conn, colour)
+            conn.settimeout(max(self.__hello_timeout, 1.0) if self.__sessions else self.__hello_timeout)
+            while b"\n" not in buffer and len(buffer) < 4096:
+                if not (data := conn.recv(4096)):
+                    conn.close()
+                    if self.__capture is not None:
+                        self.__capture.disconnect(conn)
+                    return
+                buffer += data
+        except TimeoutError:
+            pass
+        except OSError:
+            conn.close()
+            if self.__capture is not None:
+                self.__capture.disconnect(conn)
             return
         
-        # Notify both players that the game has started
-        if len(room.players) == 2:
-            for player in room.players:
+        conn.settimeout(self.__send_timeout)
+        if buffer and self.__capture is not None:
+            self.__capture.frame(conn, buffer.partition(b"\n")[0].decode(errors="replace").strip())
+        try:
+            first = json.loads(buffer.partition(b"\n")[0]) if buffer else {}
+            session, hello = first.get("resume"), first.get("hello")
+        except (ValueError, AttributeError):
+            session, hello = None, None
+        
+        if session is None:
+            hello = hello if isinstance(hello, dict) else {}
+            rating = hello.get("rating") if type(hello.get("rating")) is int else None
+            time_control = hello.get("time_control") if isinstance(hello.get("time_control"), str) else None
+            self.__assign_to_room(conn, rating, time_control)
+        else:
+            self.__resume(conn, session)
+    
+    def __resume(self, conn: socket.socket, session: str) -> None:
+        with self.__lock:
+            room, colour = self.__take_seat(session)
+            if room is None:
                 try:
-                    player.sendall(b'{"begin": true}\n')
-                except:
-                    self.__log("Failed to notify game start")
+                    utils.send_error(conn, "Unknown session")
+                except OSError:
+                    pass
+                conn.close()
+                if self.__capture is not None:
+                    self.__capture.disconnect(conn)
+                return
             
+            room.players.append(conn)
+            room.colours[conn] = colour
+            self.__room_connections += 1
+            
+            # The whole view is sent as one delta, the client may have missed moves made after the last snapshot
+            view = room.hidden_queen.get_view(colour) if room.hidden_queen is not None else [room.board.get_square(i) for i in range(64)]
+            board = room.board
+            delta = ViewDelta(
+                list(enumerate(view)), board.get_colour_to_move(), board.get_castling_rights(),
+                board.get_enpassant_square(), board.get_game_result()
+            )
+            try:
+                utils.send_json(conn, json.dumps({"colour": colour, "session": session, "resumed": True}))
+                utils.send_delta(conn, delta)
+                if room.hidden_queen is not None and room.hidden_queen.get_hidden_queen(colour) is None:
+                    utils.send_bytes(conn, b'{"choose_hidden_queen": true}\n')
+            except OSError:
+                self.__log("Failed to send resumed game")
+            
+            if self.__is_seated(room):
+                self.__resume_room(room)
+        
+        self.__log(f"{Piece.colour_str(colour)} player resumed room {room.room_id}")
         threading.Thread(target=self.__handle_client, args=(room, conn, colour), daemon=True).start()
+    
+    def __take_seat(self, session: str) -> Tuple[GameRoom | None, int]:
+        if (seat := self.__sessions.pop(session, None)) is None:
+            return None, Piece.NONE
+        
+        room_id, colour = seat
+        if (snapshot := self.__restored_rooms.pop(room_id, None)) is not None:
+            if (room := self.__restore_room(snapshot)) is None:
+                return None, Piece.NONE
+            self.__rooms[room_id] = room
+        
+        return self.__rooms.get(room_id), colour
+    
+    def __restore_room(self, snapshot: RoomSnapshot) -> GameRoom | None:
+        room = GameRoom(room_id=snapshot.room_id, bot_colour=snapshot.bot_colour)
+        room.sessions = dict(snapshot.sessions)
+        try:
+            room.hidden_queen = replay_snapshot(snapshot, room.board)
+        except Exception as e:
+            self.__log(f"Failed to restore room {snapshot.room_id}: {e}")
+            return None
+        
+        if room.bot_colour is not None:
+            room.bot_table = TranspositionTable(self.__bot_hash_mb)
+        
+        # Time spent while the server was down is not charged to anyone
+        if snapshot.clock is not None and self.__time_control is not None:
+            room.clock = ChessClock(*self.__time_control)
+            room.clock.set_remaining(Piece.WHITE, snapshot.clock[0])
+            room.clock.set_remaining(Piece.BLACK, snapshot.clock[1])
+        
+        return room
+    
+    def __resume_room(self, room: GameRoom) -> None:
+        # Hidden queen rooms still choosing pawns begin once the choices are made, as usual
+        if room.hidden_queen is not None and not room.hidden_queen.is_ready():
+            return
+        
+        for player in room.players:
+            try:
+                utils.send_bytes(player, b'{"begin": true}\n')
+            except OSError:
+                self.__log("Failed to notify game start")
+        self.__start_clock(room)
+        self.__schedule_bot_move(room)
+    
+    def __is_seated(self, room: GameRoom) -> bool:
+        # Restored rooms wait for every player with a session to come back before play carries on
+        return len(room.players) >= len(room.sessions)
+    
+    def __expire_sessions(self) -> None:
+        with self.__lock:
+            # Whoever has not come back by now has abandoned their game
+            for snapshot in self.__restored_rooms.values():
+                self.__archive_snapshot(snapshot)
+            
+            abandoned = dict(self.__sessions.values())
+            expired = len(self.__sessions)
+            self.__restored_rooms.clear()
+            self.__sessions.clear()
+            
+            for room_id, colour in abandoned.items():
+                if (room := self.__rooms.pop(room_id, None)) is None:
+                    continue
+                
+                self.__stop_clock(room)
+                self.__archive_game(room, loser=colour)
+                for player in room.players:
+                    try:
+                        utils.send_bytes(player, b'{"disconnect": true}\n')
+                    except OSError:
+                        pass
+        
+        if expired:
+            self.__log(f"{expired} players did not resume their games")
+    
+    def __assign_to_room(self, conn: socket.socket, rating: int | None = None, time_control: str | None = None) -> None:
+        # Only queues the player, rooms are opened on another thread so a burst of connections never waits on active games
+        if self.__bot_limits is not None:
+            self.__bot_setups.put(conn)
+            return
+        
+        # Players with the same time control and a close rating are paired, the clock itself is still the server's
+        self.__matchmaker.enqueue(conn, rating, time_control)
+    
+    def __bot_setup_loop(self) -> None:
+        while (conn := self.__bot_setups.get()) is not None:
+            try:
+                self.__start_bot_game(conn)
+            except Exception as e:
+                self.__log(f"Failed to start a bot game: {e}")
+    
+    def __start_game(self, white: MatchRequest, black: MatchRequest) -> None:
+        # Rooms may have filled up while these two were queued
+        with self.__lock:
+            full = len(self.__rooms) >= self.__max_rooms
+        if full:
+            self.__log("Server busy, rejected a matched pair")
+            self.__reject(white.conn)
+            self.__reject(black.conn)
+            return
+        
+        room = GameRoom(room_id=next(self.__next_room_id))
+        room.players.extend((white.conn, black.conn))
+        room.colours = {white.conn: Piece.WHITE, black.conn: Piece.BLACK}
+        self.__open_room(room)
+    
+    def __start_bot_game(self, conn: socket.socket) -> None:
+        colour = random.choice((Piece.WHITE, Piece.BLACK))
+        
+        room = GameRoom(room_id=next(self.__next_room_id), bot_colour=Piece.opposite_colour(colour))
+        room.bot_table = TranspositionTable(self.__bot_hash_mb)
+        room.players.append(conn)
+        room.colours = {conn: colour}
+        self.__open_room(room)
+    
+    def __open_room(self, room: GameRoom) -> None:
+        # Hidden queen games only begin once both players have secretly chosen a pawn
+        if self.__hidden_queen:
+            room.hidden_queen = HiddenQueenGame(room.board)
+            start_msg = '{"choose_hidden_queen": true}'
+            
+            if room.bot_colour is not None:
+                pawns = [sq for sq in range(64) if room.board.get_square(sq) == Piece.PAWN | room.bot_colour]
+                room.hidden_queen.designate(room.bot_colour, random.choice(pawns))
+        else:
+            start_msg = '{"begin": true}'
+        
+        if self.__time_control is not None:
+            room.clock = ChessClock(*self.__time_control)
+        
+        # Only handed out when rooms are snapshotted, they are what a player presents to resume after a restart
+        if self.__snapshots is not None:
+            room.sessions = {colour: secrets.token_hex(8) for colour in room.colours.values()}
+        
+        with self.__lock:
+            self.__rooms[room.room_id] = room
+            self.__room_connections += len(room.players)
+        
+        # Notify each player of their colour and that the game has started
+        for conn, colour in room.colours.items():
+            try:
+                hello = {"colour": colour, "session": room.sessions[colour]} if colour in room.sessions else {"colour": colour}
+                utils.send_bytes(conn, f'{json.dumps(hello)}\n{start_msg}\n'.encode())
+            except OSError:
+                self.__log("Failed to notify game start")
+            
+            threading.Thread(target=self.__handle_client, args=(room, conn, colour), daemon=True).start()
+        
+        if not self.__hidden_queen:
+            with self.__lock:
+                self.__start_clock(room)
+            self.__schedule_bot_move(room)
             
     def __handle_client(self, room: GameRoom, conn: socket.socket, colour: int) -> None:
         try:
+            # Each player's own thread pings when the line goes quiet, live peers answer and dead or half-open ones are reaped.
+            # Waiting is left to select, so the socket's timeout only ever applies to sends
+            wait = self.__heartbeat_interval or self.__read_timeout
+            last_heard = time.monotonic()
+            
             buffer = ""
             while True:      
-                if not (data := conn.recv(4096)):
+                readable, _, _ = select.select([conn], [], [], wait)
+                if not readable:
+                    if self.__read_timeout is not None and time.monotonic() - last_heard >= self.__read_timeout:
+                        raise TimeoutError()
+                    utils.send_json(conn, json.dumps({"ping": next(self.__heartbeat_seq)}))
+                    continue
+                
+                data = conn.recv(4096)
+                if not data:
                     break
                   
+                last_heard = time.monotonic()
                 buffer += data.decode()
                 while "\n" in buffer:
                     line, buffer = buffer.split("\n", 1)
+                    if self.__capture is not None:
+                        self.__capture.frame(conn, line.strip(), room.board.get_ply_count())
                     self.__handle_message(line.strip(), room, conn, colour)
         
+        except TimeoutError:
+            self.__reaped += 1
+            self.__log(f"Reaped unresponsive {Piece.colour_str(colour)} player in room {room.room_id}")
+        
         except Exception as e:
             self.__log(f"Error in client thread: {e}")
         
         finally:
+            if self.__capture is not None:
+                self.__capture.disconnect(conn, room.board.get_ply_count())
             self.__handle_disconnect(room, conn, colour) 
 
     def __handle_message(self, msg: str, room: GameRoom, conn: socket.socket, colour: int) -> None:
@@ -94,6 +538,35 @@ class Server:
         except json.JSONDecodeError:
             self.__log("Received invalid JSON")
             return
+        
+        if "pong" in msg_dict:
+            return
+        
+        if (seq := msg_dict.get("ping")) is not None:
+            try:
+                utils.send_json(conn, json.dumps({"pong": seq}))
+            except OSError:
+                pass
+            return
+
+        if (square := msg_dict.get("hidden_queen")) is not None and room.hidden_queen is not None:
+            with self.__lock:
+                try:
+                    delta = room.hidden_queen.designate(colour, square)
+                except ValueError as e:
+                    utils.send_error(conn, str(e))
+                    return
+                
+                utils.send_delta(conn, delta)
+                if room.hidden_queen.is_ready() and self.__is_seated(room):
+                    for player in room.players:
+                        try:
+                            utils.send_bytes(player, b'{"begin": true}\n')
+                        except OSError:
+                            self.__log("Failed to notify game start")
+                    self.__start_clock(room)
+                    self.__schedule_bot_move(room)
+            return
 
         if move_json := msg_dict.get("move"):
             try:
@@ -105,38 +578,265 @@ class Server:
             with self.__lock:
                 board = room.board
                 expected_colour = board.get_colour_to_move()
+                timer = MoveTimer(board.to_bytes()) if self.__timings is not None else None
 
+                if room.board.is_game_over() or self.__rooms.get(room.room_id) is not room:
+                    utils.send_error(conn, "Game is over")
+                    return
+                
                 if colour != expected_colour:
                     utils.send_error(conn, "Not your turn")
                     return
+                
+                if not self.__is_seated(room):
+                    utils.send_error(conn, "Waiting for opponent to reconnect")
+                    return
+                
+                if room.hidden_queen is not None:
+                    self.__handle_hidden_queen_move(room, conn, colour, move, timer)
+                    return
 
                 if board.is_valid_move(move):
-                    board.apply_move(move)
-                    self.__broadcast_move(room, move)
+                    if timer is not None:
+                        timer.mark("validate")
+                    self.__play_move(room, move, timer)
                 else:
                     utils.send_error(conn, "Invalid move")
 
+    def __handle_hidden_queen_move(
+        self, room: GameRoom, conn: socket.socket, colour: int, move: Move, timer: MoveTimer | None = None
+    ) -> None:
+        game = room.hidden_queen
+        if not game.is_ready():
+            utils.send_error(conn, "Waiting for both hidden queens to be chosen")
+            return
+        
+        # Legality is decided on the true position, the sender only knows its own view
+        if (move := game.resolve_move(colour, move)) is None:
+            utils.send_error(conn, "Invalid move")
+            return
+        
+        if timer is not None:
+            timer.mark("validate")
+        self.__play_move(room, move, timer)
+    
+    def __play_move(self, room: GameRoom, move: Move, timer: MoveTimer | None = None) -> None:
+        # Charged when the move is accepted, a move that arrives after the flag fell but before the timer fired loses
+        if room.clock is not None and not room.clock.press(room.board.get_colour_to_move()):
+            self.__flag(room, room.board.get_colour_to_move())
+            return
+        
+        if room.hidden_queen is not None:
+            deltas = room.hidden_queen.apply_move(move)
+            if timer is not None:
+                timer.mark("make")
+            for player in room.players:
+                try:
+                    utils.send_delta(player, deltas[room.colours[player]])
+                except Exception:
+                    self.__log("Failed to send update to a player")
+        else:
+            room.board.apply_move(move)
+            if timer is not None:
+                timer.mark("make")
+            self.__broadcast_move(room, move)
+        
+        # Recorded before the game can end, a finished room reports its timings as it is archived
+        if timer is not None:
+            timer.mark("broadcast")
+            self.__timings.observe(room.room_id, move, timer)
+        
+        if room.board.is_game_over():
+            self.__stop_clock(room)
+            self.__archive_game(room)
+        else:
+            self.__schedule_flag(room)
+            self.__schedule_bot_move(room)
+    
+    def __start_clock(self, room: GameRoom) -> None:
+        if room.clock is not None:
+            room.clock.start(room.board.get_colour_to_move())
+            self.__schedule_flag(room)
+    
+    def __stop_clock(self, room: GameRoom) -> None:
+        if room.clock is not None:
+            room.clock.stop()
+        if room.flag_timer is not None:
+            room.flag_timer.cancel()
+            room.flag_timer = None
+    
+    def __schedule_flag(self, room: GameRoom) -> None:
+        if room.clock is None:
+            return
+        
+        if room.flag_timer is not None:
+            room.flag_timer.cancel()
+        
+        colour = room.clock.get_running()
+        room.flag_timer = self.__timers.schedule(room.clock.get_remaining(colour), lambda: self.__on_flag(room, colour))
+        
+        message = json.dumps({"clock": room.clock.to_dict()})
+        for player in room.players:
+            try:
+                utils.send_json(player, message)
+            except OSError:
+                self.__log("Failed to send clock to a player")
+    
+    def __on_flag(self, room: GameRoom, colour: int) -> None:
+        with self.__lock:
+            # The timer may have been overtaken by a move, a disconnect or the end of the game
+            if (
+                self.__rooms.get(room.room_id) is not room or
+                room.board.is_game_over() or
+                room.clock.get_running() != colour
+            ):
+                return
+            
+            if room.clock.get_remaining(colour) > 0:
+                self.__schedule_flag(room)
+                return
+            
+            self.__flag(room, colour)
+    
+    def __flag(self, room: GameRoom, colour: int) -> None:
+        self.__stop_clock(room)
+        room.board.set_game_result(GameResult.TIMEOUT)
+        self.__archive_game(room, loser=colour)
+        self.__log(f"{Piece.colour_str(colour)} lost on time in room {room.room_id}")
+        
+        # Nothing is left to play, so the room and both connections are released instead of waiting on idle players
+        self.__rooms.pop(room.room_id, None)
+        message = json.dumps({"timeout": colour})
+        for player in room.players:
+            try:
+                utils.send_json(player, message)
+                player.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+    
+    def __is_bot_to_move(self, room: GameRoom) -> bool:
+        return (
+            room.bot_colour is not None and
+            self.__rooms.get(room.room_id) is room and
+            self.__is_seated(room) and
+            not room.board.is_game_over() and
+            room.board.get_colour_to_move() == room.bot_colour and
+            (room.hidden_queen is None or room.hidden_queen.is_ready())
+        )
+    
+    def __schedule_bot_move(self, room: GameRoom) -> None:
+        if self.__is_bot_to_move(room):
+            threading.Thread(target=self.__play_bot_move, args=(room,), daemon=True).start()
+    
+    def __play_bot_move(self, room: GameRoom) -> None:
+        with self.__lock:
+            if not self.__is_bot_to_move(room):
+                return
+            
+            # The bot only searches what its side can see, never the opponent's hidden queen
+            if room.hidden_queen is not None:
+                position = room.hidden_queen.get_view_position(room.bot_colour)
+            else:
+                position = Position.from_fen(room.board.get_fen())
+        
+        # Known openings are played straight from the book without searching, hidden queens are looked up as pawns
+        move = self.__bot_book.choose_move(position) if self.__bot_book is not None else None
+        
+        # Searched outside the lock so other rooms keep moving, the limits bound the CPU spent per move
+        if move is None:
+            # An opponent pawn in the bot's view may still be a hidden queen, which no table accounts for
+            tablebase = self.__bot_tablebase if room.hidden_queen is None else None
+            move = Searcher(position, room.bot_table, tablebase).search(self.__bot_limits).best_move
+        
+        with self.__lock:
+            if not self.__is_bot_to_move(room) or move is None:
+                return
+            
+            timer = MoveTimer(room.board.to_bytes()) if self.__timings is not None else None
+            if room.hidden_queen is not None:
+                # A move that looked legal in the bot's view can still run into an unseen hidden queen
+                move = room.hidden_queen.resolve_move(room.bot_colour, move) or random.choice(room.board.get_legal_moves())
+            
+            if timer is not None:
+                timer.mark("validate")
+            self.__play_move(room, move, timer)
+
     def __handle_disconnect(self, room: GameRoom, conn: socket.socket, colour: int) -> None:
         with self.__lock:
             if conn in room.players:
                 room.players.remove(conn)
+                self.__room_connections -= 1
 
-                    # If only one player left, notify and delete room
-                if room in self.__rooms.values():
+                # If only one player left, notify and delete room
+                if self.__rooms.get(room.room_id) is room:
+                    if not room.board.is_game_over():
+                        self.__stop_clock(room)
+                        self.__archive_game(room, loser=colour)
+                    
                     if room.players:
                         try:
-                            room.players[0].sendall(b'{"disconnect": true}\n')
+                            utils.send_bytes(room.players[0], b'{"disconnect": true}\n')
                         except Exception:
                             pass
                     self.__rooms.pop(room.room_id, None)
 
-                # If the disconnected player was in waiting_room
-                if self.__waiting_room is room:
-                    self.__waiting_room = None
-
         conn.close()
         self.__log(f"Player {Piece.colour_str(colour)} disconnected from room {room.room_id}")
           
+    def __archive_game(self, room: GameRoom, loser: int | None = None) -> None:
+        # Every room that ends passes through here, so its timings are reported once it is over
+        if self.__timings is not None and (summary := self.__timings.finish_room(room.room_id)):
+            self.__log(f"Room {room.room_id} timings, {summary}")
+        
+        if self.__archive is None or room.archived:
+            return
+        
+        board = room.board
+        if board.get_game_result() == GameResult.TIMEOUT:
+            result = result_to_pgn(GameResult.TIMEOUT, board.get_colour_to_move(), loser)
+            termination = "time forfeit"
+        elif loser is not None:
+            result = result_to_pgn(GameResult.DISCONNECT, board.get_colour_to_move(), loser)
+            termination = "abandoned"
+        else:
+            result = result_to_pgn(board.get_game_result(), board.get_colour_to_move())
+            termination = "normal"
+        
+        room.archived = True
+        self.__archive.submit(ArchivedGame(
+            start_fen=board.get_initial_fen(),
+            moves=board.get_moves_played(),
+            result=result,
+            headers=self.__get_archive_headers(room.room_id, termination)
+        ))
+    
+    def __archive_snapshot(self, snapshot: RoomSnapshot) -> None:
+        # A restored room nobody came back for, its result was never decided
+        if self.__archive is None:
+            return
+        
+        try:
+            moves = [Move.unpack(code) for code in snapshot.moves]
+        except ValueError as e:
+            self.__log(f"Failed to archive restored room {snapshot.room_id}: {e}")
+            return
+        
+        self.__archive.submit(ArchivedGame(
+            start_fen=snapshot.start_fen,
+            moves=moves,
+            result="*",
+            headers=self.__get_archive_headers(snapshot.room_id, "abandoned")
+        ))
+    
+    def __get_archive_headers(self, room_id: int, termination: str) -> Dict[str, str]:
+        return {
+            "Event": "Online Hidden Queen Chess",
+            "Site": f"{self.__host}:{self.__port}",
+            "Date": date.today().strftime("%Y.%m.%d"),
+            "Round": str(room_id),
+            "Termination": termination,
+        }
+          
     def __broadcast_move(self, room: GameRoom, move: Move) -> None:
         for player in room.players:
             try:
@@ -148,5 +848,50 @@ class Server:
         print(f"[SERVER] {msg}")
         
 if __name__ == "__main__":
-    server = Server()
+    parser = argparse.ArgumentParser(description="Game server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5555)
+    parser.add_argument("--standard", action="store_true", help="play standard chess without hidden queens")
+    parser.add_argument("--bot", action="store_true", help="pair every player with the engine")
+    parser.add_argument("--bot-time", type=float, default=1.0, help="seconds the engine may search per move")
+    parser.add_argument("--bot-nodes", type=int, default=None, help="nodes the engine may search per move")
+    parser.add_argument("--bot-hash", type=float, default=4, help="transposition table size per bot room, in MB")
+    parser.add_argument("--bot-book", default=None, help="opening book the engine plays from before searching")
+    parser.add_argument("--clock", type=float, default=None, help="seconds on each player's clock, no time control by default")
+    parser.add_argument("--increment", type=float, default=0.0, help="seconds added to a player's clock after each move")
+    parser.add_argument("--max-connections", type=int, default=1000, help="connections admitted at once, others are told the server is busy")
+    parser.add_argument("--max-rooms", type=int, default=500, help="games played at once")
+    parser.add_argument("--heartbeat", type=float, default=10.0, help="seconds between pings, 0 to turn them off")
+    parser.add_argument("--read-timeout", type=float, default=30.0, help="seconds of silence before a player is dropped")
+    parser.add_argument("--send-timeout", type=float, default=10.0, help="seconds a player may take to read a frame before being dropped")
+    parser.add_argument("--hello-timeout", type=float, default=0.0, help="seconds to wait for a new player's rating and time control, 0 pairs in arrival order")
+    parser.add_argument("--bot-tablebase", default=None, help="directory of endgame tables the engine probes in standard games")
+    parser.add_argument("--snapshot", default=None, help="file live rooms are saved to and restored from after a restart")
+    parser.add_argument("--snapshot-interval", type=float, default=5.0, help="seconds between snapshots")
+    parser.add_argument("--resume-grace", type=float, default=60.0, help="seconds players have to resume restored games")
+    parser.add_argument("--profile-dir", default=None, help="directory profiles are written to, SIGUSR1 starts and stops the profiler")
+    parser.add_argument("--profile-interval", type=float, default=0.01, help="seconds between profiler samples")
+    parser.add_argument("--time-moves", action="store_true", help="time the validate, make and broadcast phases of every move")
+    parser.add_argument("--slow-moves", default=None, help="file slow moves are appended to with their FEN, needs --time-moves")
+    parser.add_argument("--slow-move-ms", type=float, default=50.0, help="milliseconds a timed move must take to count as slow")
+    parser.add_argument("--capture", default=None, help="file every inbound frame is recorded to, for networking.replay")
+    parser.add_argument("--position-index", default=None, help="directory archived games are indexed into by position")
+    args = parser.parse_args()
+    
+    bot_limits = SearchLimits(time=args.bot_time, nodes=args.bot_nodes) if args.bot else None
+    server = Server(
+        args.host, args.port, hidden_queen=not args.standard, bot_limits=bot_limits, bot_hash_mb=args.bot_hash, bot_book=args.bot_book,
+        bot_tablebase=args.bot_tablebase, time_control=(args.clock, args.increment) if args.clock is not None else None,
+        max_connections=args.max_connections, max_rooms=args.max_rooms, heartbeat_interval=args.heartbeat,
+        read_timeout=args.read_timeout or None, send_timeout=args.send_timeout or None,
+        hello_timeout=args.hello_timeout,
+        snapshot_path=args.snapshot, snapshot_interval=args.snapshot_interval,
+        resume_grace=args.resume_grace, profile_dir=args.profile_dir, profile_interval=args.profile_interval,
+        time_moves=args.time_moves, slow_move_path=args.slow_moves, slow_move_ms=args.slow_move_ms,
+        capture_path=args.capture, index_dir=args.position_index
+    )
+    
+    # Handled on the main thread between accepts, SIGUSR1 does not exist on Windows
+    if args.profile_dir and hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: server.toggle_profiler())
     server.start()
\ No newline at end of file
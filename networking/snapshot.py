@@ -0,0 +1,185 @@
+from array import array
+from dataclasses import dataclass, field
+import os
+import struct
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+from game import Move, Piece, Position
+from game.hidden_queen import HiddenQueenGame
+
+_MAGIC = b"HQSNAP01"
+
+# magic, wall clock time it was taken, room count
+_HEADER = struct.Struct("<8sdI")
+
+# room id, flags, bot colour, white and black hidden queen squares, white and black seconds left,
+# white and black session ids, then the lengths of the start FEN and the move list that follow
+_ROOM = struct.Struct("<IBBbbdd8s8sHH")
+_POSITION_SIZE = 71
+
+_HIDDEN_QUEEN = 1
+_CLOCK = 2
+
+_NO_SESSION = bytes(8)
+
+@dataclass(slots=True)
+class RoomSnapshot:
+    room_id: int
+    start_fen: str
+    position: bytes
+    moves: array
+    sessions: Dict[int, str] = field(default_factory=dict)
+    hidden_queens: Dict[int, int | None] | None = None
+    bot_colour: int | None = None
+    clock: Tuple[float, float] | None = None
+
+def encode_snapshot(rooms: List[RoomSnapshot], taken_at: float | None = None) -> bytes:
+    parts = [_HEADER.pack(_MAGIC, time.time() if taken_at is None else taken_at, len(rooms))]
+    for room in rooms:
+        hidden_queens = room.hidden_queens or {}
+        white_queen = hidden_queens.get(Piece.WHITE)
+        black_queen = hidden_queens.get(Piece.BLACK)
+        white_clock, black_clock = room.clock or (0.0, 0.0)
+        start_fen = room.start_fen.encode()
+
+        flags = (_HIDDEN_QUEEN if room.hidden_queens is not None else 0) | (_CLOCK if room.clock is not None else 0)
+        parts.append(_ROOM.pack(
+            room.room_id, flags, room.bot_colour or 0,
+            -1 if white_queen is None else white_queen, -1 if black_queen is None else black_queen,
+            white_clock, black_clock,
+            bytes.fromhex(room.sessions[Piece.WHITE]) if Piece.WHITE in room.sessions else _NO_SESSION,
+            bytes.fromhex(room.sessions[Piece.BLACK]) if Piece.BLACK in room.sessions else _NO_SESSION,
+            len(start_fen), len(room.moves)
+        ))
+        parts.append(start_fen)
+        parts.append(room.position)
+        parts.append(struct.pack(f"<{len(room.moves)}Q", *room.moves))
+
+    return b"".join(parts)
+
+def decode_snapshot(data: bytes) -> Tuple[float, List[RoomSnapshot]]:
+    magic, taken_at, count = _HEADER.unpack_from(data)
+    if magic != _MAGIC:
+        raise ValueError("Not a room snapshot")
+
+    rooms = []
+    offset = _HEADER.size
+    for _ in range(count):
+        (
+            room_id, flags, bot_colour, white_queen, black_queen, white_clock, black_clock,
+            white_session, black_session, fen_length, move_count
+        ) = _ROOM.unpack_from(data, offset)
+        offset += _ROOM.size
+
+        start_fen = data[offset:offset + fen_length].decode()
+        offset += fen_length
+        position = data[offset:offset + _POSITION_SIZE]
+        offset += _POSITION_SIZE
+        # Left packed until a player comes back for the room, unpacking every move up front would slow the restart
+        moves = array("Q", struct.unpack_from(f"<{move_count}Q", data, offset))
+        offset += move_count * 8
+
+        sessions = {
+            colour: session.hex()
+            for colour, session in ((Piece.WHITE, white_session), (Piece.BLACK, black_session))
+            if session != _NO_SESSION
+        }
+        hidden_queens = {
+            Piece.WHITE: None if white_queen < 0 else white_queen,
+            Piece.BLACK: None if black_queen < 0 else black_queen,
+        } if flags & _HIDDEN_QUEEN else None
+
+        rooms.append(RoomSnapshot(
+            room_id, start_fen, position, moves, sessions, hidden_queens, bot_colour or None,
+            (white_clock, black_clock) if flags & _CLOCK else None
+        ))
+
+    if offset != len(data):
+        raise ValueError("Trailing data after the last room")
+
+    return taken_at, rooms
+
+def replay_snapshot(snapshot: RoomSnapshot, position: Position) -> HiddenQueenGame | None:
+    position.load_fen(snapshot.start_fen)
+    hidden_queen = None
+    if snapshot.hidden_queens is not None:
+        hidden_queen = HiddenQueenGame(position)
+        for colour, square in snapshot.hidden_queens.items():
+            if square is not None:
+                hidden_queen.designate(colour, square)
+
+    # Replayed rather than set from the saved position, so repetitions and the archived game carry on as before
+    moves = [Move.unpack(code) for code in snapshot.moves]
+    for move in moves[:-1]:
+        position.make_move(move)
+    if moves:
+        position.apply_move(moves[-1])
+
+    if position.to_bytes() != snapshot.position:
+        raise ValueError("Moves do not replay to the saved position")
+
+    if hidden_queen is not None:
+        hidden_queen.rebuild_views()
+    return hidden_queen
+
+def write_snapshot(path: str, rooms: List[RoomSnapshot]) -> int:
+    data = encode_snapshot(rooms)
+
+    # Written beside the old file and renamed over it, so a crash mid-write leaves the previous snapshot intact
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+    return len(data)
+
+def read_snapshot(path: str) -> Tuple[float, List[RoomSnapshot]]:
+    with open(path, "rb") as f:
+        return decode_snapshot(f.read())
+
+class SnapshotWriter:
+    def __init__(self, path: str, collect: Callable[[], List[RoomSnapshot]], interval: float = 5.0) -> None:
+        self.__path = path
+        self.__collect = collect
+        self.__interval = interval
+
+        self.__last_size = 0
+        self.__last_duration = 0.0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.__stopped = threading.Event()
+        self.__thread = threading.Thread(target=self.__write_loop, daemon=True)
+        self.__thread.start()
+
+    def get_last_write(self) -> Tuple[int, float]:
+        # Bytes and seconds taken by the most recent snapshot
+        return self.__last_size, self.__last_duration
+
+    def close(self, timeout: float | None = 5.0) -> None:
+        # One last snapshot is written on the way out, so a clean shutdown loses nothing
+        self.__stopped.set()
+        self.__thread.join(timeout=timeout)
+
+    def __write(self) -> None:
+        start = time.perf_counter()
+        try:
+            self.__last_size = write_snapshot(self.__path, self.__collect())
+        except Exception as e:
+            self.__log(f"Failed to write snapshot: {e}")
+            return
+        self.__last_duration = time.perf_counter() - start
+
+    def __write_loop(self) -> None:
+        while not self.__stopped.wait(self.__interval):
+            self.__write()
+        self.__write()
+
+    def __log(self, msg: str) -> None:
+        print(f"[SNAPSHOT] {msg}")
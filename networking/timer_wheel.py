@@ -0,0 +1,113 @@
+import threading
+import time
+from typing import Callable, List
+
+_SLOT_BITS = 6
+_SLOTS = 1 << _SLOT_BITS
+_SLOT_MASK = _SLOTS - 1
+_LEVELS = 4
+
+class Timer:
+    __slots__ = ("expires", "callback", "cancelled")
+
+    def __init__(self, expires: int, callback: Callable[[], None]) -> None:
+        self.expires = expires
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        # Left in its slot and skipped when the slot comes round, so cancelling never searches the wheel
+        self.cancelled = True
+
+class TimerWheel:
+    def __init__(self, tick: float = 0.05) -> None:
+        # 4 levels of 64 slots, each level 64 times coarser, reach 64^4 ticks: over 9 days at 50 ms
+        self.__tick = tick
+        self.__start = time.monotonic()
+        self.__current_tick = 0
+        self.__wheels: List[List[List[Timer]]] = [[[] for _ in range(_SLOTS)] for _ in range(_LEVELS)]
+        self.__pending = 0
+
+        self.__lock = threading.Lock()
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+    def get_pending(self) -> int:
+        return self.__pending
+
+    def schedule(self, delay: float, callback: Callable[[], None]) -> Timer:
+        # Counted from the wheel's start rather than its current tick, which trails the clock by up to one tick
+        due = -int(-(time.monotonic() + delay - self.__start) // self.__tick)
+        with self.__lock:
+            expires = max(due, self.__current_tick + 1)
+            timer = Timer(expires, callback)
+            self.__insert(timer)
+            self.__pending += 1
+        return timer
+
+    def __insert(self, timer: Timer) -> None:
+        delta = timer.expires - self.__current_tick
+        for level in range(_LEVELS):
+            if delta < 1 << (_SLOT_BITS * (level + 1)) or level == _LEVELS - 1:
+                # Anything beyond the top level waits in its furthest slot and is re-inserted when that cascades
+                expires = min(timer.expires, self.__current_tick + (1 << (_SLOT_BITS * _LEVELS)) - 1)
+                self.__wheels[level][(expires >> (_SLOT_BITS * level)) & _SLOT_MASK].append(timer)
+                return
+
+    def __advance(self) -> List[Timer]:
+        self.__current_tick += 1
+        tick = self.__current_tick
+
+        # Whenever a level wraps, the next slot up is spread over the finer levels below it
+        for level in range(1, _LEVELS):
+            if tick & ((1 << (_SLOT_BITS * level)) - 1):
+                break
+            slot = self.__wheels[level][(tick >> (_SLOT_BITS * level)) & _SLOT_MASK]
+            self.__wheels[level][(tick >> (_SLOT_BITS * level)) & _SLOT_MASK] = []
+            for timer in slot:
+                if timer.cancelled:
+                    self.__pending -= 1
+                else:
+                    self.__insert(timer)
+
+        slot = self.__wheels[0][tick & _SLOT_MASK]
+        self.__wheels[0][tick & _SLOT_MASK] = []
+
+        expired = []
+        for timer in slot:
+            if timer.expires > tick:
+                # Capped at the top level's reach, so it still has further to go
+                self.__insert(timer)
+                continue
+            self.__pending -= 1
+            if not timer.cancelled:
+                expired.append(timer)
+        return expired
+
+    def advance_to(self, now: float) -> int:
+        # Runs every timer due by now, outside the lock so callbacks may schedule and cancel freely
+        target = int((now - self.__start) / self.__tick)
+        fired = 0
+        while True:
+            with self.__lock:
+                if self.__current_tick >= target:
+                    return fired
+                expired = self.__advance()
+
+            for timer in expired:
+                fired += 1
+                try:
+                    timer.callback()
+                except Exception as e:
+                    print(f"[TIMER] Callback failed: {e}")
+
+    def stop(self) -> None:
+        self.__running = False
+        self.__thread.join(timeout=1)
+
+    def __run(self) -> None:
+        # One thread drives every timer, however many are pending, waking on tick boundaries so oversleeping never adds up
+        while self.__running:
+            time.sleep(max(0.0, self.__start + (self.__current_tick + 1) * self.__tick - time.monotonic()))
+            self.advance_to(time.monotonic())
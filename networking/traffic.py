@@ -0,0 +1,98 @@
+from dataclasses import dataclass
+import itertools
+import os
+import socket
+import struct
+import threading
+import time
+from typing import Dict, List, Tuple
+
+_MAGIC = b"HQTRAF01"
+
+# magic, wall clock time the capture began
+_HEADER = struct.Struct("<8sd")
+
+# seconds since the capture began, connection id, record kind, plies played in the connection's room when it arrived,
+# then the length of the frame that follows
+_RECORD = struct.Struct("<dIBHI")
+
+CONNECT = 0
+FRAME = 1
+CLOSE = 2
+
+@dataclass(slots=True)
+class TrafficRecord:
+    offset: float
+    connection: int
+    kind: int
+    ply: int = 0
+    payload: bytes = b""
+
+class TrafficCapture:
+    def __init__(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.__file = open(path, "wb")
+        self.__file.write(_HEADER.pack(_MAGIC, time.time()))
+        self.__start = time.monotonic()
+
+        # Ids follow accept order, which is what the replayer connects in so the matchmaker pairs the same players
+        self.__ids: Dict[socket.socket, int] = {}
+        self.__next_id = itertools.count(1)
+        self.__records = 0
+        self.__lock = threading.Lock()
+
+    def get_records(self) -> int:
+        return self.__records
+
+    def connect(self, conn: socket.socket) -> None:
+        with self.__lock:
+            connection = self.__ids[conn] = next(self.__next_id)
+            self.__write(connection, CONNECT, 0, b"")
+
+    def frame(self, conn: socket.socket, line: str, ply: int = 0) -> None:
+        # The ply lets a replay hold each frame back until the game has reached the point it was sent at
+        with self.__lock:
+            if (connection := self.__ids.get(conn)) is not None:
+                self.__write(connection, FRAME, ply, line.encode())
+
+    def disconnect(self, conn: socket.socket, ply: int = 0) -> None:
+        with self.__lock:
+            if (connection := self.__ids.pop(conn, None)) is not None:
+                self.__write(connection, CLOSE, ply, b"")
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__file.close()
+
+    def __write(self, connection: int, kind: int, ply: int, payload: bytes) -> None:
+        # Left to the file's buffer rather than flushed per frame, capturing must not slow the handlers it records
+        if self.__file.closed:
+            return
+        self.__file.write(_RECORD.pack(time.monotonic() - self.__start, connection, kind, min(ply, 0xFFFF), len(payload)))
+        self.__file.write(payload)
+        self.__records += 1
+
+def decode_traffic(data: bytes) -> Tuple[float, List[TrafficRecord]]:
+    magic, started_at = _HEADER.unpack_from(data)
+    if magic != _MAGIC:
+        raise ValueError("Not a traffic capture")
+
+    records = []
+    offset = _HEADER.size
+    # A server that was killed leaves its last record cut short, everything before it still replays
+    while offset + _RECORD.size <= len(data):
+        at, connection, kind, ply, length = _RECORD.unpack_from(data, offset)
+        offset += _RECORD.size
+        if offset + length > len(data):
+            break
+        records.append(TrafficRecord(at, connection, kind, ply, data[offset:offset + length]))
+        offset += length
+
+    return started_at, records
+
+def read_traffic(path: str) -> Tuple[float, List[TrafficRecord]]:
+    with open(path, "rb") as f:
+        return decode_traffic(f.read())
@@ -1,14 +1,56 @@
 import json
+import select
 import socket
+import threading
+import weakref
 
 from game import Move
+from game.hidden_queen import ViewDelta
+
+# One lock per socket, a player's own thread (pings, pongs, errors) and the opponent's (moves) both write to it
+_send_locks: "weakref.WeakKeyDictionary[socket.socket, threading.Lock]" = weakref.WeakKeyDictionary()
+_send_locks_lock = threading.Lock()
+
+def send_bytes(conn: socket.socket, data: bytes) -> None:
+    with _send_locks_lock:
+        lock = _send_locks.setdefault(conn, threading.Lock())
+
+    with lock:
+        try:
+            conn.sendall(data)
+        except TimeoutError:
+            # Part of the frame may be on the wire already and nothing after it could be parsed, so the connection is shut
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            raise
 
 def send_json(conn: socket.socket, payload: str) -> None:
     message = payload + "\n"
-    conn.sendall(message.encode())
+    send_bytes(conn, message.encode())
+
+def encode_move(move: Move) -> bytes:
+    return (json.dumps({"move": move.to_dict()}) + "\n").encode()
 
 def send_move(conn: socket.socket, move: Move) -> None:
-    send_json(conn, json.dumps({"move": json.loads(Move.to_json(move))}))
+    send_bytes(conn, encode_move(move))
     
+def send_delta(conn: socket.socket, delta: ViewDelta) -> None:
+    send_json(conn, json.dumps({"delta": delta.to_dict()}))
+
 def send_error(conn: socket.socket, message: str) -> None:
-    send_json(conn, json.dumps({"error": message}))
\ No newline at end of file
+    send_json(conn, json.dumps({"error": message}))
+
+def is_connection_alive(conn: socket.socket) -> bool:
+    # Leaves the socket's mode alone, its handler may already have set a timeout on it.
+    # Nothing readable means a live but quiet peer, an orderly shutdown by the peer reads as b""
+    try:
+        readable, _, _ = select.select([conn], [], [], 0)
+        if not readable:
+            return True
+        return conn.recv(1, socket.MSG_PEEK | getattr(socket, "MSG_DONTWAIT", 0)) != b""
+    except BlockingIOError:
+        return True
+    except (OSError, ValueError):
+        return False
@@ -0,0 +1,27 @@
+from engine.book import OpeningBook, build_book
+from game import Piece, Position
+from game.hidden_queen import HiddenQueenGame
+from game.pgn import game_to_pgn, iter_pgn_file
+from game.san import move_to_san, san_to_move
+
+def test_book_from_hidden_queen_games_is_probed_from_a_view(tmp_path) -> None:
+    # White hid the queen on d2 and black on e7, the book is built from that archive
+    start_fen = "rnbqkbnr/pppphppp/8/8/8/8/PPPHPPPP/RNBQKBNR w KQkq - 0 1"
+    position = Position.from_fen(start_fen)
+    moves = []
+    for san in ("e4", "e5"):
+        moves.append(move := san_to_move(position, san))
+        position.make_move(move)
+    (tmp_path / "games.pgn").write_text(game_to_pgn(start_fen, moves, "1/2-1/2") + "\n")
+    build_book(iter_pgn_file(str(tmp_path / "games.pgn")), str(tmp_path / "book.bin"))
+
+    # Black picked another pawn in this game, and cannot see white's hidden queen
+    game = HiddenQueenGame(Position())
+    game.designate(Piece.WHITE, 11)
+    game.designate(Piece.BLACK, 53)
+    game.apply_move(san_to_move(game.get_position(), "e4"))
+
+    view = game.get_view_position(Piece.BLACK)
+    with OpeningBook(str(tmp_path / "book.bin")) as book:
+        assert [move_to_san(view, move) for move, _ in book.get_moves(view)] == ["e5"]
+        assert [(move_to_san(Position(), move), weight) for move, weight in book.get_moves(Position())] == [("e4", 1)]
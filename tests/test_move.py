@@ -0,0 +1,11 @@
+import pytest
+
+from game import Move, Piece
+
+def test_castling_accepts_only_rights() -> None:
+    king = Piece.WHITE | Piece.KING
+    assert Move.from_dict({"start": 4, "end": 6, "piece": king, "castling": 1}).castling == 1
+
+    for castling in (True, 3, "1"):
+        with pytest.raises(ValueError):
+            Move.from_dict({"start": 4, "end": 6, "piece": king, "castling": castling})
@@ -0,0 +1,35 @@
+import pytest
+
+from game import Position
+from game.move import generate_legal_moves
+
+# Standard perft positions with their known node counts, they cover castling, en passant and promotions for both sides
+PERFT_POSITIONS = [
+    ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", [48, 2039]),
+    ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812]),
+    ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", [6, 264, 9467]),
+    ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486]),
+]
+
+def perft(position: Position, depth: int) -> int:
+    if depth == 0:
+        return 1
+
+    nodes = 0
+    for move in generate_legal_moves(position, position.get_colour_to_move()):
+        position.make_move(move)
+        nodes += perft(position, depth - 1)
+        position.unmake_move()
+
+    return nodes
+
+@pytest.mark.parametrize("fen, counts", PERFT_POSITIONS)
+def test_perft(fen, counts):
+    position = Position.from_fen(fen)
+    for depth, expected in enumerate(counts, 1):
+        assert perft(position, depth) == expected
+
+def test_black_pawn_push_to_first_rank_promotes():
+    position = Position.from_fen("8/8/8/8/8/k7/p7/7K b - - 0 1")
+    pushes = [move for move in position.get_legal_moves() if move.start == 8 and move.end == 0]
+    assert len(pushes) == 4 and all(move.promotion for move in pushes)
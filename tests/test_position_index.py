@@ -0,0 +1,42 @@
+from typing import List
+
+from game import Move, Position
+from game.pgn import iter_pgn_file
+from game.san import move_to_san
+from networking.game_archive import ArchivedGame, GameArchiveWriter
+from networking.position_index import PositionIndex, PositionIndexWriter
+
+# Both players picked their e-pawn as the hidden queen
+HIDDEN_QUEEN_FEN = "rnbqkbnr/pppphppp/8/8/8/8/PPPPHPPP/RNBQKBNR w KQkq - 0 1"
+
+def _play(fen: str, sans: List[str]) -> List[Move]:
+    position = Position.from_fen(fen)
+    moves = []
+    for san in sans:
+        move = next(move for move in position.get_legal_moves() if move_to_san(position, move) == san)
+        moves.append(move)
+        position.make_move(move)
+    return moves
+
+def test_hidden_queen_archive_is_found_from_the_start_position(tmp_path) -> None:
+    archive = GameArchiveWriter(str(tmp_path / "games.pgn"), index_dir=str(tmp_path / "live"))
+    archive.submit(ArchivedGame(HIDDEN_QUEEN_FEN, _play(HIDDEN_QUEEN_FEN, ["e4", "e5", "Nf3"]), "1-0"))
+    archive.submit(ArchivedGame(HIDDEN_QUEEN_FEN, _play(HIDDEN_QUEEN_FEN, ["d4", "e5"]), "0-1"))
+    archive.close()
+
+    # Indexed as the server does while archiving, and again from the archive as the command line does
+    writer = PositionIndexWriter(str(tmp_path / "offline"))
+    for game in iter_pgn_file(str(tmp_path / "games.pgn")):
+        writer.add_pgn_game(game)
+    writer.close()
+
+    for directory in ("live", "offline"):
+        with PositionIndex(str(tmp_path / directory)) as index:
+            position = Position()
+            moves = {move_to_san(position, move): entry for move, entry in index.get_moves(position)}
+            assert sorted(moves) == ["d4", "e4"]
+            assert (moves["e4"].games, moves["e4"].white_wins) == (1, 1)
+            assert (moves["d4"].games, moves["d4"].black_wins) == (1, 1)
+
+            position.make_move(_play(position.get_fen(), ["e4"])[0])
+            assert [move_to_san(position, move) for move, _ in index.get_moves(position)] == ["e5"]
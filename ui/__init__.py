@@ -1,3 +1,6 @@
-from .image_button import ImageButton
-from .piece_images import PIECE_IMAGES
-from .promotion_popup import PromotionPopup
\ No newline at end of file
+from lazy_imports import lazy_getattr
+
+# Every widget needs pygame and the piece images are loaded from disk, so nothing is imported until it is used
+_LAZY_IMPORTS = {"ImageButton": ".image_button", "PIECE_IMAGES": ".piece_images", "PromotionPopup": ".promotion_popup"}
+
+__getattr__ = lazy_getattr(__name__, _LAZY_IMPORTS)